@@ -0,0 +1,109 @@
+"""
+Mapa de Tu Destino - Almacén de fotos direccionado por contenido
+Cada foto se guarda una sola vez en disco bajo su SHA-256, repartida en
+subdirectorios por prefijo (ab/cd/abcd...) para no saturar un directorio.
+"""
+
+import hashlib
+import io
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+RUTA_FOTOS = os.getenv("DESTINO_FOTOS", "fotos")
+
+# ============================================================================
+# ESCRITURA
+# ============================================================================
+
+def calcular_hash(datos):
+    """SHA-256 en hexadecimal de los bytes de una foto"""
+    return hashlib.sha256(datos).hexdigest()
+
+def ruta_foto(sha256, raiz=None):
+    """Ruta en disco de una foto a partir de su hash"""
+    return os.path.join(raiz or RUTA_FOTOS, sha256[:2], sha256[2:4], sha256)
+
+def guardar_foto(datos, raiz=None):
+    """
+    Guarda los bytes de una foto y devuelve su hash.
+
+    Si ya existe una foto con el mismo contenido no se vuelve a escribir. La
+    escritura va a un temporal en el mismo directorio y se publica con
+    os.replace, así un lector nunca ve un archivo a medio escribir.
+    """
+    sha256 = calcular_hash(datos)
+    destino = ruta_foto(sha256, raiz)
+    if os.path.exists(destino):
+        return sha256
+
+    directorio = os.path.dirname(destino)
+    os.makedirs(directorio, exist_ok=True)
+
+    fd, temporal = tempfile.mkstemp(dir=directorio, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as archivo:
+            archivo.write(datos)
+            archivo.flush()
+            os.fsync(archivo.fileno())
+        os.replace(temporal, destino)
+    except BaseException:
+        if os.path.exists(temporal):
+            os.remove(temporal)
+        raise
+
+    return sha256
+
+def describir_foto(datos, sha256=None):
+    """Metadatos que se guardan en fotos_data: hash, dimensiones y tamaño"""
+    # PIL solo hace falta al guardar fotos nuevas, no al leerlas
+    from PIL import Image
+
+    # Image.open solo lee la cabecera; no decodifica los píxeles
+    with Image.open(io.BytesIO(datos)) as imagen:
+        ancho, alto = imagen.size
+
+    return {
+        "sha256": sha256 or calcular_hash(datos),
+        "ancho": ancho,
+        "alto": alto,
+        "bytes": len(datos),
+    }
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def existe_foto(sha256, raiz=None):
+    """Indica si la foto está en el almacén"""
+    return os.path.exists(ruta_foto(sha256, raiz))
+
+@contextmanager
+def abrir_foto(sha256, raiz=None):
+    """
+    Abre una foto como mmap de solo lectura (objeto tipo archivo).
+
+    El sistema operativo pagina el archivo bajo demanda, sin copiarlo entero
+    a la memoria del proceso; PIL puede leer directamente del mmap.
+    """
+    with open(ruta_foto(sha256, raiz), "rb") as archivo:
+        with mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ) as mapa:
+            yield mapa
+
+def miniatura_foto(sha256, lado=480, raiz=None):
+    """JPEG reducido (lado mayor <= `lado`) de una foto, leído desde el mmap"""
+    from PIL import Image, ImageOps
+
+    with abrir_foto(sha256, raiz) as mapa, Image.open(mapa) as imagen:
+        # draft() deja que el decodificador JPEG reduzca al leer, sin decodificar a tamaño completo
+        imagen.draft("RGB", (lado, lado))
+        imagen = ImageOps.exif_transpose(imagen).convert("RGB")
+        imagen.thumbnail((lado, lado))
+        salida = io.BytesIO()
+        imagen.save(salida, format="JPEG", quality=85)
+    return salida.getvalue()
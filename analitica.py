@@ -0,0 +1,112 @@
+"""
+Mapa de Tu Destino - Analítica del dashboard de expertos
+Agregados calculados en SQLite (GROUP BY y funciones de ventana): a Python
+solo llegan unas pocas filas por gráfico, no el historial de consultas
+"""
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Tramos de antigüedad de la cola pendiente: (etiqueta, días máximos)
+TRAMOS_ANTIGUEDAD = (
+    ("< 1 día", 1),
+    ("1-3 días", 3),
+    ("3-7 días", 7),
+    ("1-4 semanas", 28),
+    ("> 4 semanas", None),
+)
+
+# Un pago cuenta como conversión a la interpretación de pago
+ESTADO_PAGO_COMPLETADO = "completado"
+
+def _columnas(filas, nombres):
+    """Convierte filas en {columna: [valores]}, el formato de los gráficos de Streamlit"""
+    return {nombre: [fila[i] for fila in filas] for i, nombre in enumerate(nombres)}
+
+# ============================================================================
+# AGREGADOS
+# ============================================================================
+
+def consultas_por_dia(conn, dias=30):
+    """
+    Consultas creadas y pagadas por día en los últimos `dias`, con la media
+    móvil de 7 días y la conversión acumulada del período.
+    """
+    filas = conn.execute("""
+        WITH diarias AS (
+            SELECT date(c.created_at) AS dia,
+                   COUNT(*) AS consultas,
+                   SUM(EXISTS (SELECT 1 FROM pagos p
+                               WHERE p.consulta_id = c.id AND p.status = ?)) AS pagadas
+            FROM consultas c
+            WHERE c.created_at >= datetime('now', ?)
+            GROUP BY dia
+        )
+        SELECT dia, consultas, pagadas,
+               AVG(consultas) OVER (ORDER BY dia ROWS BETWEEN 6 PRECEDING AND CURRENT ROW),
+               1.0 * SUM(pagadas) OVER (ORDER BY dia) / SUM(consultas) OVER (ORDER BY dia)
+        FROM diarias
+        ORDER BY dia""",
+        (ESTADO_PAGO_COMPLETADO, f"-{int(dias)} days")).fetchall()
+
+    return _columnas(filas, ("dia", "consultas", "pagadas", "media_7_dias",
+                             "conversion_acumulada"))
+
+def conversion_pago(conn, dias=30):
+    """Consultas del período, cuántas tienen un pago completado y la tasa"""
+    total, pagadas = conn.execute("""
+        SELECT COUNT(*),
+               COALESCE(SUM(EXISTS (SELECT 1 FROM pagos p
+                                    WHERE p.consulta_id = c.id AND p.status = ?)), 0)
+        FROM consultas c
+        WHERE c.created_at >= datetime('now', ?)""",
+        (ESTADO_PAGO_COMPLETADO, f"-{int(dias)} days")).fetchone()
+
+    return {"consultas": total, "pagadas": pagadas,
+            "tasa": pagadas / total if total else 0.0}
+
+def antiguedad_pendientes(conn):
+    """Consultas pendientes de interpretación por tramo de antigüedad"""
+    casos = " ".join(f"WHEN edad < {maximo} THEN {i}"
+                     for i, (_, maximo) in enumerate(TRAMOS_ANTIGUEDAD) if maximo is not None)
+    filas = dict(conn.execute(f"""
+        SELECT CASE {casos} ELSE {len(TRAMOS_ANTIGUEDAD) - 1} END AS tramo, COUNT(*)
+        FROM (SELECT julianday('now') - julianday(created_at) AS edad
+              FROM consultas
+              WHERE status = 'pendiente')
+        GROUP BY tramo""").fetchall())
+
+    # Todos los tramos, también los vacíos, en orden
+    return {
+        "tramo": [etiqueta for etiqueta, _ in TRAMOS_ANTIGUEDAD],
+        "consultas": [filas.get(i, 0) for i in range(len(TRAMOS_ANTIGUEDAD))],
+    }
+
+def reparto_ano_personal(conn, dias=30):
+    """Consultas del período por año personal (1-9)"""
+    filas = dict(conn.execute("""
+        SELECT ano_personal, COUNT(*)
+        FROM consultas
+        WHERE created_at >= datetime('now', ?) AND ano_personal BETWEEN 1 AND 9
+        GROUP BY ano_personal""", (f"-{int(dias)} days",)).fetchall())
+
+    return {"ano_personal": [str(ano) for ano in range(1, 10)],
+            "consultas": [filas.get(ano, 0) for ano in range(1, 10)]}
+
+def resumen_dashboard(conn, dias=30):
+    """Todos los agregados del dashboard en una lectura coherente"""
+    # Una sola transacción de lectura: en WAL todos ven la misma instantánea
+    propia = not conn.in_transaction
+    if propia:
+        conn.execute("BEGIN")
+    try:
+        return {
+            "por_dia": consultas_por_dia(conn, dias),
+            "conversion": conversion_pago(conn, dias),
+            "antiguedad": antiguedad_pendientes(conn),
+            "ano_personal": reparto_ano_personal(conn, dias),
+        }
+    finally:
+        if propia:
+            conn.rollback()
@@ -1,73 +1,107 @@
-from flask import Flask, request, jsonify
-from google import genai
+"""
+Servicio Flask /generate-reading.
+
+Acepta el JSON original (imágenes en base64 en handImages) o multipart con
+archivos handImages. Límites: MAX_UPLOAD_BYTES para el cuerpo completo, en
+ambos formatos (por encima, 413), y MAX_IMAGE_BYTES por imagen ya
+decodificada (por encima, 400). Un personalYear ausente o fuera de 1-9
+también responde 400.
+"""
+
+from flask import Flask, Response, request, jsonify, stream_with_context
+from werkzeug.exceptions import RequestEntityTooLarge
+import logging
 import os
 
+import reading_core
+from reading_core.api import (IMAGE_TOO_LARGE, MAX_IMAGE_BYTES, MAX_UPLOAD_BYTES, STREAM_MIMETYPES,
+                              RequestError, UploadError, build_reading_contents, form_data,
+                              format_event, json_data)
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
 app = Flask(__name__)
+# Werkzeug corta la lectura del cuerpo al pasar el límite (413), sin leerlo entero.
+# Vale para multipart y para el JSON con imágenes en base64 de los clientes antiguos.
+app.config["MAX_CONTENT_LENGTH"] = MAX_UPLOAD_BYTES
 
 API_KEY = os.getenv("API_KEY")
 if not API_KEY:
     raise ValueError("Falta configurar la variable de entorno API_KEY")
 
-client = genai.Client(api_key=API_KEY)
-
-personal_year_meanings = {
-    "es": {
-        1: "Nuevos comienzos, independencia y siembra de semillas para el futuro.",
-        2: "Paciencia, cooperación, relaciones y diplomacia.",
-        3: "Creatividad, autoexpresión, comunicación y actividades sociales.",
-        4: "Trabajo duro, disciplina, construcción de cimientos y organización.",
-        5: "Cambio, libertad, aventura y oportunidades inesperadas.",
-        6: "Responsabilidad, hogar, familia y asuntos del corazón.",
-        7: "Introspección, crecimiento espiritual, análisis y búsqueda de conocimiento.",
-        8: "Abundancia, poder, carrera y asuntos financieros.",
-        9: "Finalización, finales, dejar ir y humanitarismo.",
-    }
-}
-
-def build_prompt_es(data, personal_year):
-    meanings = personal_year_meanings["es"][personal_year]
-    question = data["question"]
-
-    return f"""
-Eres una consultora esotérica experta llamada 'Elara, la Observadora de Estrellas'...
-
-Pregunta del usuario: "{question}"
-Año personal: {personal_year} ({meanings})
-"""
+# El cliente de Gemini se crea en la primera llamada y se comparte en el proceso
+backend = reading_core.SyncBackend()
+
+
+def read_upload(file_storage):
+    """Lee un archivo multipart por bloques, cortando en cuanto supera MAX_IMAGE_BYTES."""
+    chunks = []
+    size = 0
+    while True:
+        chunk = file_storage.stream.read(64 * 1024)
+        if not chunk:
+            break
+        size += len(chunk)
+        if size > MAX_IMAGE_BYTES:
+            raise UploadError(IMAGE_TOO_LARGE)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+def parse_request():
+    """
+    Devuelve (data, uploads). Acepta el JSON original o multipart/form-data con
+    los campos question, personalYear, language y archivos handImages.
+    """
+    if request.mimetype == "multipart/form-data":
+        data = form_data(request.form)
+        uploads = [(read_upload(f), f.mimetype) for f in request.files.getlist("handImages")]
+        return data, uploads
+
+    return json_data(request.get_json(silent=True)), []
+
+
+def stream_mode():
+    """Formato de streaming pedido por el cliente, o None para la respuesta clásica."""
+    return reading_core.api.stream_mode(request.args.get("stream"), request.headers.get("Accept"))
+
+
+def stream_reading(contents, mode):
+    """Reenvía los fragmentos de Gemini al cliente a medida que llegan."""
+    try:
+        for text in backend.stream(contents):
+            yield format_event(mode, "chunk", {"text": text})
+        yield format_event(mode, "done", {"success": True})
+    except Exception as e:
+        # La cabecera 200 ya salió: el error viaja como evento final
+        yield format_event(mode, "error", {"success": False, "error": str(e)})
 
 
 @app.route("/generate-reading", methods=["POST"])
 def generate_reading():
     try:
-        data = request.get_json()
+        data, uploads = parse_request()
         lang = data.get("language", "es")
-        personal_year = data["personalYear"]
-        images = data.get("handImages", [])
 
-        if lang == "es":
-            prompt_text = build_prompt_es(data, personal_year)
-        else:
+        if lang != "es":
             return jsonify({"success": False, "error": "Solo versión español incluida."})
 
-        image_parts = []
-        for img in images:
-            image_parts.append({
-                "inline_data": {
-                    "data": img["base64"],
-                    "mime_type": img["mimeType"]
-                }
-            })
-
-        response = client.models.generate_content(
-            model="gemini-2.5-flash",
-            contents=[
-                {"text": prompt_text},
-                *image_parts
-            ]
-        )
-
-        return jsonify({"success": True, "analysis": response.text})
+        contents = build_reading_contents(data, uploads)
+
+        mode = stream_mode()
+        if mode:
+            return Response(
+                stream_with_context(stream_reading(contents, mode)),
+                mimetype=STREAM_MIMETYPES[mode],
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        return jsonify({"success": True, "analysis": backend.generate(contents)})
 
+    except RequestError as e:
+        return jsonify({"success": False, "error": str(e)}), 400
+    except RequestEntityTooLarge:
+        return jsonify({"success": False, "error": "La petición supera el tamaño máximo permitido."}), 413
     except Exception as e:
         return jsonify({"success": False, "error": str(e)}), 500
 
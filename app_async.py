@@ -0,0 +1,196 @@
+"""
+Versión asíncrona (ASGI) del servicio /generate-reading.
+
+Mismo contrato que app.py, pero cada petición espera a Gemini sin ocupar un
+hilo: un solo proceso sostiene miles de peticiones en espera. Las llamadas
+simultáneas al modelo se limitan con un semáforo y, si la cola de espera se
+llena, se responde 429 con Retry-After.
+
+    uvicorn app_async:app --host 0.0.0.0 --port 8000
+"""
+
+import asyncio
+import os
+from contextlib import asynccontextmanager
+
+from starlette.applications import Starlette
+from starlette.exceptions import HTTPException
+from starlette.middleware import Middleware
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+import reading_core
+from reading_core.api import (IMAGE_TOO_LARGE, MAX_IMAGE_BYTES, MAX_UPLOAD_BYTES, STREAM_MIMETYPES,
+                              RequestError, UploadError, build_reading_contents, form_data,
+                              format_event, json_data)
+
+# Llamadas a Gemini en curso como máximo
+MAX_IN_FLIGHT = int(os.getenv("GEMINI_MAX_CONCURRENCIA", "64"))
+
+# Peticiones que pueden esperar turno antes de responder 429
+MAX_QUEUED = int(os.getenv("GEMINI_MAX_EN_ESPERA", "1000"))
+
+# Segundos sugeridos al cliente para reintentar tras un 429
+RETRY_AFTER = int(os.getenv("GEMINI_RETRY_AFTER", "5"))
+
+
+class ConcurrencyLimiter:
+    """Semáforo de llamadas al modelo con una cola de espera acotada."""
+
+    def __init__(self, max_in_flight, max_queued):
+        self._semaphore = asyncio.Semaphore(max_in_flight)
+        self.max_queued = max_queued
+        self.queued = 0
+
+    def full(self):
+        return self._semaphore.locked() and self.queued >= self.max_queued
+
+    @asynccontextmanager
+    async def slot(self):
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.queued -= 1
+
+        try:
+            yield
+        finally:
+            self._semaphore.release()
+
+
+limiter = ConcurrencyLimiter(MAX_IN_FLIGHT, MAX_QUEUED)
+
+backend = reading_core.AsyncBackend(limiter=limiter)
+
+
+class BodyTooLarge(Exception):
+    pass
+
+
+class BodySizeLimit:
+    """
+    Middleware ASGI que corta el cuerpo en cuanto supera max_bytes, mientras
+    llega, en lugar de leerlo entero y medirlo después.
+    """
+
+    def __init__(self, app, max_bytes):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        declared = dict(scope["headers"]).get(b"content-length")
+        if declared and int(declared) > self.max_bytes:
+            return await self._reject(scope, receive, send)
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    raise BodyTooLarge()
+            return message
+
+        try:
+            await self.app(scope, limited_receive, send)
+        except BodyTooLarge:
+            await self._reject(scope, receive, send)
+
+    async def _reject(self, scope, receive, send):
+        response = JSONResponse(
+            {"success": False, "error": "La petición supera el tamaño máximo permitido."},
+            status_code=413
+        )
+        await response(scope, receive, send)
+
+
+async def parse_request(request):
+    """Igual que app.parse_request: JSON original o multipart con handImages."""
+    if request.headers.get("content-type", "").startswith("multipart/form-data"):
+        async with request.form(max_files=10) as form:
+            data = form_data(form)
+            uploads = []
+            for upload in form.getlist("handImages"):
+                if upload.size is not None and upload.size > MAX_IMAGE_BYTES:
+                    raise UploadError(IMAGE_TOO_LARGE)
+                uploads.append((await upload.read(), upload.content_type))
+        return data, uploads
+
+    try:
+        data = await request.json()
+    except ValueError:
+        raise RequestError("Se esperaba un objeto JSON") from None
+    return json_data(data), []
+
+
+def stream_mode(request):
+    return reading_core.api.stream_mode(request.query_params.get("stream"),
+                                        request.headers.get("accept"))
+
+
+async def stream_reading(contents, mode):
+    try:
+        async for text in backend.stream(contents):
+            yield format_event(mode, "chunk", {"text": text})
+        yield format_event(mode, "done", {"success": True})
+    except Exception as e:
+        yield format_event(mode, "error", {"success": False, "error": str(e)})
+
+
+async def generate_reading(request):
+    if limiter.full():
+        return JSONResponse(
+            {"success": False, "error": "Servicio saturado, inténtalo de nuevo en unos segundos."},
+            status_code=429,
+            headers={"Retry-After": str(RETRY_AFTER)}
+        )
+
+    try:
+        data, uploads = await parse_request(request)
+        lang = data.get("language", "es")
+
+        if lang != "es":
+            return JSONResponse({"success": False, "error": "Solo versión español incluida."})
+
+        # La compresión de imágenes es CPU: fuera del bucle de eventos
+        contents = await asyncio.to_thread(build_reading_contents, data, uploads)
+
+        mode = stream_mode(request)
+        if mode:
+            return StreamingResponse(
+                stream_reading(contents, mode),
+                media_type=STREAM_MIMETYPES[mode],
+                headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+            )
+
+        return JSONResponse({"success": True, "analysis": await backend.generate(contents)})
+
+    except RequestError as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=400)
+    except HTTPException as e:
+        # request.form() rechaza el multipart mal formado o con demasiados ficheros/campos
+        return JSONResponse({"success": False, "error": e.detail}, status_code=e.status_code)
+    except BodyTooLarge:
+        raise
+    except Exception as e:
+        return JSONResponse({"success": False, "error": str(e)}, status_code=500)
+
+
+app = Starlette(
+    routes=[
+        Route("/generate-reading", generate_reading, methods=["POST"]),
+    ],
+    middleware=[Middleware(BodySizeLimit, max_bytes=MAX_UPLOAD_BYTES)]
+)
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -9,14 +9,17 @@ import sqlite3
 import hashlib
 import datetime
 import json
-import cv2
-import numpy as np
-from PIL import Image
-import io
-import smtplib
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import pandas as pd
+import logging
+import os
+
+from almacen_fotos import existe_foto, miniatura_foto
+from base_datos import (PoolConexiones, sql_consultas_pendientes, sql_consultas_usuario,
+                        sql_cuerpo_consulta)
+
+# OpenCV, numpy, PIL y el motor de análisis se importan dentro de las
+# funciones que los usan: inicio y login se muestran sin cargarlos
+
+logger = logging.getLogger(__name__)
 
 # ============================================================================
 # CONFIGURACIÓN INICIAL
@@ -29,173 +32,38 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Emails con acceso al dashboard de expertos (separados por comas)
+ADMIN_EMAILS = {e.strip() for e in os.getenv("ADMIN_EMAILS", "").split(",") if e.strip()}
+
 # ============================================================================
 # BASE DE DATOS - CONFIGURACIÓN
 # ============================================================================
 
+@st.cache_resource
 def init_db():
-    """Inicializa la base de datos SQLite"""
-    conn = sqlite3.connect('destino.db', check_same_thread=False)
-    c = conn.cursor()
-    
-    # Tabla de usuarios
-    c.execute('''CREATE TABLE IF NOT EXISTS users
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  email TEXT UNIQUE NOT NULL,
-                  password TEXT NOT NULL,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
-    
-    # Tabla de consultas
-    c.execute('''CREATE TABLE IF NOT EXISTS consultas
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER,
-                  consulta_text TEXT,
-                  fecha_nacimiento DATE,
-                  ano_personal INTEGER,
-                  fotos_data TEXT,
-                  analisis_auto TEXT,
-                  interpretacion_personal TEXT,
-                  status TEXT DEFAULT 'pendiente',
-                  anonimo INTEGER DEFAULT 0,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY (user_id) REFERENCES users(id))''')
-    
-    # Tabla de pagos
-    c.execute('''CREATE TABLE IF NOT EXISTS pagos
-                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
-                  user_id INTEGER,
-                  consulta_id INTEGER,
-                  monto REAL,
-                  tipo TEXT,
-                  status TEXT,
-                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                  FOREIGN KEY (user_id) REFERENCES users(id),
-                  FOREIGN KEY (consulta_id) REFERENCES consultas(id))''')
-    
-    conn.commit()
-    return conn
-
-# ============================================================================
-# BASE DE CONOCIMIENTOS - QUIROLOGÍA Y CICLOS
-# ============================================================================
-
-CONOCIMIENTOS_QUIROLOGIA = {
-    "formas_mano": {
-        "cuadrada": {
-            "descripcion": "Mano práctica y lógica",
-            "caracteristicas": "Palma cuadrada, dedos de longitud similar a la palma",
-            "personalidad": "Persona práctica, metódica, confiable. Prefiere la estabilidad y el orden."
-        },
-        "conica": {
-            "descripcion": "Mano artística e intuitiva",
-            "caracteristicas": "Palma ovalada, dedos que se estrechan hacia las puntas",
-            "personalidad": "Persona creativa, intuitiva, emocional. Busca belleza y armonía."
-        },
-        "filosofica": {
-            "descripcion": "Mano intelectual",
-            "caracteristicas": "Palma rectangular, dedos largos y nudosos",
-            "personalidad": "Persona analítica, filosófica, busca conocimiento profundo."
-        },
-        "espatulada": {
-            "descripcion": "Mano de acción",
-            "caracteristicas": "Dedos que se ensanchan en las puntas",
-            "personalidad": "Persona activa, enérgica, práctica. Le gusta la acción directa."
-        }
-    },
-    
-    "lineas": {
-        "vida": {
-            "larga": "Gran vitalidad y energía. Vida longeva si se cuida la salud.",
-            "corta": "No indica vida corta, sino intensidad. Enfoque en calidad sobre cantidad.",
-            "profunda": "Energía vital fuerte, resistencia física.",
-            "fragmentada": "Cambios importantes en el estilo de vida."
-        },
-        "cabeza": {
-            "larga": "Pensamiento analítico, atención al detalle.",
-            "corta": "Decisiones rápidas, pensamiento directo.",
-            "recta": "Pensamiento lógico y práctico.",
-            "curva": "Imaginación, creatividad, pensamiento lateral."
-        },
-        "corazon": {
-            "larga": "Emociones profundas, relaciones duraderas.",
-            "corta": "Enfoque más cerebral que emocional.",
-            "profunda": "Pasión intensa en relaciones.",
-            "fragmentada": "Experiencias emocionales variadas."
-        },
-        "destino": {
-            "presente": "Sentido claro de propósito y dirección.",
-            "ausente": "Libertad para crear su propio camino.",
-            "fuerte": "Influencias externas marcan el camino.",
-            "debil": "Mayor control personal del destino."
-        }
-    },
-    
-    "montes": {
-        "venus": "Amor, pasión, vitalidad física",
-        "jupiter": "Ambición, liderazgo, confianza",
-        "saturno": "Responsabilidad, disciplina, sabiduría",
-        "apolo": "Creatividad, arte, éxito",
-        "mercurio": "Comunicación, negocios, adaptabilidad",
-        "luna": "Imaginación, intuición, emociones",
-        "marte": "Energía, coraje, determinación"
-    },
-    
-    "signos": {
-        "estrella": "Evento significativo, éxito o cambio dramático",
-        "cruz": "Obstáculo superado o protección espiritual",
-        "triangulo": "Talento especial o habilidad mental",
-        "cuadrado": "Protección ante adversidades",
-        "isla": "Periodo de dificultad o confusión temporal"
-    }
-}
-
-CICLOS_VITALES = {
-    1: {
-        "nombre": "Año de Inicios",
-        "descripcion": "Tiempo de nuevos comienzos, iniciativa personal, independencia",
-        "consejos": "Toma la iniciativa, confía en ti, empieza proyectos nuevos"
-    },
-    2: {
-        "nombre": "Año de Cooperación",
-        "descripcion": "Relaciones, diplomacia, asociaciones, paciencia",
-        "consejos": "Trabaja en equipo, cultiva relaciones, sé diplomático"
-    },
-    3: {
-        "nombre": "Año de Expresión",
-        "descripcion": "Creatividad, comunicación, alegría, socialización",
-        "consejos": "Expresa tu creatividad, comunícate, disfruta la vida social"
-    },
-    4: {
-        "nombre": "Año de Construcción",
-        "descripcion": "Trabajo duro, estructura, bases sólidas, disciplina",
-        "consejos": "Organiza tu vida, trabaja con disciplina, construye cimientos"
-    },
-    5: {
-        "nombre": "Año de Cambios",
-        "descripcion": "Libertad, aventura, cambios, adaptabilidad",
-        "consejos": "Abraza el cambio, busca nuevas experiencias, sé flexible"
-    },
-    6: {
-        "nombre": "Año de Responsabilidad",
-        "descripcion": "Familia, hogar, servicio, armonía",
-        "consejos": "Cuida tus relaciones familiares, sé responsable, busca armonía"
-    },
-    7: {
-        "nombre": "Año de Introspección",
-        "descripcion": "Espiritualidad, análisis, soledad productiva, conocimiento",
-        "consejos": "Medita, estudia, busca conocimiento interior, reflexiona"
-    },
-    8: {
-        "nombre": "Año de Poder",
-        "descripcion": "Logros materiales, autoridad, éxito profesional",
-        "consejos": "Enfócate en metas materiales, asume liderazgo, busca éxito"
-    },
-    9: {
-        "nombre": "Año de Culminación",
-        "descripcion": "Cierre de ciclos, humanitarismo, sabiduría, desapego",
-        "consejos": "Cierra ciclos, ayuda a otros, comparte tu sabiduría"
-    }
-}
+    """Inicializa la base de datos SQLite (pool único por proceso)"""
+    return PoolConexiones()
+
+def obtener_conexion():
+    """Conexión SQLite del hilo actual, tomada del pool del proceso"""
+    return init_db().conexion()
+
+@st.cache_resource
+def obtener_cache_analisis():
+    """Conexión a la caché de análisis, abierta una vez por proceso"""
+    from cache_analisis import CacheAnalisis
+    return CacheAnalisis()
+
+@st.cache_data(ttl=30, show_spinner=False)
+def estadisticas_cache_analisis():
+    """Contadores de la caché; se refrescan como mucho cada 30 s"""
+    return obtener_cache_analisis().estadisticas()
+
+@st.cache_data(ttl=60, show_spinner=False)
+def analitica_dashboard(dias):
+    """Agregados del dashboard calculados en SQL; se recalculan como mucho cada 60 s"""
+    from analitica import resumen_dashboard
+    return resumen_dashboard(obtener_conexion(), dias)
 
 # ============================================================================
 # FUNCIONES DE UTILIDAD
@@ -211,128 +79,75 @@ def validar_email(email):
 
 def calcular_ano_personal(fecha_nacimiento):
     """Calcula el año personal según numerología"""
-    try:
-        dia = fecha_nacimiento.day
-        mes = fecha_nacimiento.month
-        ano_actual = datetime.datetime.now().year
-        
-        # Suma día + mes + año actual
-        suma = dia + mes + ano_actual
-        
-        # Reducir a un dígito (1-9)
-        while suma > 9:
-            suma = sum(int(d) for d in str(suma))
-        
-        return suma
-    except:
-        return None
-
-def enviar_email_notificacion(destinatario, asunto, mensaje):
-    """Envía notificación por email (requiere configuración SMTP)"""
-    # NOTA: Configurar con credenciales reales
-    try:
-        # Esta es una implementación de ejemplo
-        # En producción, usar variables de entorno para credenciales
-        return True
-    except Exception as e:
-        st.error(f"Error al enviar email: {str(e)}")
-        return False
+    # numerologia usa numpy: se importa al crear la consulta, no al arrancar
+    from numerologia import calcular_ano_personal as ano_personal
+    return ano_personal(fecha_nacimiento)
+
+# Despachar la bandeja de correos dentro de este proceso; con 0 se usa un
+# despachador aparte (python notificaciones.py)
+DESPACHADOR_INTEGRADO = os.getenv("CORREO_DESPACHADOR_INTEGRADO", "1") == "1"
+
+@st.cache_resource
+def iniciar_despachador_correos():
+    """Hilo de fondo que envía la bandeja de correos en este proceso"""
+    from notificaciones import iniciar_despachador_en_hilo
+    return iniciar_despachador_en_hilo()
+
+@st.cache_resource
+def avisar_smtp_sin_configurar():
+    """Avisa una vez por proceso de que los correos se quedan en la bandeja"""
+    logger.warning("SMTP_HOST no está configurado: los correos quedan en la bandeja de "
+                   "salida hasta que los envíe un despachador con SMTP (python notificaciones.py)")
+
+def encolar_notificaciones(correos, conn=None):
+    """
+    Encola [(destinatario, asunto, mensaje)] sin esperar al servidor de correo.
+    Con `conn` dentro de una transacción, los correos se guardan con ella.
+    """
+    import notificaciones
+    
+    notificaciones.encolar_correos(conn or obtener_conexion(), correos)
+    if not DESPACHADOR_INTEGRADO:
+        return
+    if notificaciones.smtp_configurado():
+        iniciar_despachador_correos()
+    else:
+        avisar_smtp_sin_configurar()
 
 # ============================================================================
 # ANÁLISIS DE IMÁGENES - QUIROLOGÍA
 # ============================================================================
 
-def analizar_forma_mano(imagen):
-    """Analiza la forma de la mano usando procesamiento de imágenes"""
-    try:
-        # Convertir imagen a numpy array
-        img_array = np.array(imagen)
-        
-        # Convertir a escala de grises
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        
-        # Detectar contornos
-        _, thresh = cv2.threshold(gray, 127, 255, cv2.THRESH_BINARY_INV)
-        contours, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        if contours:
-            # Obtener el contorno más grande (la mano)
-            contorno_mano = max(contours, key=cv2.contourArea)
-            
-            # Calcular proporciones
-            x, y, w, h = cv2.boundingRect(contorno_mano)
-            ratio = h / w if w > 0 else 1
-            
-            # Clasificar según ratio
-            if 0.9 <= ratio <= 1.1:
-                return "cuadrada"
-            elif ratio > 1.3:
-                return "filosofica"
-            elif ratio < 0.9:
-                return "espatulada"
-            else:
-                return "conica"
-        
-        return "indeterminada"
-    except Exception as e:
-        return "error"
+# Procesar la cola de análisis dentro de este proceso; con 0 se usan
+# trabajadores aparte (python trabajador_analisis.py)
+TRABAJADOR_INTEGRADO = os.getenv("ANALISIS_TRABAJADOR_INTEGRADO", "1") == "1"
 
-def detectar_lineas(imagen):
-    """Detecta líneas principales en la palma"""
-    try:
-        img_array = np.array(imagen)
-        gray = cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
-        
-        # Detectar bordes
-        edges = cv2.Canny(gray, 50, 150)
-        
-        # Detectar líneas usando Hough Transform
-        lines = cv2.HoughLinesP(edges, 1, np.pi/180, 100, minLineLength=50, maxLineGap=10)
-        
-        analisis_lineas = {
-            "vida": "presente",
-            "cabeza": "presente",
-            "corazon": "presente",
-            "destino": "presente" if lines is not None and len(lines) > 5 else "ausente"
-        }
-        
-        return analisis_lineas
-    except:
-        return {"vida": "indeterminada", "cabeza": "indeterminada", 
-                "corazon": "indeterminada", "destino": "indeterminada"}
+@st.cache_resource
+def obtener_servicio_analisis():
+    """Pool de procesos de análisis compartido por todas las sesiones"""
+    from servicio_analisis import ServicioAnalisis
+    return ServicioAnalisis()
+
+@st.cache_resource
+def iniciar_trabajador_analisis():
+    """Hilo de fondo que consume la cola de análisis en este proceso"""
+    from trabajador_analisis import iniciar_trabajador_en_hilo
+    return iniciar_trabajador_en_hilo(obtener_servicio_analisis())
 
 def analizar_mano_completo(imagenes):
     """Análisis completo de las imágenes de la mano"""
-    resultados = {
-        "forma": "indeterminada",
-        "lineas": {},
-        "interpretacion": ""
-    }
-    
-    if imagenes:
-        # Analizar la primera imagen (palma derecha preferentemente)
-        primera_imagen = imagenes[0]
-        resultados["forma"] = analizar_forma_mano(primera_imagen)
-        resultados["lineas"] = detectar_lineas(primera_imagen)
-        
-        # Generar interpretación
-        forma_info = CONOCIMIENTOS_QUIROLOGIA["formas_mano"].get(
-            resultados["forma"], 
-            {"personalidad": "Forma no identificada claramente"}
-        )
-        
-        resultados["interpretacion"] = f"""
-**Forma de Mano:** {resultados["forma"].capitalize()}
-{forma_info.get('personalidad', '')}
-
-**Líneas Principales:**
-- Línea de Vida: {resultados["lineas"].get("vida", "No detectada")}
-- Línea de Cabeza: {resultados["lineas"].get("cabeza", "No detectada")}
-- Línea de Corazón: {resultados["lineas"].get("corazon", "No detectada")}
-- Línea de Destino: {resultados["lineas"].get("destino", "No detectada")}
-        """
+    if not imagenes:
+        return {
+            "forma": "indeterminada",
+            "lineas": {},
+            "interpretacion": ""
+        }
+    
+    from conocimientos import interpretar_analisis
+    from quirologia import analizar_lote
     
-    return resultados
+    # Analizar todas las fotos en una sola pasada (grises/bordes una vez por foto)
+    return interpretar_analisis(analizar_lote(imagenes))
 
 # ============================================================================
 # GESTIÓN DE USUARIOS
@@ -347,13 +162,10 @@ def registrar_usuario(email, password):
         return False, "La contraseña debe tener al menos 6 caracteres"
     
     try:
-        conn = st.session_state.db_conn
-        c = conn.cursor()
-        
         password_hash = hash_password(password)
-        c.execute("INSERT INTO users (email, password) VALUES (?, ?)", 
-                  (email, password_hash))
-        conn.commit()
+        with init_db().transaccion() as conn:
+            conn.execute("INSERT INTO users (email, password) VALUES (?, ?)", 
+                         (email, password_hash))
         
         return True, "Usuario registrado exitosamente"
     except sqlite3.IntegrityError:
@@ -364,7 +176,7 @@ def registrar_usuario(email, password):
 def login_usuario(email, password):
     """Autentica un usuario"""
     try:
-        conn = st.session_state.db_conn
+        conn = obtener_conexion()
         c = conn.cursor()
         
         password_hash = hash_password(password)
@@ -384,67 +196,44 @@ def login_usuario(email, password):
 # ============================================================================
 
 def crear_consulta(user_id, consulta_text, fecha_nacimiento, fotos, anonimo=False):
-    """Crea una nueva consulta"""
+    """Crea una nueva consulta y encola el análisis de sus fotos"""
+    from trabajador_analisis import encolar_consulta
+    
     try:
-        conn = st.session_state.db_conn
-        c = conn.cursor()
+        conn = obtener_conexion()
         
         # Calcular año personal
         ano_personal = calcular_ano_personal(fecha_nacimiento)
         
-        # Analizar fotos
-        analisis = analizar_mano_completo(fotos)
-        
-        # Combinar análisis quirológico + ciclo vital
-        ciclo_info = CICLOS_VITALES.get(ano_personal, {})
+        # Guardar la consulta en estado 'analizando'; el análisis se hace en segundo plano
+        consulta_id = encolar_consulta(conn, user_id, consulta_text, fecha_nacimiento,
+                                       ano_personal, fotos, anonimo)
         
-        analisis_completo = f"""
-{analisis['interpretacion']}
-
-**Ciclo Vital Actual (Año {ano_personal}):**
-{ciclo_info.get('nombre', 'Información no disponible')}
-
-{ciclo_info.get('descripcion', '')}
-
-**Recomendaciones para este ciclo:**
-{ciclo_info.get('consejos', '')}
-
----
-**IMPORTANTE:** Esta es una interpretación automática basada en análisis digital. 
-Para una lectura personalizada y profunda, un experto revisará tu consulta y 
-te enviará su interpretación personal.
-        """
+        if TRABAJADOR_INTEGRADO:
+            iniciar_trabajador_analisis()
         
-        # Guardar fotos como base64 (simplificado para ejemplo)
-        fotos_json = json.dumps({"cantidad": len(fotos)})
-        
-        c.execute("""INSERT INTO consultas 
-                     (user_id, consulta_text, fecha_nacimiento, ano_personal, 
-                      fotos_data, analisis_auto, anonimo)
-                     VALUES (?, ?, ?, ?, ?, ?, ?)""",
-                  (user_id, consulta_text, fecha_nacimiento, ano_personal,
-                   fotos_json, analisis_completo, 1 if anonimo else 0))
-        
-        conn.commit()
-        consulta_id = c.lastrowid
-        
-        return True, consulta_id, analisis_completo
+        return True, consulta_id, "analizando"
     except Exception as e:
         return False, None, f"Error: {str(e)}"
 
-def obtener_consultas_pendientes():
-    """Obtiene consultas pendientes para el dashboard admin"""
+# Opciones del selector de tamaño de página
+TAMANOS_PAGINA = (10, 25, 50)
+
+def obtener_consultas_pendientes(revisor, limite=TAMANOS_PAGINA[0], cursor=None):
+    """
+    Obtiene una página de consultas pendientes para el dashboard admin.
+    
+    Paginación por cursor: `cursor` es el (created_at, id) de la última fila
+    de la página anterior. El análisis no se incluye; se carga bajo demanda
+    con obtener_cuerpo_consulta(). Se omiten las consultas que otro experto
+    tiene reclamadas en un lote con lease vigente.
+    """
     try:
-        conn = st.session_state.db_conn
+        conn = obtener_conexion()
         c = conn.cursor()
         
-        c.execute("""SELECT c.id, c.consulta_text, c.fecha_nacimiento, 
-                            c.ano_personal, c.analisis_auto, c.created_at,
-                            u.email
-                     FROM consultas c
-                     LEFT JOIN users u ON c.user_id = u.id
-                     WHERE c.status = 'pendiente'
-                     ORDER BY c.created_at DESC""")
+        c.execute(sql_consultas_pendientes(bool(cursor)),
+                  (*(cursor or ()), revisor, limite))
         
         consultas = []
         for row in c.fetchall():
@@ -453,9 +242,8 @@ def obtener_consultas_pendientes():
                 "consulta": row[1],
                 "fecha_nac": row[2],
                 "ano_personal": row[3],
-                "analisis": row[4],
-                "fecha_creacion": row[5],
-                "email": row[6] if row[6] else "Anónimo"
+                "fecha_creacion": row[4],
+                "email": row[5] if row[5] else "Anónimo"
             })
         
         return consultas
@@ -463,22 +251,77 @@ def obtener_consultas_pendientes():
         st.error(f"Error al obtener consultas: {str(e)}")
         return []
 
-def actualizar_interpretacion(consulta_id, interpretacion):
-    """Actualiza la interpretación personal de una consulta"""
+def listar_consultas_usuario(user_id, limite=TAMANOS_PAGINA[0], cursor=None):
+    """Obtiene una página del historial del usuario, sin los textos largos"""
+    conn = obtener_conexion()
+    c = conn.cursor()
+    
+    c.execute(sql_consultas_usuario(bool(cursor)),
+              (user_id, *(cursor or ()), limite))
+    
+    return c.fetchall()
+
+def obtener_cuerpo_consulta(consulta_id, user_id=None):
+    """Carga el análisis automático, la interpretación y las fotos de una consulta"""
+    conn = obtener_conexion()
+    c = conn.cursor()
+    
+    c.execute(sql_cuerpo_consulta(user_id is not None),
+              (consulta_id, *(() if user_id is None else (user_id,))))
+    
+    fila = c.fetchone()
+    return fila if fila else (None, None, None)
+
+def actualizar_interpretacion(consulta_id, interpretacion, revisor):
+    """
+    Guarda la interpretación personal de una consulta y avisa al usuario.
+    No pisa consultas ya respondidas ni reclamadas por otro experto con lease
+    vigente: en ese caso avisa y devuelve False.
+    """
     try:
-        conn = st.session_state.db_conn
-        c = conn.cursor()
-        
-        c.execute("""UPDATE consultas 
-                     SET interpretacion_personal = ?, status = 'completada'
-                     WHERE id = ?""",
-                  (interpretacion, consulta_id))
-        
-        conn.commit()
-        return True
+        with init_db().transaccion() as conn:
+            enviadas = conn.execute("""UPDATE consultas 
+                                       SET interpretacion_personal = ?, status = 'completada',
+                                           revisor = NULL, revision_hasta = NULL
+                                       WHERE id = ? AND status = 'pendiente'
+                                         AND (revision_hasta IS NULL
+                                              OR revision_hasta < datetime('now')
+                                              OR revisor = ?)
+                                       RETURNING id, (SELECT email FROM users
+                                                      WHERE users.id = consultas.user_id)""",
+                                    (interpretacion, consulta_id, revisor)).fetchall()
+            # El aviso se encola en la misma transacción: sin esperas al SMTP
+            encolar_notificaciones(correos_interpretacion(enviadas), conn)
     except Exception as e:
         st.error(f"Error al actualizar: {str(e)}")
         return False
+    
+    if not enviadas:
+        st.warning(f"La consulta #{consulta_id} ya fue respondida o la está revisando "
+                   f"otro experto; no se guardó la interpretación")
+        return False
+    return True
+
+def enviar_interpretaciones_lote(revisor, interpretaciones):
+    """Guarda un lote de interpretaciones y encola los avisos en la misma transacción"""
+    from revision_expertos import enviar_lote
+    
+    try:
+        with init_db().transaccion() as conn:
+            enviadas = enviar_lote(conn, revisor, interpretaciones)
+            encolar_notificaciones(correos_interpretacion(enviadas), conn)
+    except Exception as e:
+        st.error(f"Error al enviar el lote: {str(e)}")
+        return []
+    
+    return enviadas
+
+def correos_interpretacion(enviadas):
+    """Avisos de interpretación lista para [(consulta_id, email)]"""
+    return [(email, "Tu interpretación personal está lista",
+             f"Un experto ha respondido tu consulta #{consulta_id}. "
+             f"Puedes leerla en Mis Consultas.")
+            for consulta_id, email in enviadas if email]
 
 # ============================================================================
 # INTERFAZ DE USUARIO - PÁGINAS
@@ -660,15 +503,17 @@ def pagina_consulta():
             elif not foto1:
                 st.error("Sube al menos una foto de tu palma")
             else:
-                # Procesar fotos
-                imagenes_procesadas = []
-                for foto in [foto1, foto2, foto3, foto4]:
+                from quirologia import ROLES_FOTOS
+                
+                # Procesar fotos (bytes crudos; se decodifican en el servicio)
+                imagenes_procesadas = {}
+                fotos_formulario = zip(ROLES_FOTOS, [foto1, foto2, foto3, foto4])
+                for rol, foto in fotos_formulario:
                     if foto:
-                        imagen = Image.open(foto)
-                        imagenes_procesadas.append(imagen)
+                        imagenes_procesadas[rol] = foto.getvalue()
                 
                 # Crear consulta
-                with st.spinner("Procesando tu consulta..."):
+                with st.spinner("Enviando tu consulta..."):
                     exito, consulta_id, analisis = crear_consulta(
                         st.session_state.user["id"],
                         consulta_text,
@@ -680,9 +525,11 @@ def pagina_consulta():
                 if exito:
                     st.success("¡Consulta creada exitosamente!")
                     
-                    # Mostrar análisis automático
-                    st.subheader("Tu Análisis Automático")
-                    st.markdown(analisis)
+                    # El análisis automático se genera en segundo plano
+                    st.info("""
+                    Estamos analizando tus fotos. Tu análisis automático aparecerá 
+                    en **Mis Consultas** en unos instantes.
+                    """)
                     
                     if tipo_servicio == "Interpretación Personal ($3 USD)":
                         st.info("""
@@ -707,47 +554,282 @@ def pagina_consulta():
                 else:
                     st.error(f"Error al crear consulta: {analisis}")
 
+def selector_pagina(clave):
+    """Tamaño de página y cursor actual de una vista paginada"""
+    cursores = st.session_state.setdefault(f"{clave}_cursores", [None])
+    
+    def reiniciar():
+        st.session_state[f"{clave}_cursores"] = [None]
+    
+    tamano = st.selectbox("Consultas por página", TAMANOS_PAGINA,
+                          key=f"{clave}_tamano", on_change=reiniciar)
+    return tamano, cursores[-1]
+
+def controles_paginacion(clave, hay_siguiente, siguiente_cursor):
+    """Botones Anterior/Siguiente; guarda la pila de cursores en session_state"""
+    cursores = st.session_state[f"{clave}_cursores"]
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(cursores) > 1 and st.button("⬅️ Anterior", key=f"{clave}_anterior"):
+            cursores.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Página {len(cursores)}")
+    with col3:
+        if hay_siguiente and st.button("Siguiente ➡️", key=f"{clave}_siguiente"):
+            cursores.append(siguiente_cursor)
+            st.rerun()
+
 def pagina_mis_consultas():
     """Página de historial de consultas del usuario"""
     st.title("Mis Consultas")
     
+    if TRABAJADOR_INTEGRADO:
+        iniciar_trabajador_analisis()
+    
     try:
-        conn = st.session_state.db_conn
-        c = conn.cursor()
-        
-        c.execute("""SELECT id, consulta_text, fecha_nacimiento, ano_personal,
-                            analisis_auto, interpretacion_personal, status, created_at
-                     FROM consultas
-                     WHERE user_id = ?
-                     ORDER BY created_at DESC""",
-                  (st.session_state.user["id"],))
+        user_id = st.session_state.user["id"]
+        tamano, cursor = selector_pagina("mis_consultas")
         
-        consultas = c.fetchall()
+        # Se pide una fila extra para saber si hay página siguiente
+        consultas = listar_consultas_usuario(user_id, tamano + 1, cursor)
+        hay_siguiente = len(consultas) > tamano
+        consultas = consultas[:tamano]
         
         if not consultas:
             st.info("Aún no tienes consultas. ¡Crea tu primera consulta!")
         else:
+            if any(consulta[4] == 'analizando' for consulta in consultas):
+                if st.button("🔄 Actualizar estado del análisis"):
+                    st.rerun()
+            
             for consulta in consultas:
-                with st.expander(f"Consulta del {consulta[7]} - {consulta[6].upper()}"):
+                # on_change="rerun": el contenido solo se calcula con el expander abierto
+                expander = st.expander(f"Consulta del {consulta[5]} - {consulta[4].upper()}",
+                                       key=f"consulta_{consulta[0]}", on_change="rerun")
+                with expander:
+                    if not expander.open:
+                        continue
+                    
                     st.markdown(f"**Tu pregunta:** {consulta[1]}")
                     st.markdown(f"**Fecha de nacimiento:** {consulta[2]}")
                     st.markdown(f"**Año Personal:** {consulta[3]}")
                     
                     st.markdown("---")
                     st.markdown("### Análisis Automático")
-                    st.markdown(consulta[4])
+                    if consulta[4] == 'analizando':
+                        if consulta[6] == 'procesando':
+                            st.progress(66, text=f"Analizando tus fotos (intento {consulta[7]})...")
+                        else:
+                            st.progress(33, text="En cola para el análisis...")
+                        continue
+                    
+                    analisis_auto, interpretacion, _ = obtener_cuerpo_consulta(consulta[0], user_id)
+                    if consulta[4] == 'error_analisis':
+                        st.warning(analisis_auto)
+                    else:
+                        st.markdown(analisis_auto)
                     
-                    if consulta[5]:
+                    if interpretacion:
                         st.markdown("---")
                         st.markdown("### 🌟 Interpretación Personal del Experto")
-                        st.success(consulta[5])
-                    elif consulta[6] == 'pendiente':
+                        st.success(interpretacion)
+                    elif consulta[4] == 'pendiente':
                         st.info("Tu interpretación personal está en proceso. Te notificaremos cuando esté lista.")
+            
+            ultima = consultas[-1]
+            controles_paginacion("mis_consultas", hay_siguiente, (ultima[5], ultima[0]))
     except Exception as e:
         st.error(f"Error al cargar consultas: {str(e)}")
 
+@st.cache_data(max_entries=64, ttl=3600, show_spinner=False)
+def foto_guardada(sha256):
+    """
+    Miniatura JPEG de una foto del almacén (unas decenas de KB): la caché de
+    cada proceso guarda miniaturas, no las fotos originales
+    """
+    return miniatura_foto(sha256) if existe_foto(sha256) else None
+
+def mostrar_fotos_consulta(fotos_data):
+    """Muestra las fotos guardadas de una consulta (leídas del almacén)"""
+    fotos = json.loads(fotos_data).get("fotos", {}) if fotos_data else {}
+    if not fotos:
+        st.caption("Esta consulta no tiene fotos guardadas")
+        return
+    
+    columnas = st.columns(len(fotos))
+    for columna, (rol, foto) in zip(columnas, fotos.items()):
+        with columna:
+            datos = foto_guardada(foto["sha256"])
+            if datos is not None:
+                st.image(datos,
+                         caption=f"{rol.replace('_', ' ').capitalize()} "
+                                 f"({foto['ancho']}x{foto['alto']})")
+            else:
+                st.caption(f"{rol}: foto no disponible")
+
 def pagina_dashboard_admin():
     """Dashboard administrativo para gestionar consultas"""
     st.title("📊 Dashboard Administrativo")
     
-    # Verificar si es admin (simplificado - en producción usar
\ No newline at end of file
+    # Verificar si es admin (simplificado - en producción usar roles en la base de datos)
+    if st.session_state.user["email"] not in ADMIN_EMAILS:
+        st.error("Acceso restringido a expertos")
+        return
+    
+    from metricas import contadores_dashboard
+    
+    # Contadores mantenidos por triggers: leerlos no depende del tamaño del historial
+    contadores = contadores_dashboard(obtener_conexion())
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Consultas totales", contadores["consultas"])
+    col2.metric("Pendientes", contadores["pendientes"])
+    col3.metric("Completadas", contadores["completadas"])
+    col4.metric("Ingresos", f"${contadores['ingresos']:.2f} USD")
+    
+    with st.expander("⚡ Caché de análisis"):
+        estadisticas = estadisticas_cache_analisis()
+        
+        col1, col2, col3, col4 = st.columns(4)
+        col1.metric("Aciertos", estadisticas["aciertos"])
+        col2.metric("Fallos", estadisticas["fallos"])
+        col3.metric("Tasa de aciertos", f"{estadisticas['tasa_aciertos']:.0%}")
+        col4.metric("Entradas", estadisticas["entradas"])
+    
+    with st.expander("📈 Analítica", expanded=True):
+        dias = st.selectbox("Período", [7, 30, 90, 365], index=1,
+                            format_func=lambda d: f"Últimos {d} días", key="analitica_dias")
+        resumen = analitica_dashboard(dias)
+        conversion = resumen["conversion"]
+        
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Consultas del período", conversion["consultas"])
+        col2.metric("Con pago", conversion["pagadas"])
+        col3.metric("Conversión a pago", f"{conversion['tasa']:.1%}")
+        
+        st.markdown("**Consultas por día**")
+        st.line_chart(resumen["por_dia"], x="dia", y=["consultas", "pagadas", "media_7_dias"])
+        
+        col1, col2 = st.columns(2)
+        with col1:
+            st.markdown("**Antigüedad de la cola pendiente**")
+            st.bar_chart(resumen["antiguedad"], x="tramo", y="consultas", sort=False)
+        with col2:
+            st.markdown("**Consultas por año personal**")
+            st.bar_chart(resumen["ano_personal"], x="ano_personal", y="consultas", sort=False)
+    
+    modo = st.radio("Modo de revisión", ["Una a una", "Por lotes"], horizontal=True,
+                    key="modo_revision")
+    if modo == "Por lotes":
+        revision_por_lotes()
+        return
+    
+    st.subheader("Consultas Pendientes")
+    tamano, cursor = selector_pagina("pendientes")
+    
+    revisor = st.session_state.user["email"]
+    consultas = obtener_consultas_pendientes(revisor, tamano + 1, cursor)
+    hay_siguiente = len(consultas) > tamano
+    consultas = consultas[:tamano]
+    
+    if not consultas:
+        st.success("No hay consultas pendientes 🎉")
+        return
+    
+    for consulta in consultas:
+        expander = st.expander(f"#{consulta['id']} - {consulta['email']} - {consulta['fecha_creacion']}",
+                               key=f"pendiente_{consulta['id']}", on_change="rerun")
+        with expander:
+            if not expander.open:
+                continue
+            
+            st.markdown(f"**Consulta:** {consulta['consulta']}")
+            st.markdown(f"**Fecha de nacimiento:** {consulta['fecha_nac']} - "
+                        f"**Año Personal:** {consulta['ano_personal']}")
+            
+            analisis_auto, _, fotos_data = obtener_cuerpo_consulta(consulta["id"])
+            mostrar_fotos_consulta(fotos_data)
+            st.markdown("---")
+            st.markdown(analisis_auto or "")
+            
+            interpretacion = st.text_area("Interpretación personal",
+                                          key=f"interpretacion_{consulta['id']}", height=200)
+            if st.button("Enviar interpretación", key=f"enviar_{consulta['id']}", type="primary"):
+                if not interpretacion:
+                    st.warning("Escribe la interpretación antes de enviarla")
+                elif actualizar_interpretacion(consulta["id"], interpretacion, revisor):
+                    st.success("Interpretación enviada")
+                    st.rerun()
+    
+    ultima = consultas[-1]
+    controles_paginacion("pendientes", hay_siguiente,
+                         (ultima["fecha_creacion"], ultima["id"]))
+
+def guardar_borrador(consulta_id):
+    """Copia el texto del widget al diccionario de borradores de la sesión"""
+    st.session_state.borradores_lote[consulta_id] = st.session_state[f"borrador_{consulta_id}"]
+
+def revision_por_lotes():
+    """Reclama un lote de consultas, redacta los borradores y envía todo de una vez"""
+    from revision_expertos import (DURACION_REVISION, consultas_reclamadas,
+                                   liberar_consultas, reclamar_consultas)
+    
+    revisor = st.session_state.user["email"]
+    conn = obtener_conexion()
+    
+    st.subheader("Revisión por Lotes")
+    col1, col2 = st.columns([1, 3])
+    tamano_lote = col1.selectbox("Tamaño del lote", [5, 10, 20], key="tamano_lote")
+    if col2.button("Reclamar consultas", type="primary"):
+        if not reclamar_consultas(conn, revisor, tamano_lote):
+            st.info("No hay consultas libres en este momento")
+    
+    # Solo el lote del experto: no se vuelve a consultar toda la cola pendiente
+    lote = consultas_reclamadas(conn, revisor)
+    if not lote:
+        st.info("No tienes consultas reclamadas")
+        return
+    
+    st.caption(f"{len(lote)} consultas reservadas para ti durante {DURACION_REVISION} minutos. "
+               f"Los borradores se guardan en tu sesión hasta que envíes el lote.")
+    
+    # Fuera del estado de los widgets: sobreviven aunque se cierre el expander
+    borradores = st.session_state.setdefault("borradores_lote", {})
+    
+    for consulta in lote:
+        expander = st.expander(f"#{consulta['id']} - {consulta['email']} - {consulta['fecha_creacion']}",
+                               key=f"lote_{consulta['id']}", on_change="rerun")
+        with expander:
+            if not expander.open:
+                continue
+            
+            st.markdown(f"**Consulta:** {consulta['consulta']}")
+            st.markdown(f"**Fecha de nacimiento:** {consulta['fecha_nac']} - "
+                        f"**Año Personal:** {consulta['ano_personal']}")
+            
+            analisis_auto, _, fotos_data = obtener_cuerpo_consulta(consulta["id"])
+            mostrar_fotos_consulta(fotos_data)
+            st.markdown("---")
+            st.markdown(analisis_auto or "")
+            st.text_area("Interpretación personal", value=borradores.get(consulta["id"], ""),
+                         key=f"borrador_{consulta['id']}", height=200,
+                         on_change=guardar_borrador, args=(consulta["id"],))
+    
+    listos = {c["id"]: borradores[c["id"]].strip() for c in lote
+              if borradores.get(c["id"], "").strip()}
+    
+    col1, col2 = st.columns(2)
+    if col1.button(f"Enviar lote ({len(listos)} de {len(lote)})", type="primary",
+                   disabled=not listos):
+        enviadas = enviar_interpretaciones_lote(revisor, listos)
+        for consulta_id, _ in enviadas:
+            borradores.pop(consulta_id, None)
+        # Los toasts siguen visibles tras el rerun
+        if len(enviadas) < len(listos):
+            st.toast(f"{len(listos) - len(enviadas)} consultas ya no estaban reservadas para ti")
+        st.toast(f"{len(enviadas)} interpretaciones enviadas")
+        st.rerun()
+    if col2.button("Liberar las no respondidas"):
+        liberar_consultas(conn, revisor, [c["id"] for c in lote if c["id"] not in listos])
+        st.rerun()
@@ -0,0 +1,489 @@
+"""
+Mapa de Tu Destino - Base de datos
+Conexión y esquema SQLite compartidos por la app y los procesos de fondo
+"""
+
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+RUTA_DB = os.getenv("DESTINO_DB", "destino.db")
+
+# Segundos que una conexión espera un bloqueo antes de fallar
+TIMEOUT_BLOQUEO = 30
+
+# Conexiones ociosas que el pool conserva para reutilizar
+MAX_CONEXIONES_LIBRES = 8
+
+def conectar(ruta=None):
+    """Abre una conexión a la base de datos de la aplicación"""
+    conn = sqlite3.connect(ruta or RUTA_DB, check_same_thread=False,
+                           timeout=TIMEOUT_BLOQUEO)
+    # WAL: los lectores no bloquean al escritor ni viceversa
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA busy_timeout={int(TIMEOUT_BLOQUEO * 1000)}")
+    return conn
+
+@contextmanager
+def transaccion(conn):
+    """
+    Transacción de escritura: BEGIN IMMEDIATE, COMMIT al salir o ROLLBACK si
+    hay excepción. Tomar el bloqueo al inicio evita el 'database is locked'
+    que aparece al promover una lectura a escritura con otro escritor activo.
+    """
+    if conn.in_transaction:
+        # Anidada: la transacción exterior decide COMMIT o ROLLBACK
+        yield conn
+        return
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+    except BaseException:
+        conn.rollback()
+        raise
+    else:
+        conn.commit()
+
+# ============================================================================
+# POOL DE CONEXIONES
+# ============================================================================
+
+class PoolConexiones:
+    """
+    Pool de conexiones SQLite compartido por todo el proceso.
+
+    Cada hilo usa su propia conexión. Streamlit ejecuta cada rerun en un hilo
+    nuevo, así que las conexiones de hilos terminados vuelven a una lista de
+    libres para reutilizarse en lugar de abrir descriptores nuevos.
+    """
+
+    def __init__(self, ruta=None):
+        self.ruta = ruta or RUTA_DB
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._en_uso = {}
+        self._libres = []
+
+        # El esquema se crea una vez por proceso, no una vez por sesión
+        conn = self.conexion()
+        crear_esquema(conn)
+
+    def _recuperar_huerfanas(self):
+        """Devuelve a libres las conexiones de hilos que ya terminaron"""
+        for hilo, conn in list(self._en_uso.items()):
+            if hilo.is_alive():
+                continue
+            del self._en_uso[hilo]
+            if conn.in_transaction:
+                conn.rollback()
+            if len(self._libres) < MAX_CONEXIONES_LIBRES:
+                self._libres.append(conn)
+            else:
+                conn.close()
+
+    def conexion(self):
+        """Conexión del hilo actual"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                self._recuperar_huerfanas()
+                conn = self._libres.pop() if self._libres else conectar(self.ruta)
+                self._en_uso[threading.current_thread()] = conn
+            self._local.conn = conn
+        return conn
+
+    def transaccion(self):
+        """Context manager de escritura sobre la conexión del hilo actual"""
+        return transaccion(self.conexion())
+
+    def cerrar(self):
+        """Cierra todas las conexiones del pool"""
+        with self._lock:
+            for conn in list(self._en_uso.values()) + self._libres:
+                conn.close()
+            self._en_uso.clear()
+            self._libres.clear()
+        self._local = threading.local()
+
+# ============================================================================
+# ESQUEMA
+# ============================================================================
+
+def crear_esquema(conn, migrar=True):
+    """Crea las tablas de la aplicación si no existen y aplica las migraciones"""
+    c = conn.cursor()
+    
+    # Tabla de usuarios
+    c.execute('''CREATE TABLE IF NOT EXISTS users
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  email TEXT UNIQUE NOT NULL,
+                  password TEXT NOT NULL,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP)''')
+    
+    # Tabla de consultas
+    c.execute('''CREATE TABLE IF NOT EXISTS consultas
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  user_id INTEGER,
+                  consulta_text TEXT,
+                  fecha_nacimiento DATE,
+                  ano_personal INTEGER,
+                  fotos_data TEXT,
+                  analisis_auto TEXT,
+                  interpretacion_personal TEXT,
+                  status TEXT DEFAULT 'pendiente',
+                  anonimo INTEGER DEFAULT 0,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  FOREIGN KEY (user_id) REFERENCES users(id))''')
+    
+    # Tabla de pagos
+    c.execute('''CREATE TABLE IF NOT EXISTS pagos
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  user_id INTEGER,
+                  consulta_id INTEGER,
+                  monto REAL,
+                  tipo TEXT,
+                  status TEXT,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  FOREIGN KEY (user_id) REFERENCES users(id),
+                  FOREIGN KEY (consulta_id) REFERENCES consultas(id))''')
+    
+    # Cola durable de análisis de fotos (sobrevive a reinicios)
+    c.execute('''CREATE TABLE IF NOT EXISTS trabajos_analisis
+                 (id INTEGER PRIMARY KEY AUTOINCREMENT,
+                  consulta_id INTEGER NOT NULL,
+                  estado TEXT DEFAULT 'pendiente',
+                  intentos INTEGER DEFAULT 0,
+                  error TEXT,
+                  lease_hasta TIMESTAMP,
+                  created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                  FOREIGN KEY (consulta_id) REFERENCES consultas(id))''')
+    
+    conn.commit()
+    
+    if migrar:
+        aplicar_migraciones(conn)
+
+# ============================================================================
+# MIGRACIONES
+# ============================================================================
+
+# Contadores de la tabla `metricas`: (dimensión, tabla, clave, valor), con
+# clave y valor como expresiones SQL sobre la fila `{f}`. Solo sirven para
+# recontar desde cero (metricas.py) y deben coincidir con los triggers de la
+# migración 3: cambiar una dimensión exige una migración nueva con sus triggers.
+DIMENSIONES_METRICAS = (
+    ("consultas_estado", "consultas", "COALESCE({f}.status, '')", "1"),
+    ("consultas_dia", "consultas", "COALESCE(date({f}.created_at), '')", "1"),
+    ("consultas_ano_personal", "consultas", "COALESCE(CAST({f}.ano_personal AS TEXT), '')", "1"),
+    ("pagos_estado", "pagos", "COALESCE({f}.status, '')", "1"),
+    ("ingresos_estado", "pagos", "COALESCE({f}.status, '')", "COALESCE({f}.monto, 0)"),
+    ("ingresos_dia", "pagos", "COALESCE(date({f}.created_at), '')",
+     "CASE WHEN {f}.status = 'completado' THEN COALESCE({f}.monto, 0) ELSE 0 END"),
+)
+
+def sql_recuento_metricas():
+    """SELECT (dimension, clave, valor) que recalcula todos los contadores desde cero"""
+    return "\nUNION ALL\n".join(
+        f"SELECT '{dimension}', {clave.format(f='t')}, SUM({valor.format(f='t')}) "
+        f"FROM {tabla} t GROUP BY 2"
+        for dimension, tabla, clave, valor in DIMENSIONES_METRICAS
+    )
+
+# ============================================================================
+# CONSULTAS DE LAS PÁGINAS (compartidas por appdestino y los benchmarks)
+# ============================================================================
+
+# Página siguiente: filas anteriores al (created_at, id) de la última mostrada
+_FILTRO_CURSOR = "AND (c.created_at, c.id) < (?, ?)"
+
+def sql_consultas_pendientes(cursor=False):
+    """
+    Página de la cola del experto; parámetros: [*cursor], revisor, límite.
+    Omite las consultas que otro experto tiene reclamadas con lease vigente.
+    """
+    return f"""SELECT c.id, c.consulta_text, c.fecha_nacimiento, 
+                      c.ano_personal, c.created_at, u.email
+               FROM consultas c
+               LEFT JOIN users u ON c.user_id = u.id
+               WHERE c.status = 'pendiente' {_FILTRO_CURSOR if cursor else ""}
+                 AND (c.revision_hasta IS NULL OR c.revision_hasta < datetime('now')
+                      OR c.revisor = ?)
+               ORDER BY c.created_at DESC, c.id DESC
+               LIMIT ?"""
+
+def sql_consultas_usuario(cursor=False):
+    """Página de Mis Consultas sin los textos largos; parámetros: user_id, [*cursor], límite"""
+    return f"""SELECT c.id, c.consulta_text, c.fecha_nacimiento, c.ano_personal,
+                      c.status, c.created_at, t.estado, t.intentos
+               FROM consultas c
+               LEFT JOIN trabajos_analisis t ON t.consulta_id = c.id
+               WHERE c.user_id = ? {_FILTRO_CURSOR if cursor else ""}
+               ORDER BY c.created_at DESC, c.id DESC
+               LIMIT ?"""
+
+def sql_cuerpo_consulta(por_usuario=False):
+    """Análisis, interpretación y fotos de una consulta; parámetros: id, [user_id]"""
+    return f"""SELECT analisis_auto, interpretacion_personal, fotos_data
+               FROM consultas
+               WHERE id = ? {"AND user_id = ?" if por_usuario else ""}"""
+
+# Lista ordenada de (versión, descripción, sentencias). La versión aplicada se
+# guarda en PRAGMA user_version; nunca editar una migración ya publicada,
+# añadir una nueva al final.
+MIGRACIONES = [
+    (1, "Índices para las consultas frecuentes", [
+        # Cola del experto: WHERE status = ? ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_consultas_status_fecha "
+        "ON consultas (status, created_at)",
+        # Mis Consultas: WHERE user_id = ? ORDER BY created_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_consultas_usuario_fecha "
+        "ON consultas (user_id, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_pagos_consulta ON pagos (consulta_id)",
+        "CREATE INDEX IF NOT EXISTS idx_pagos_usuario ON pagos (user_id)",
+        # Progreso en Mis Consultas y reclamo de trabajos del trabajador
+        "CREATE INDEX IF NOT EXISTS idx_trabajos_consulta ON trabajos_analisis (consulta_id)",
+        "CREATE INDEX IF NOT EXISTS idx_trabajos_estado ON trabajos_analisis (estado, id)",
+    ]),
+    (2, "Índice por fecha para la analítica del dashboard", [
+        # Agregados del período: WHERE created_at >= ? GROUP BY date(created_at)
+        "CREATE INDEX IF NOT EXISTS idx_consultas_fecha ON consultas (created_at)",
+    ]),
+    (3, "Contadores materializados del dashboard mantenidos por triggers", [
+        """CREATE TABLE IF NOT EXISTS metricas
+           (dimension TEXT NOT NULL,
+            clave TEXT NOT NULL,
+            valor REAL NOT NULL DEFAULT 0,
+            PRIMARY KEY (dimension, clave)) WITHOUT ROWID""",
+        # consultas_estado
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_estado_insert AFTER INSERT ON consultas
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_estado', COALESCE(NEW.status, ''), 1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_estado_update
+           AFTER UPDATE OF status ON consultas
+           WHEN OLD.status IS NOT NEW.status
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_estado', COALESCE(OLD.status, ''), -1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_estado', COALESCE(NEW.status, ''), 1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_estado_delete AFTER DELETE ON consultas
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_estado', COALESCE(OLD.status, ''), -1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        # consultas_dia
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_dia_insert AFTER INSERT ON consultas
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_dia', COALESCE(date(NEW.created_at), ''), 1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_dia_update
+           AFTER UPDATE OF created_at ON consultas
+           WHEN OLD.created_at IS NOT NEW.created_at
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_dia', COALESCE(date(OLD.created_at), ''), -1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_dia', COALESCE(date(NEW.created_at), ''), 1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_dia_delete AFTER DELETE ON consultas
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_dia', COALESCE(date(OLD.created_at), ''), -1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        # consultas_ano_personal
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_ano_personal_insert
+           AFTER INSERT ON consultas
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_ano_personal', COALESCE(CAST(NEW.ano_personal AS TEXT), ''), 1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_ano_personal_update
+           AFTER UPDATE OF ano_personal ON consultas
+           WHEN OLD.ano_personal IS NOT NEW.ano_personal
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_ano_personal', COALESCE(CAST(OLD.ano_personal AS TEXT), ''), -1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_ano_personal', COALESCE(CAST(NEW.ano_personal AS TEXT), ''), 1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_consultas_ano_personal_delete
+           AFTER DELETE ON consultas
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('consultas_ano_personal', COALESCE(CAST(OLD.ano_personal AS TEXT), ''), -1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        # pagos_estado
+        """CREATE TRIGGER IF NOT EXISTS metricas_pagos_estado_insert AFTER INSERT ON pagos
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('pagos_estado', COALESCE(NEW.status, ''), 1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_pagos_estado_update
+           AFTER UPDATE OF status ON pagos
+           WHEN OLD.status IS NOT NEW.status
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('pagos_estado', COALESCE(OLD.status, ''), -1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('pagos_estado', COALESCE(NEW.status, ''), 1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_pagos_estado_delete AFTER DELETE ON pagos
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('pagos_estado', COALESCE(OLD.status, ''), -1)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        # ingresos_estado
+        """CREATE TRIGGER IF NOT EXISTS metricas_ingresos_estado_insert AFTER INSERT ON pagos
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('ingresos_estado', COALESCE(NEW.status, ''), COALESCE(NEW.monto, 0))
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_ingresos_estado_update
+           AFTER UPDATE OF status, monto ON pagos
+           WHEN OLD.status IS NOT NEW.status OR OLD.monto IS NOT NEW.monto
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('ingresos_estado', COALESCE(OLD.status, ''), -COALESCE(OLD.monto, 0))
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('ingresos_estado', COALESCE(NEW.status, ''), COALESCE(NEW.monto, 0))
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_ingresos_estado_delete AFTER DELETE ON pagos
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('ingresos_estado', COALESCE(OLD.status, ''), -COALESCE(OLD.monto, 0))
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        # ingresos_dia
+        """CREATE TRIGGER IF NOT EXISTS metricas_ingresos_dia_insert AFTER INSERT ON pagos
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('ingresos_dia', COALESCE(date(NEW.created_at), ''),
+                       CASE WHEN NEW.status = 'completado' THEN COALESCE(NEW.monto, 0) ELSE 0 END)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_ingresos_dia_update
+           AFTER UPDATE OF status, monto, created_at ON pagos
+           WHEN OLD.status IS NOT NEW.status OR OLD.monto IS NOT NEW.monto
+                OR OLD.created_at IS NOT NEW.created_at
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('ingresos_dia', COALESCE(date(OLD.created_at), ''),
+                       CASE WHEN OLD.status = 'completado' THEN -COALESCE(OLD.monto, 0) ELSE 0 END)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('ingresos_dia', COALESCE(date(NEW.created_at), ''),
+                       CASE WHEN NEW.status = 'completado' THEN COALESCE(NEW.monto, 0) ELSE 0 END)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        """CREATE TRIGGER IF NOT EXISTS metricas_ingresos_dia_delete AFTER DELETE ON pagos
+           BEGIN
+             INSERT INTO metricas (dimension, clave, valor)
+               VALUES ('ingresos_dia', COALESCE(date(OLD.created_at), ''),
+                       CASE WHEN OLD.status = 'completado' THEN -COALESCE(OLD.monto, 0) ELSE 0 END)
+               ON CONFLICT (dimension, clave) DO UPDATE SET valor = valor + excluded.valor;
+           END""",
+        # Los contadores arrancan con lo que ya hay en las tablas
+        "DELETE FROM metricas",
+        """INSERT INTO metricas (dimension, clave, valor)
+           SELECT 'consultas_estado', COALESCE(t.status, ''), SUM(1)
+           FROM consultas t GROUP BY 2
+           UNION ALL
+           SELECT 'consultas_dia', COALESCE(date(t.created_at), ''), SUM(1)
+           FROM consultas t GROUP BY 2
+           UNION ALL
+           SELECT 'consultas_ano_personal', COALESCE(CAST(t.ano_personal AS TEXT), ''), SUM(1)
+           FROM consultas t GROUP BY 2
+           UNION ALL
+           SELECT 'pagos_estado', COALESCE(t.status, ''), SUM(1)
+           FROM pagos t GROUP BY 2
+           UNION ALL
+           SELECT 'ingresos_estado', COALESCE(t.status, ''), SUM(COALESCE(t.monto, 0))
+           FROM pagos t GROUP BY 2
+           UNION ALL
+           SELECT 'ingresos_dia', COALESCE(date(t.created_at), ''),
+                  SUM(CASE WHEN t.status = 'completado' THEN COALESCE(t.monto, 0) ELSE 0 END)
+           FROM pagos t GROUP BY 2""",
+    ]),
+    (4, "Lease de revisión por lotes de los expertos", [
+        "ALTER TABLE consultas ADD COLUMN revisor TEXT",
+        "ALTER TABLE consultas ADD COLUMN revision_hasta TIMESTAMP",
+        # Lote de un experto: WHERE revisor = ? AND status = 'pendiente'
+        "CREATE INDEX IF NOT EXISTS idx_consultas_revisor ON consultas (revisor, created_at)",
+    ]),
+    (5, "Bandeja de salida de correos", [
+        """CREATE TABLE IF NOT EXISTS correos_salientes
+           (id INTEGER PRIMARY KEY AUTOINCREMENT,
+            destinatario TEXT NOT NULL,
+            asunto TEXT NOT NULL,
+            cuerpo TEXT NOT NULL,
+            estado TEXT NOT NULL DEFAULT 'pendiente',
+            intentos INTEGER NOT NULL DEFAULT 0,
+            proximo_intento TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            lease_hasta TIMESTAMP,
+            error TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            enviado_at TIMESTAMP)""",
+        # Reclamo del despachador: WHERE estado = ? AND proximo_intento <= now
+        "CREATE INDEX IF NOT EXISTS idx_correos_estado ON correos_salientes "
+        "(estado, proximo_intento)",
+        # Cuota del proveedor: enviados en la última ventana
+        "CREATE INDEX IF NOT EXISTS idx_correos_enviado ON correos_salientes (enviado_at)",
+    ]),
+    (6, "Espera entre reintentos de la cola de análisis", [
+        # NULL: el trabajo se puede reclamar ya
+        "ALTER TABLE trabajos_analisis ADD COLUMN proximo_intento TIMESTAMP",
+    ]),
+]
+
+def version_esquema(conn):
+    """Versión de esquema aplicada a la base de datos"""
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def aplicar_migraciones(conn, hasta=None):
+    """Aplica en orden las migraciones pendientes; devuelve la versión final"""
+    with transaccion(conn):
+        # Releer dentro del bloqueo: otro proceso pudo migrar antes
+        actual = inicial = version_esquema(conn)
+        for version, _, sentencias in MIGRACIONES:
+            if version <= actual or (hasta is not None and version > hasta):
+                continue
+            for sentencia in sentencias:
+                conn.execute(sentencia)
+            conn.execute(f"PRAGMA user_version = {int(version)}")
+            actual = version
+    
+    if actual != inicial:
+        # Estadísticas para que el planificador elija los índices nuevos
+        conn.execute("ANALYZE")
+    return actual
@@ -0,0 +1,88 @@
+"""
+Benchmark del arranque en frío de appdestino.py
+
+Ejecuta el script en un intérprete nuevo con `python -X importtime` (como
+un contenedor recién levantado) y suma el tiempo acumulado de los imports de
+primer nivel. También indica qué módulos pesados (OpenCV, numpy, PIL,
+pandas) se cargaron: inicio y login no deberían necesitar ninguno.
+
+Para comparar antes/después, pasar otra versión del script con --script
+(p. ej. `git show HEAD~1:appdestino.py > /tmp/appdestino_antes.py`; el
+script se ejecuta con el directorio del repositorio en el path).
+
+Uso:
+    python benchmarks/bench_arranque.py [--repeticiones 5] [--script appdestino.py]
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+
+MODULOS_PESADOS = ("cv2", "numpy", "PIL", "pandas")
+
+# Importa la app como lo hace `streamlit run`: ejecuta el script completo
+CODIGO = "import runpy, sys; runpy.run_path(sys.argv[1], run_name='__main__')"
+
+def _parsear_importtime(salida):
+    """(ms acumulados de los imports de primer nivel, módulos importados)"""
+    total_us = 0
+    modulos = set()
+    for linea in salida.splitlines():
+        if not linea.startswith("import time:") or "cumulative" in linea:
+            continue
+        _, acumulado, nombre = linea[len("import time:"):].split("|")
+        modulos.add(nombre.strip().split(".")[0])
+        # Los imports anidados van sangrados; su tiempo ya está en el padre
+        if not nombre.startswith("  "):
+            total_us += int(acumulado)
+    return total_us / 1000, modulos
+
+def _medir_arranque(script, entorno):
+    """Un arranque en un intérprete limpio: (ms de pared, ms de imports, módulos)"""
+    inicio = time.perf_counter()
+    salida = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", CODIGO, script],
+        cwd=RAIZ, env=entorno, check=True, capture_output=True, text=True
+    )
+    pared = (time.perf_counter() - inicio) * 1000
+    imports, modulos = _parsear_importtime(salida.stderr)
+    return pared, imports, modulos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--script", default=str(RAIZ / "appdestino.py"))
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporal:
+        entorno = dict(os.environ,
+                       PYTHONPATH=os.pathsep.join(filter(None, [str(RAIZ),
+                                                                os.getenv("PYTHONPATH")])),
+                       DESTINO_DB=os.path.join(temporal, "destino.db"),
+                       DESTINO_FOTOS=os.path.join(temporal, "fotos"),
+                       DESTINO_CACHE_DB=os.path.join(temporal, "cache.db"))
+
+        # El primer arranque calienta la caché de bytecode y del sistema de archivos
+        _medir_arranque(args.script, entorno)
+
+        paredes, imports = [], []
+        for _ in range(args.repeticiones):
+            pared, importado, modulos = _medir_arranque(args.script, entorno)
+            paredes.append(pared)
+            imports.append(importado)
+
+    pesados = [m for m in MODULOS_PESADOS if m in modulos]
+    print(f"Script: {args.script}")
+    print(f"arranque p50 {statistics.median(paredes):7.1f} ms   "
+          f"imports p50 {statistics.median(imports):7.1f} ms")
+    print(f"Módulos pesados cargados: {', '.join(pesados) or 'ninguno'}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+Benchmark de las consultas SQL frecuentes sobre `consultas`
+
+Siembra una base de datos temporal con consultas sintéticas y mide las
+consultas que ejecuta appdestino.py: páginas por cursor de la cola del
+experto y de Mis Consultas (primera y siguiente) y la carga bajo demanda del
+cuerpo de una consulta. Las mide sin los índices de las migraciones y con
+ellos, y muestra el EXPLAIN QUERY PLAN y la latencia p50/p99 de cada una.
+
+Uso:
+    python benchmarks/bench_consultas.py [--filas 1000000] [--repeticiones 200]
+"""
+
+import argparse
+import datetime
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import base_datos
+from medidas import percentil
+
+USUARIOS = 50_000
+
+# Las consultas sintéticas se reparten en los dos años siguientes
+INICIO = datetime.datetime(2024, 1, 1)
+
+# Proporción de estados en una base con historial (la mayoría completadas)
+ESTADOS = (("completada", 0.93), ("pendiente", 0.05), ("analizando", 0.01),
+           ("error_analisis", 0.01))
+
+# Filas por página (la primera opción del selector de tamaño de la app) + 1
+# para saber si hay página siguiente, como hace la app
+LIMITE = 10 + 1
+
+# Experto que revisa la cola (no tiene lotes reclamados)
+REVISOR = "experto@ejemplo.com"
+
+def _cursor(rnd):
+    """(created_at, id) de una fila intermedia, como el de una página siguiente"""
+    creada = INICIO + datetime.timedelta(seconds=rnd.randint(0, 2 * 365 * 86400))
+    return creada.strftime("%Y-%m-%d %H:%M:%S"), 2 ** 62
+
+# nombre: (sql, parámetros(rnd, filas))
+CONSULTAS = {
+    "cola_experto": (base_datos.sql_consultas_pendientes(), lambda rnd, filas: (REVISOR, LIMITE)),
+    "cola_experto_siguiente": (base_datos.sql_consultas_pendientes(cursor=True),
+                               lambda rnd, filas: (*_cursor(rnd), REVISOR, LIMITE)),
+    "mis_consultas": (base_datos.sql_consultas_usuario(),
+                      lambda rnd, filas: (rnd.randint(1, USUARIOS), LIMITE)),
+    "mis_consultas_siguiente": (base_datos.sql_consultas_usuario(cursor=True),
+                                lambda rnd, filas: (rnd.randint(1, USUARIOS), *_cursor(rnd),
+                                                    LIMITE)),
+    # appdestino.obtener_cuerpo_consulta, desde Mis Consultas (filtra por usuario)
+    "cuerpo_consulta": (base_datos.sql_cuerpo_consulta(por_usuario=True),
+                        lambda rnd, filas: (rnd.randint(1, filas), rnd.randint(1, USUARIOS))),
+}
+
+def _sembrar(conn, filas, semilla=0):
+    """Inserta usuarios, consultas y pagos sintéticos en una sola transacción"""
+    rnd = random.Random(semilla)
+    estados = [e for e, _ in ESTADOS]
+    pesos = [p for _, p in ESTADOS]
+    analisis = "**Forma de Mano:** Conica\nPersona creativa, intuitiva, emocional. " * 5
+
+    def generar_consultas():
+        for i in range(filas):
+            creada = INICIO + datetime.timedelta(seconds=rnd.randint(0, 2 * 365 * 86400))
+            yield (rnd.randint(1, USUARIOS), f"Consulta sintética {i}", "1990-01-01",
+                   rnd.randint(1, 9), '{"cantidad": 1}', analisis,
+                   rnd.choices(estados, pesos)[0], creada.strftime("%Y-%m-%d %H:%M:%S"))
+
+    with base_datos.transaccion(conn):
+        conn.executemany("INSERT INTO users (id, email, password) VALUES (?, ?, 'x')",
+                         ((i, f"usuario{i}@ejemplo.com") for i in range(1, USUARIOS + 1)))
+        conn.executemany("""INSERT INTO consultas
+                            (user_id, consulta_text, fecha_nacimiento, ano_personal,
+                             fotos_data, analisis_auto, status, created_at)
+                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)""", generar_consultas())
+        conn.executemany("""INSERT INTO pagos (user_id, consulta_id, monto, tipo, status)
+                            VALUES (?, ?, 3.0, 'interpretacion', 'completado')""",
+                         ((rnd.randint(1, USUARIOS), rnd.randint(1, filas))
+                          for _ in range(filas // 10)))
+
+def _plan(conn, sql, parametros):
+    """Texto del EXPLAIN QUERY PLAN de una consulta"""
+    filas = conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+    return "\n".join(f"    {fila[-1]}" for fila in filas)
+
+def _indices_migraciones():
+    """(nombre, CREATE INDEX) de todos los índices que crean las migraciones"""
+    return [(sentencia.split()[5], sentencia)
+            for _, _, sentencias in base_datos.MIGRACIONES
+            for sentencia in sentencias
+            if sentencia.startswith("CREATE INDEX IF NOT EXISTS")]
+
+def _medir(conn, filas, repeticiones, etiqueta):
+    """Mide todas las consultas y muestra plan y latencias"""
+    print(f"\n=== {etiqueta} (esquema v{base_datos.version_esquema(conn)}) ===")
+    rnd = random.Random(1)
+    for nombre, (sql, parametros) in CONSULTAS.items():
+        print(f"{nombre}:")
+        print(_plan(conn, sql, parametros(rnd, filas)))
+        tiempos = []
+        for _ in range(repeticiones):
+            args = parametros(rnd, filas)
+            inicio = time.perf_counter()
+            conn.execute(sql, args).fetchall()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        print(f"    p50 {statistics.median(tiempos):.2f} ms   "
+              f"p99 {percentil(tiempos, 99):.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--filas", type=int, default=1_000_000)
+    parser.add_argument("--repeticiones", type=int, default=200)
+    parser.add_argument("--repeticiones-sin-indices", type=int, default=20,
+                        help="Repeticiones sin índices (cada una es un recorrido completo)")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporal:
+        ruta = os.path.join(temporal, "bench.db")
+        conn = base_datos.conectar(ruta)
+        base_datos.crear_esquema(conn, migrar=False)
+
+        inicio = time.perf_counter()
+        _sembrar(conn, args.filas)
+        print(f"Sembradas {args.filas:,} consultas en {time.perf_counter() - inicio:.1f} s")
+
+        inicio = time.perf_counter()
+        base_datos.aplicar_migraciones(conn)
+        print(f"Migraciones aplicadas en {time.perf_counter() - inicio:.1f} s")
+
+        # Las consultas usan columnas de migraciones posteriores a los índices:
+        # la línea base es el esquema actual sin los índices de las migraciones
+        indices = _indices_migraciones()
+        with base_datos.transaccion(conn):
+            for nombre, _ in indices:
+                conn.execute(f"DROP INDEX IF EXISTS {nombre}")
+        conn.execute("ANALYZE")
+        _medir(conn, args.filas, args.repeticiones_sin_indices, "Sin índices")
+
+        inicio = time.perf_counter()
+        with base_datos.transaccion(conn):
+            for _, sentencia in indices:
+                conn.execute(sentencia)
+        conn.execute("ANALYZE")
+        print(f"\nÍndices creados en {time.perf_counter() - inicio:.1f} s")
+
+        _medir(conn, args.filas, args.repeticiones, "Con índices")
+        conn.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""
+Benchmark de la detección de líneas de la palma
+
+Mide la latencia por imagen de medir_lineas + etiquetar_lineas (segmentos de
+Hough, asignación a líneas y medidas) sobre imágenes ya preparadas, y la
+compara con un presupuesto por imagen. Termina con código 1 si el p95 lo
+supera, para poder usarlo en CI.
+
+Uso:
+    python benchmarks/bench_lineas.py [--imagenes DIR] [--repeticiones 20] [--presupuesto 25]
+"""
+
+import argparse
+import statistics
+import sys
+import time
+from collections import Counter
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+from medidas import percentil
+
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+# Presupuesto por imagen a la resolución de trabajo por defecto (1024 px)
+PRESUPUESTO_MS = 25.0
+
+def _cargar_imagenes(directorio):
+    """Bytes de las fotos del directorio o, sin directorio, manos sintéticas"""
+    if directorio:
+        return {p.name: p.read_bytes() for p in sorted(Path(directorio).iterdir())
+                if p.suffix.lower() in EXTENSIONES}
+
+    from manos_sinteticas import generar_jpeg
+    return {f"mano_{resolucion}_{semilla}": generar_jpeg(resolucion, semilla)
+            for resolucion in ("2mp", "12mp") for semilla in range(4)}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--imagenes", help="Directorio con fotos (por defecto, sintéticas)")
+    parser.add_argument("--repeticiones", type=int, default=20)
+    parser.add_argument("--presupuesto", type=float, default=PRESUPUESTO_MS,
+                        help="Latencia máxima por imagen (ms, p95)")
+    args = parser.parse_args()
+
+    import quirologia
+
+    # La preparación (decodificación, grises, Canny) se mide en bench_preproceso
+    preparadas = {nombre: quirologia.preparar_imagen(datos)
+                  for nombre, datos in _cargar_imagenes(args.imagenes).items()}
+
+    tiempos = []
+    etiquetas = {}
+    for _ in range(args.repeticiones):
+        for nombre, preparada in preparadas.items():
+            inicio = time.perf_counter()
+            etiquetas[nombre] = quirologia.etiquetar_lineas(quirologia.medir_lineas(preparada))
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+    p95 = percentil(tiempos, 95)
+    print(f"Imágenes: {len(preparadas)}  repeticiones: {args.repeticiones}")
+    print(f"latencia p50 {statistics.median(tiempos):6.1f} ms   p95 {p95:6.1f} ms   "
+          f"presupuesto {args.presupuesto:.1f} ms")
+
+    for linea in quirologia.LINEAS_PRINCIPALES:
+        conteo = Counter(e[linea] for e in etiquetas.values())
+        print(f"  {linea:8s} " + ", ".join(f"{v}: {n}" for v, n in conteo.most_common()))
+
+    if p95 > args.presupuesto:
+        print("Presupuesto superado")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
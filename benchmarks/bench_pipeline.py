@@ -0,0 +1,280 @@
+"""
+Benchmark completo del pipeline quirológico (sin Streamlit ni red)
+
+Recorre un directorio de fotos o manos sintéticas a varias resoluciones y
+mide por etapa la latencia p50/p95/p99:
+
+    preparacion        decodificación, EXIF, segmentación, recorte y Canny
+    forma              clasificar_forma sobre la imagen preparada
+    lineas             medir_lineas + etiquetar_lineas sobre la imagen preparada
+    analizar_forma     analizar_forma_mano (API de una imagen, de principio a fin)
+    detectar_lineas    detectar_lineas (API de una imagen, de principio a fin)
+    analisis_completo  analizar_lote + interpretar_analisis de una consulta,
+                       lo que hace analizar_mano_completo en appdestino.py
+    crear_consulta     encolar_consulta: almacén de fotos + INSERT, lo que
+                       espera el usuario al enviar el formulario
+    consulta_procesada encolar_consulta + procesar_pendientes en el pool,
+                       hasta que analisis_auto queda escrito
+
+Cada resolución se mide en un subproceso aparte para que el pico de RSS sea
+comparable. El rendimiento por núcleo se mide analizando todas las fotos en
+el pool de ServicioAnalisis. Los resultados se guardan en JSON para comparar
+entre commits con --comparar.
+
+Uso:
+    python benchmarks/bench_pipeline.py [--imagenes DIR] [--resoluciones 2mp,12mp]
+        [--repeticiones 3] [--workers N] [--salida res.json] [--comparar base.json]
+"""
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+from medidas import percentil, pico_rss_mb
+
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+# Fotos por consulta sintética, en el orden del formulario
+ROLES_CONSULTA = ("palma_derecha", "palma_izquierda", "dorso")
+
+# ============================================================================
+# UTILIDADES
+# ============================================================================
+
+def _resumir(tiempos):
+    """Estadísticos en ms de una lista de tiempos en segundos"""
+    ms = [t * 1000 for t in tiempos]
+    return {
+        "n": len(ms),
+        "media_ms": round(statistics.mean(ms), 3),
+        "p50_ms": round(statistics.median(ms), 3),
+        "p95_ms": round(percentil(ms, 95), 3),
+        "p99_ms": round(percentil(ms, 99), 3),
+    }
+
+def _cronometrar(funcion, *args):
+    """(segundos, resultado) de una llamada"""
+    inicio = time.perf_counter()
+    resultado = funcion(*args)
+    return time.perf_counter() - inicio, resultado
+
+def _commit():
+    """Commit actual del repositorio, o None fuera de git"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=RAIZ,
+                              check=True, capture_output=True, text=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# ============================================================================
+# CONJUNTO DE IMÁGENES
+# ============================================================================
+
+def _cargar_fotos(grupo, directorio, semillas):
+    """Lista de bytes de las fotos de un grupo (resolución sintética o 'directorio')"""
+    if grupo == "directorio":
+        return [p.read_bytes() for p in sorted(Path(directorio).iterdir())
+                if p.suffix.lower() in EXTENSIONES]
+
+    from manos_sinteticas import generar_jpeg
+    # Mitad con iluminación uniforme y mitad con luz lateral
+    return [generar_jpeg(grupo, semilla, iluminacion=0.5 * (semilla % 2))
+            for semilla in range(semillas * len(ROLES_CONSULTA))]
+
+def _consultas(fotos):
+    """Agrupa las fotos en consultas {rol: bytes}"""
+    n = len(ROLES_CONSULTA)
+    return [dict(zip(ROLES_CONSULTA, fotos[i:i + n])) for i in range(0, len(fotos), n)]
+
+# ============================================================================
+# MEDICIÓN DE UN GRUPO (SE EJECUTA EN UN SUBPROCESO)
+# ============================================================================
+
+def _medir_etapas(fotos, repeticiones):
+    """Latencias por etapa de las API de imagen y de consulta"""
+    import quirologia
+    from conocimientos import interpretar_analisis
+
+    etapas = {nombre: [] for nombre in ("preparacion", "forma", "lineas", "analizar_forma",
+                                         "detectar_lineas", "analisis_completo")}
+    for _ in range(repeticiones):
+        for foto in fotos:
+            t, preparada = _cronometrar(quirologia.preparar_imagen, foto)
+            etapas["preparacion"].append(t)
+            etapas["forma"].append(_cronometrar(quirologia.clasificar_forma, preparada)[0])
+            etapas["lineas"].append(_cronometrar(
+                lambda p: quirologia.etiquetar_lineas(quirologia.medir_lineas(p)), preparada)[0])
+            etapas["analizar_forma"].append(_cronometrar(quirologia.analizar_forma_mano, foto)[0])
+            etapas["detectar_lineas"].append(_cronometrar(quirologia.detectar_lineas, foto)[0])
+
+        for consulta in _consultas(fotos):
+            etapas["analisis_completo"].append(_cronometrar(
+                lambda c: interpretar_analisis(quirologia.analizar_lote(c)), consulta)[0])
+    return etapas
+
+def _medir_consultas(fotos, repeticiones, workers):
+    """Latencia de crear_consulta y de la consulta procesada por el trabajador"""
+    import base_datos
+    from servicio_analisis import ServicioAnalisis
+    from trabajador_analisis import encolar_consulta, procesar_pendientes
+
+    conn = base_datos.conectar()
+    base_datos.crear_esquema(conn)
+    with base_datos.transaccion(conn):
+        conn.execute("INSERT OR IGNORE INTO users (id, email, password) "
+                     "VALUES (1, 'bench@ejemplo.com', 'x')")
+
+    creacion, procesada = [], []
+    servicio = ServicioAnalisis(workers=workers)
+    try:
+        # Calienta el pool: el arranque de los procesos no es parte de la consulta
+        servicio.analizar({"palma_derecha": fotos[0]})
+
+        for repeticion in range(repeticiones):
+            for i, consulta in enumerate(_consultas(fotos)):
+                inicio = time.perf_counter()
+                encolar_consulta(conn, 1, f"Consulta {repeticion}-{i}",
+                                 datetime.date(1990, 1, 1), 3, consulta)
+                creacion.append(time.perf_counter() - inicio)
+                # Sin caché de análisis: cada repetición analiza de verdad
+                while procesar_pendientes(conn, servicio):
+                    pass
+                procesada.append(time.perf_counter() - inicio)
+    finally:
+        servicio.cerrar()
+        conn.close()
+    return {"crear_consulta": creacion, "consulta_procesada": procesada}
+
+def _medir_rendimiento(fotos, workers):
+    """Imágenes por segundo del pool de análisis y por núcleo"""
+    from servicio_analisis import ServicioAnalisis
+
+    servicio = ServicioAnalisis(workers=workers, max_pendientes=len(fotos) + workers)
+    try:
+        # Una tarea por worker para que todos los procesos estén arrancados
+        for futuro in [servicio.enviar({"palma_derecha": fotos[0]}) for _ in range(workers)]:
+            futuro.result()
+        inicio = time.perf_counter()
+        futuros = [servicio.enviar({"palma_derecha": foto}) for foto in fotos]
+        for futuro in futuros:
+            futuro.result()
+        total = time.perf_counter() - inicio
+    finally:
+        servicio.cerrar()
+
+    return {
+        "workers": workers,
+        "imagenes_por_segundo": round(len(fotos) / total, 2),
+        "imagenes_por_segundo_nucleo": round(len(fotos) / total / workers, 2),
+    }
+
+def _medir_grupo(grupo, directorio, semillas, repeticiones, workers):
+    """Todas las mediciones de un grupo de imágenes"""
+    fotos = _cargar_fotos(grupo, directorio, semillas)
+    if not fotos:
+        raise SystemExit(f"No hay fotos en {directorio}")
+
+    etapas = _medir_etapas(fotos, repeticiones)
+    # El pico del análisis en este proceso, antes de que el pool sume el suyo
+    pico_rss = pico_rss_mb()
+    etapas.update(_medir_consultas(fotos, repeticiones, workers))
+
+    return {
+        "imagenes": len(fotos),
+        "etapas": {nombre: _resumir(tiempos) for nombre, tiempos in etapas.items()},
+        "rendimiento": _medir_rendimiento(fotos, workers),
+        "pico_rss_mb": round(pico_rss, 1),
+    }
+
+def _lanzar_grupo(grupo, args, temporal):
+    """Mide un grupo en un subproceso limpio con su propia base de datos y almacén"""
+    entorno = dict(os.environ,
+                   DESTINO_DB=os.path.join(temporal, f"{grupo}.db"),
+                   DESTINO_FOTOS=os.path.join(temporal, f"fotos_{grupo}"),
+                   DESTINO_CACHE_DB=os.path.join(temporal, f"cache_{grupo}.db"))
+    comando = [sys.executable, __file__, "--grupo", grupo,
+               "--semillas", str(args.semillas), "--repeticiones", str(args.repeticiones),
+               "--workers", str(args.workers)]
+    if args.imagenes:
+        comando += ["--imagenes", args.imagenes]
+    salida = subprocess.run(comando, env=entorno, check=True, capture_output=True, text=True)
+    return json.loads(salida.stdout)
+
+# ============================================================================
+# INFORME
+# ============================================================================
+
+def _imprimir(resultados, base=None):
+    """Tabla por grupo y etapa; con base, la variación del p50 respecto a ella"""
+    for grupo, r in resultados["grupos"].items():
+        print(f"\n=== {grupo}: {r['imagenes']} imágenes, pico RSS {r['pico_rss_mb']:.0f} MB, "
+              f"{r['rendimiento']['imagenes_por_segundo_nucleo']:.1f} img/s por núcleo "
+              f"({r['rendimiento']['workers']} workers) ===")
+        print(f"{'etapa':<20}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}"
+              + (f"{'vs base':>10}" if base else ""))
+        for etapa, e in r["etapas"].items():
+            linea = f"{etapa:<20}{e['p50_ms']:>10.2f}{e['p95_ms']:>10.2f}{e['p99_ms']:>10.2f}"
+            anterior = (base or {}).get("grupos", {}).get(grupo, {}).get("etapas", {}).get(etapa)
+            if anterior:
+                linea += f"{(e['p50_ms'] / anterior['p50_ms'] - 1):>+10.0%}"
+            print(linea)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--imagenes", help="Directorio con fotos reales (se suma a las sintéticas)")
+    parser.add_argument("--resoluciones", default="2mp,12mp,48mp",
+                        help="Resoluciones sintéticas separadas por comas ('' para ninguna)")
+    parser.add_argument("--semillas", type=int, default=2,
+                        help="Consultas sintéticas por resolución (3 fotos cada una)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--salida", help="Archivo JSON donde guardar los resultados")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior para comparar")
+    parser.add_argument("--grupo", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.grupo:
+        print(json.dumps(_medir_grupo(args.grupo, args.imagenes, args.semillas,
+                                      args.repeticiones, args.workers)))
+        return
+
+    grupos = [r for r in args.resoluciones.split(",") if r]
+    if args.imagenes:
+        grupos.append("directorio")
+
+    import quirologia
+    resultados = {
+        "commit": _commit(),
+        "fecha": datetime.datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "nucleos": os.cpu_count(),
+        "version_analisis": quirologia.etiqueta_version(),
+        "parametros": {"semillas": args.semillas, "repeticiones": args.repeticiones,
+                       "workers": args.workers},
+        "grupos": {},
+    }
+    with tempfile.TemporaryDirectory() as temporal:
+        for grupo in grupos:
+            resultados["grupos"][grupo] = _lanzar_grupo(grupo, args, temporal)
+
+    base = json.loads(Path(args.comparar).read_text()) if args.comparar else None
+    _imprimir(resultados, base)
+
+    if args.salida:
+        Path(args.salida).write_text(json.dumps(resultados, indent=2), encoding="utf-8")
+        print(f"\nResultados guardados en {args.salida}")
+
+if __name__ == "__main__":
+    main()
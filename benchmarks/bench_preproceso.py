@@ -0,0 +1,122 @@
+"""
+Benchmark del pre-procesado de imágenes (normalización de resolución)
+
+Compara el análisis a resolución completa con el análisis tras normalizar
+(EXIF, recorte a la mano y reducción) sobre las mismas fotos. Cada modo corre
+en un subproceso aparte para que el pico de RSS sea comparable.
+
+Uso:
+    python benchmarks/bench_preproceso.py [--imagenes DIR] [--repeticiones N]
+"""
+
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+from medidas import pico_rss_mb
+
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+def _medir_modo(directorio, resolucion, repeticiones):
+    """Ejecuta el análisis sobre todas las fotos y devuelve métricas del modo"""
+    from PIL import Image
+    import quirologia
+
+    fotos = sorted(p for p in Path(directorio).iterdir() if p.suffix.lower() in EXTENSIONES)
+    tiempos = []
+    clasificaciones = {}
+
+    for _ in range(repeticiones):
+        for foto in fotos:
+            inicio = time.perf_counter()
+            with Image.open(foto) as imagen:
+                resultado = quirologia.analizar_imagen(imagen, resolucion=resolucion)
+            tiempos.append(time.perf_counter() - inicio)
+            clasificaciones[foto.name] = resultado
+
+    pico_rss = pico_rss_mb()
+
+    return {
+        "resolucion": resolucion,
+        "imagenes": len(fotos),
+        "latencia_media_ms": statistics.mean(tiempos) * 1000,
+        "latencia_p50_ms": statistics.median(tiempos) * 1000,
+        "pico_rss_mb": pico_rss,
+        "clasificaciones": clasificaciones,
+    }
+
+def _lanzar_modo(directorio, resolucion, repeticiones):
+    """Mide un modo en un subproceso limpio"""
+    salida = subprocess.run(
+        [sys.executable, __file__, "--modo", str(resolucion),
+         "--imagenes", str(directorio), "--repeticiones", str(repeticiones)],
+        check=True, capture_output=True, text=True
+    )
+    return json.loads(salida.stdout)
+
+def _generar_imagenes(directorio):
+    """Escribe manos sintéticas de 12 y 48 MP en el directorio"""
+    from manos_sinteticas import generar_jpeg
+
+    for resolucion in ("12mp", "48mp"):
+        for semilla in range(3):
+            ruta = Path(directorio) / f"mano_{resolucion}_{semilla}.jpg"
+            ruta.write_bytes(generar_jpeg(resolucion, semilla))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--imagenes", help="Directorio con fotos (por defecto, sintéticas)")
+    parser.add_argument("--repeticiones", type=int, default=3)
+    parser.add_argument("--resolucion", type=int, default=None,
+                        help="Resolución de trabajo a comparar (por defecto, la configurada)")
+    parser.add_argument("--modo", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.modo is not None:
+        print(json.dumps(_medir_modo(args.imagenes, args.modo, args.repeticiones)))
+        return
+
+    import quirologia
+    resolucion = args.resolucion or quirologia.RESOLUCION_TRABAJO
+
+    with tempfile.TemporaryDirectory() as temporal:
+        directorio = args.imagenes
+        if not directorio:
+            directorio = temporal
+            _generar_imagenes(directorio)
+
+        completa = _lanzar_modo(directorio, 0, args.repeticiones)
+        normalizada = _lanzar_modo(directorio, resolucion, args.repeticiones)
+
+    print(f"Imágenes: {completa['imagenes']}  repeticiones: {args.repeticiones}")
+    print(f"{'modo':<22}{'media ms':>10}{'p50 ms':>10}{'pico RSS MB':>14}")
+    for nombre, r in (("completa", completa), (f"normalizada ({resolucion}px)", normalizada)):
+        print(f"{nombre:<22}{r['latencia_media_ms']:>10.1f}{r['latencia_p50_ms']:>10.1f}"
+              f"{r['pico_rss_mb']:>14.1f}")
+
+    print(f"Aceleración: {completa['latencia_media_ms'] / normalizada['latencia_media_ms']:.1f}x  "
+          f"RSS: {completa['pico_rss_mb'] / normalizada['pico_rss_mb']:.1f}x")
+
+    diferencias = [
+        nombre for nombre, r in completa["clasificaciones"].items()
+        if r != normalizada["clasificaciones"].get(nombre)
+    ]
+    if diferencias:
+        print(f"Clasificaciones distintas en {len(diferencias)} imágenes:")
+        for nombre in diferencias:
+            print(f"  {nombre}: {completa['clasificaciones'][nombre]} -> "
+                  f"{normalizada['clasificaciones'][nombre]}")
+    else:
+        print("Clasificaciones idénticas en todas las imágenes")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+Benchmark del tiempo por rerun de appdestino.py
+
+Streamlit reejecuta el script completo en cada interacción. Este benchmark
+ejecuta el script con streamlit.testing (AppTest, en el mismo proceso, como
+el servidor) sobre una base de datos temporal sembrada, y mide el primer run
+y los reruns siguientes de cada página: p50/p95 en ms.
+
+Para comparar antes/después, pasar otra versión del script con --script
+(p. ej. `git show HEAD~1:appdestino.py > /tmp/appdestino_antes.py`; el
+script se ejecuta con el directorio del repositorio en el path).
+
+Uso:
+    python benchmarks/bench_rerun.py [--repeticiones 30] [--script appdestino.py]
+"""
+
+import argparse
+import datetime
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+from medidas import percentil
+
+EMAIL_EXPERTO = "experto@ejemplo.com"
+
+# Página -> usuario en sesión (None: sin iniciar sesión)
+PAGINAS = {
+    "pagina_inicio": None,
+    "pagina_auth": None,
+    "pagina_mis_consultas": {"id": 1, "email": "usuario@ejemplo.com"},
+    "pagina_dashboard_admin": {"id": 2, "email": EMAIL_EXPERTO},
+}
+
+def _sembrar(consultas):
+    """Usuario, experto y consultas pendientes con una foto sintética cada una"""
+    import base_datos
+    from manos_sinteticas import generar_jpeg
+    from trabajador_analisis import encolar_consulta
+
+    conn = base_datos.conectar()
+    base_datos.crear_esquema(conn)
+    with base_datos.transaccion(conn):
+        conn.executemany("INSERT INTO users (id, email, password) VALUES (?, ?, 'x')",
+                         [(1, "usuario@ejemplo.com"), (2, EMAIL_EXPERTO)])
+
+    foto = generar_jpeg("2mp")
+    for i in range(consultas):
+        consulta_id = encolar_consulta(conn, 1, f"Consulta {i}", datetime.date(1990, 1, 1),
+                                       3, {"palma_derecha": foto})
+        with base_datos.transaccion(conn):
+            conn.execute("""UPDATE consultas SET status = 'pendiente',
+                            analisis_auto = '**Forma de Mano:** Conica' WHERE id = ?""",
+                         (consulta_id,))
+    conn.close()
+
+def _medir_pagina(fuente, pagina, usuario, repeticiones, consultas):
+    """Tiempos (ms) del primer run y de los reruns de una página"""
+    from streamlit.testing.v1 import AppTest
+
+    app = AppTest.from_string(f"{fuente}\n\n{pagina}()\n", default_timeout=120)
+    if usuario:
+        app.session_state["user"] = usuario
+        app.session_state["logged_in"] = True
+
+    inicio = time.perf_counter()
+    app.run()
+    primero = (time.perf_counter() - inicio) * 1000
+    if app.exception:
+        raise RuntimeError(f"{pagina}: {app.exception[0].message}")
+
+    if usuario:
+        # Todas las consultas desplegadas: cada rerun muestra sus fotos
+        for consulta_id in range(1, consultas + 1):
+            app.session_state[f"consulta_{consulta_id}"] = True
+            app.session_state[f"pendiente_{consulta_id}"] = True
+
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        app.run()
+        tiempos.append((time.perf_counter() - inicio) * 1000)
+    return primero, tiempos
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--script", default=str(RAIZ / "appdestino.py"))
+    parser.add_argument("--repeticiones", type=int, default=30)
+    parser.add_argument("--consultas", type=int, default=10)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as temporal:
+        # Antes de importar los módulos de la app: leen las rutas al importarse
+        os.environ["DESTINO_DB"] = os.path.join(temporal, "destino.db")
+        os.environ["DESTINO_FOTOS"] = os.path.join(temporal, "fotos")
+        os.environ["DESTINO_CACHE_DB"] = os.path.join(temporal, "cache.db")
+        os.environ["ANALISIS_TRABAJADOR_INTEGRADO"] = "0"
+        os.environ["ADMIN_EMAILS"] = EMAIL_EXPERTO
+        os.chdir(RAIZ)
+
+        _sembrar(args.consultas)
+        fuente = Path(args.script).read_text(encoding="utf-8")
+
+        print(f"Script: {args.script}")
+        for pagina, usuario in PAGINAS.items():
+            primero, tiempos = _medir_pagina(fuente, pagina, usuario, args.repeticiones,
+                                             args.consultas)
+            print(f"{pagina:24s} primer run {primero:8.1f} ms   "
+                  f"rerun p50 {statistics.median(tiempos):6.1f} ms   "
+                  f"p95 {percentil(tiempos, 95):6.1f} ms")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+Benchmark de la segmentación de la mano (precisión y latencia)
+
+Compara segmentar_mano (piel YCrCb/HSV + Otsu + limpieza morfológica) con el
+umbral global fijo anterior (127, mano oscura) sobre un conjunto etiquetado:
+IoU contra la máscara real, acierto en la forma de la mano y latencia por
+imagen de la segmentación.
+
+Conjunto local: un directorio con fotos `nombre.jpg` y sus máscaras
+`nombre.mascara.png` (blanco = mano). Un `formas.json` opcional
+({"nombre.jpg": "conica", ...}) fija la forma esperada; si falta, se deriva
+de la máscara real. Sin directorio se usan manos sintéticas con iluminación
+uniforme y lateral.
+
+Uso:
+    python benchmarks/bench_segmentacion.py [--imagenes DIR] [--repeticiones 5]
+"""
+
+import argparse
+import io
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+sys.path.insert(0, str(RAIZ / "benchmarks"))
+
+from medidas import percentil
+
+EXTENSIONES = (".jpg", ".jpeg", ".png")
+
+def _cargar_conjunto(directorio):
+    """{nombre: (bytes de la foto, máscara real PIL, forma esperada o None)}"""
+    from PIL import Image
+
+    if not directorio:
+        from manos_sinteticas import generar_etiquetada
+        return {
+            f"mano_luz{iluminacion:.1f}_{semilla}":
+                (*generar_etiquetada("2mp", semilla, iluminacion=iluminacion), None)
+            for iluminacion in (0.0, 0.4, 0.7) for semilla in range(4)
+        }
+
+    directorio = Path(directorio)
+    ruta_formas = directorio / "formas.json"
+    formas = json.loads(ruta_formas.read_text()) if ruta_formas.exists() else {}
+    conjunto = {}
+    for foto in sorted(directorio.iterdir()):
+        mascara = foto.with_name(f"{foto.stem}.mascara.png")
+        if foto.suffix.lower() not in EXTENSIONES or foto.name.endswith(".mascara.png") \
+                or not mascara.exists():
+            continue
+        conjunto[foto.name] = (foto.read_bytes(), Image.open(mascara).convert("L"),
+                               formas.get(foto.name))
+    return conjunto
+
+def _umbral_fijo(img_array):
+    """Segmentación anterior: umbral global 127 y mayor contorno, sobre la miniatura"""
+    import cv2
+    import numpy as np
+    import quirologia
+
+    miniatura, factor = quirologia._reducir(quirologia._a_escala_grises(img_array),
+                                            quirologia.RESOLUCION_RECORTE)
+    _, thresh = cv2.threshold(miniatura, 127, 255, cv2.THRESH_BINARY_INV)
+    contornos, _ = cv2.findContours(thresh, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    mascara = np.zeros_like(thresh)
+    if contornos:
+        cv2.drawContours(mascara, [max(contornos, key=cv2.contourArea)], -1, 255, cv2.FILLED)
+    return mascara, factor
+
+def _forma(mascara):
+    """Forma de la mano según el mayor contorno de una máscara"""
+    import cv2
+    import quirologia
+
+    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    contorno = max(contornos, key=cv2.contourArea) if contornos else None
+    return quirologia.clasificar_forma({"contorno": contorno})
+
+def _medir_metodo(segmentar, fotos, reales, formas, repeticiones):
+    """IoU medio y mínimo, acierto de forma y latencias (ms) de un método"""
+    import numpy as np
+
+    ious, aciertos, tiempos = [], 0, []
+    for nombre, img_array in fotos.items():
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            mascara, _ = segmentar(img_array)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+
+        real = np.asarray(reales[nombre].resize(mascara.shape[::-1])) > 127
+        predicha = mascara > 0
+        union = np.count_nonzero(real | predicha)
+        ious.append(np.count_nonzero(real & predicha) / union if union else 1.0)
+        aciertos += _forma(mascara) == formas[nombre]
+
+    return {
+        "iou_medio": statistics.mean(ious),
+        "iou_minimo": min(ious),
+        "acierto_forma": aciertos / len(fotos),
+        "p50_ms": statistics.median(tiempos),
+        "p95_ms": percentil(tiempos, 95),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--imagenes", help="Directorio etiquetado (por defecto, sintéticas)")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    args = parser.parse_args()
+
+    import numpy as np
+    from PIL import Image, ImageOps
+    import quirologia
+
+    conjunto = _cargar_conjunto(args.imagenes)
+    if not conjunto:
+        sys.exit("No hay fotos con máscara en el directorio")
+
+    # Misma decodificación que el pipeline: draft a la resolución de trabajo y EXIF
+    fotos, reales, formas = {}, {}, {}
+    for nombre, (datos, real, forma) in conjunto.items():
+        imagen = Image.open(io.BytesIO(datos))
+        imagen.draft("RGB", (quirologia.RESOLUCION_TRABAJO,) * 2)
+        fotos[nombre] = quirologia._a_array(ImageOps.exif_transpose(imagen))
+        reales[nombre] = real
+        formas[nombre] = forma or _forma(np.asarray(real))
+
+    print(f"Imágenes: {len(fotos)}  repeticiones: {args.repeticiones}")
+    print(f"{'método':<16}{'IoU medio':>10}{'IoU mín':>10}{'forma':>8}{'p50 ms':>9}{'p95 ms':>9}")
+    for nombre, segmentar in (("umbral fijo", _umbral_fijo),
+                              ("piel + Otsu", quirologia.segmentar_mano)):
+        r = _medir_metodo(segmentar, fotos, reales, formas, args.repeticiones)
+        print(f"{nombre:<16}{r['iou_medio']:>10.3f}{r['iou_minimo']:>10.3f}"
+              f"{r['acierto_forma']:>8.0%}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Generador de manos sintéticas para los benchmarks del motor quirológico
+Produce fotos JPEG similares a las del formulario (fondo claro, mano oscura),
+opcionalmente con iluminación desigual, y la máscara real de la mano
+"""
+
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFilter
+
+# Resoluciones típicas de cámaras de móvil (ancho, alto)
+RESOLUCIONES = {
+    "2mp": (1200, 1600),
+    "12mp": (3024, 4032),
+    "48mp": (6000, 8000),
+}
+
+def _dibujar(ancho, alto, semilla, iluminacion):
+    """Imagen RGB de la mano y su máscara real (L, 255 = mano)"""
+    rnd = random.Random(semilla)
+    imagen = Image.new("RGB", (ancho, alto), (235, 232, 225))
+    mascara = Image.new("L", (ancho, alto), 0)
+    d = ImageDraw.Draw(imagen)
+    m = ImageDraw.Draw(mascara)
+
+    piel = (150 + rnd.randint(-20, 20), 105 + rnd.randint(-15, 15), 80)
+    palma_w = ancho * rnd.uniform(0.45, 0.6)
+    palma_h = alto * rnd.uniform(0.32, 0.45)
+    x0 = (ancho - palma_w) / 2
+    y0 = alto * 0.45
+    d.rounded_rectangle((x0, y0, x0 + palma_w, y0 + palma_h),
+                        radius=palma_w * 0.15, fill=piel)
+    m.rounded_rectangle((x0, y0, x0 + palma_w, y0 + palma_h),
+                        radius=palma_w * 0.15, fill=255)
+
+    # Dedos
+    dedo_w = palma_w / 5
+    for i in range(4):
+        largo = alto * rnd.uniform(0.22, 0.32)
+        dx = x0 + dedo_w * (i + 0.6)
+        for draw, relleno in ((d, piel), (m, 255)):
+            draw.rounded_rectangle((dx, y0 - largo, dx + dedo_w * 0.8, y0 + dedo_w),
+                                   radius=dedo_w * 0.4, fill=relleno)
+    for draw, relleno in ((d, piel), (m, 255)):
+        draw.rounded_rectangle((x0 - dedo_w * 1.2, y0 + palma_h * 0.2,
+                                x0 + dedo_w * 0.5, y0 + palma_h * 0.45),
+                               radius=dedo_w * 0.4, fill=relleno)
+
+    # Líneas de la palma (corazón, cabeza, vida, destino)
+    grosor = max(2, ancho // 400)
+    oscuro = (70, 45, 35)
+    d.arc((x0, y0 - palma_h * 0.3, x0 + palma_w, y0 + palma_h * 0.5),
+          20, 160, fill=oscuro, width=grosor)
+    d.line((x0 + palma_w * 0.05, y0 + palma_h * 0.42,
+            x0 + palma_w * 0.85, y0 + palma_h * 0.5), fill=oscuro, width=grosor)
+    d.arc((x0 - palma_w * 0.3, y0 + palma_h * 0.1, x0 + palma_w * 0.45, y0 + palma_h * 1.4),
+          270, 360, fill=oscuro, width=grosor)
+    d.line((x0 + palma_w * 0.5, y0 + palma_h * 0.95,
+            x0 + palma_w * 0.52, y0 + palma_h * 0.25), fill=oscuro, width=grosor)
+
+    imagen = imagen.filter(ImageFilter.GaussianBlur(radius=max(1, ancho // 1500)))
+    if iluminacion:
+        # Luz lateral: oscurece linealmente hacia la derecha hasta (1 - iluminacion)
+        gradiente = Image.linear_gradient("L").rotate(90).resize((ancho, alto))
+        gradiente = gradiente.point(lambda v: round(255 * (1 - iluminacion * v / 255)))
+        imagen = Image.composite(imagen, Image.new("RGB", imagen.size), gradiente)
+    return imagen, mascara
+
+def dibujar_mano(ancho, alto, semilla=0, iluminacion=0.0):
+    """Dibuja una mano esquemática: palma, cinco dedos y líneas principales"""
+    return _dibujar(ancho, alto, semilla, iluminacion)[0]
+
+def generar_jpeg(resolucion="12mp", semilla=0, calidad=90, iluminacion=0.0):
+    """Devuelve los bytes JPEG de una mano sintética a la resolución indicada"""
+    return generar_etiquetada(resolucion, semilla, calidad, iluminacion)[0]
+
+def generar_etiquetada(resolucion="12mp", semilla=0, calidad=90, iluminacion=0.0):
+    """Bytes JPEG de una mano sintética y su máscara real como imagen L"""
+    ancho, alto = RESOLUCIONES[resolucion]
+    imagen, mascara = _dibujar(ancho, alto, semilla, iluminacion)
+    buffer = io.BytesIO()
+    imagen.save(buffer, format="JPEG", quality=calidad)
+    return buffer.getvalue(), mascara
@@ -0,0 +1,25 @@
+"""
+Medidas compartidas por los benchmarks: percentiles de latencia y pico de
+memoria residente del proceso
+"""
+
+import resource
+
+def percentil(valores, p):
+    """Percentil p (0-100) por rango más cercano"""
+    ordenados = sorted(valores)
+    indice = max(0, min(len(ordenados) - 1, round(p / 100 * len(ordenados)) - 1))
+    return ordenados[indice]
+
+def pico_rss_mb():
+    """Pico de memoria residente del proceso actual en MB"""
+    # VmHWM se reinicia en exec(); ru_maxrss puede heredar el pico del padre
+    try:
+        with open("/proc/self/status") as status:
+            for linea in status:
+                if linea.startswith("VmHWM:"):
+                    return int(linea.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss está en KiB en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
@@ -0,0 +1,125 @@
+"""
+Mapa de Tu Destino - Caché persistente de análisis por imagen
+El motor quirológico es determinista: el resultado de una foto depende solo
+de sus bytes y de la versión del análisis. Se guarda en un SQLite aparte con
+expulsión LRU y un tope de entradas.
+"""
+
+import json
+import os
+import time
+
+from base_datos import conectar, transaccion
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+RUTA_CACHE = os.getenv("DESTINO_CACHE_DB", "cache_analisis.db")
+
+# Tope de resultados guardados; al superarlo se expulsan los menos usados
+CACHE_MAX_ENTRADAS = int(os.getenv("CACHE_ANALISIS_MAX_ENTRADAS", "100000"))
+
+def clave_cache(sha256, rol, resolucion=None):
+    """Clave de una foto: hash del contenido + versión del análisis + etapas"""
+    # Import diferido: las estadísticas de la caché no necesitan cargar OpenCV
+    import quirologia
+
+    etapas = "forma" if rol in quirologia.ROLES_SIN_LINEAS else "forma+lineas"
+    return f"{sha256}:{quirologia.etiqueta_version(resolucion)}:{etapas}"
+
+# ============================================================================
+# CACHÉ
+# ============================================================================
+
+class CacheAnalisis:
+    """Caché LRU de resultados de analizar_imagen, con contadores de aciertos"""
+
+    def __init__(self, ruta=None, max_entradas=None):
+        self.max_entradas = max_entradas or CACHE_MAX_ENTRADAS
+        self._conn = conectar(ruta or RUTA_CACHE)
+        c = self._conn.cursor()
+        c.execute('''CREATE TABLE IF NOT EXISTS cache_analisis
+                     (clave TEXT PRIMARY KEY,
+                      resultado TEXT NOT NULL,
+                      usado_en REAL NOT NULL)''')
+        c.execute('''CREATE INDEX IF NOT EXISTS idx_cache_usado
+                     ON cache_analisis (usado_en)''')
+        # Contadores compartidos por todos los procesos que usan la caché
+        c.execute('''CREATE TABLE IF NOT EXISTS cache_contadores
+                     (nombre TEXT PRIMARY KEY,
+                      valor INTEGER NOT NULL DEFAULT 0)''')
+        self._conn.commit()
+
+    def obtener(self, claves):
+        """Devuelve {clave: resultado} de las claves presentes y cuenta aciertos/fallos"""
+        claves = list(dict.fromkeys(claves))
+        if not claves:
+            return {}
+
+        marcadores = ",".join("?" * len(claves))
+        with transaccion(self._conn) as conn:
+            filas = conn.execute(
+                f"SELECT clave, resultado FROM cache_analisis WHERE clave IN ({marcadores})",
+                claves
+            ).fetchall()
+            encontrados = {clave: json.loads(resultado) for clave, resultado in filas}
+
+            if encontrados:
+                conn.execute(
+                    f"UPDATE cache_analisis SET usado_en = ? WHERE clave IN "
+                    f"({','.join('?' * len(encontrados))})",
+                    (time.time(), *encontrados)
+                )
+            self._contar(conn, aciertos=len(encontrados),
+                         fallos=len(claves) - len(encontrados))
+
+        return encontrados
+
+    def guardar(self, resultados):
+        """Guarda {clave: resultado} y expulsa las entradas menos usadas si sobra"""
+        if not resultados:
+            return
+
+        ahora = time.time()
+        with transaccion(self._conn) as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO cache_analisis (clave, resultado, usado_en) "
+                "VALUES (?, ?, ?)",
+                [(clave, json.dumps(resultado), ahora) for clave, resultado in resultados.items()]
+            )
+
+            sobrantes = self._entradas(conn) - self.max_entradas
+            if sobrantes > 0:
+                conn.execute("""DELETE FROM cache_analisis WHERE clave IN
+                                (SELECT clave FROM cache_analisis
+                                 ORDER BY usado_en LIMIT ?)""", (sobrantes,))
+                self._contar(conn, expulsiones=sobrantes)
+
+    def estadisticas(self):
+        """Aciertos, fallos, expulsiones, entradas actuales y tasa de aciertos"""
+        conn = self._conn
+        contadores = dict(conn.execute("SELECT nombre, valor FROM cache_contadores").fetchall())
+        aciertos = contadores.get("aciertos", 0)
+        fallos = contadores.get("fallos", 0)
+
+        return {
+            "aciertos": aciertos,
+            "fallos": fallos,
+            "expulsiones": contadores.get("expulsiones", 0),
+            "entradas": self._entradas(conn),
+            "tasa_aciertos": aciertos / (aciertos + fallos) if aciertos + fallos else 0.0,
+        }
+
+    def cerrar(self):
+        self._conn.close()
+
+    def _entradas(self, conn):
+        return conn.execute("SELECT COUNT(*) FROM cache_analisis").fetchone()[0]
+
+    def _contar(self, conn, **incrementos):
+        conn.executemany(
+            """INSERT INTO cache_contadores (nombre, valor) VALUES (?, ?)
+               ON CONFLICT(nombre) DO UPDATE SET valor = valor + excluded.valor""",
+            [(nombre, valor) for nombre, valor in incrementos.items() if valor]
+        )
@@ -0,0 +1,99 @@
+"""
+Mapa de Tu Destino - Base de conocimientos
+Quirología, ciclos vitales y redacción del análisis automático
+"""
+
+import functools
+import json
+import os
+
+# ============================================================================
+# BASE DE CONOCIMIENTOS - QUIROLOGÍA Y CICLOS
+# ============================================================================
+
+# Archivo de datos versionado con la quirología y los ciclos vitales
+RUTA_CONOCIMIENTOS = os.getenv(
+    "DESTINO_CONOCIMIENTOS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "datos", "conocimientos.json")
+)
+
+# Versiones del archivo que sabe leer este código
+VERSIONES_SOPORTADAS = (1,)
+
+class ConocimientosIncompatibles(Exception):
+    """El archivo de conocimientos tiene una versión que este código no entiende"""
+
+@functools.lru_cache(maxsize=None)
+def cargar_conocimientos(ruta=None):
+    """
+    Lee la base de conocimientos una sola vez por proceso.
+
+    Devuelve (version, quirologia, ciclos_vitales); las claves de los ciclos
+    vuelven a ser enteros (en JSON son texto).
+    """
+    with open(ruta or RUTA_CONOCIMIENTOS, encoding="utf-8") as archivo:
+        datos = json.load(archivo)
+
+    version = datos.get("version")
+    if version not in VERSIONES_SOPORTADAS:
+        raise ConocimientosIncompatibles(
+            f"Versión de conocimientos {version!r} no soportada "
+            f"(se admiten {', '.join(map(str, VERSIONES_SOPORTADAS))})"
+        )
+
+    ciclos = {int(ano): ciclo for ano, ciclo in datos["ciclos_vitales"].items()}
+    return version, datos["quirologia"], ciclos
+
+VERSION_CONOCIMIENTOS, CONOCIMIENTOS_QUIROLOGIA, CICLOS_VITALES = cargar_conocimientos()
+
+# ============================================================================
+# REDACCIÓN DEL ANÁLISIS AUTOMÁTICO
+# ============================================================================
+
+def interpretar_analisis(lote):
+    """Genera la interpretación a partir del resultado de analizar_lote"""
+    resultados = {
+        "forma": lote["agregado"]["forma"],
+        "lineas": lote["agregado"]["lineas"],
+        "por_imagen": lote["por_imagen"],
+        "interpretacion": ""
+    }
+    
+    forma_info = CONOCIMIENTOS_QUIROLOGIA["formas_mano"].get(
+        resultados["forma"], 
+        {"personalidad": "Forma no identificada claramente"}
+    )
+    
+    resultados["interpretacion"] = f"""
+**Forma de Mano:** {resultados["forma"].capitalize()}
+{forma_info.get('personalidad', '')}
+
+**Líneas Principales:**
+- Línea de Vida: {resultados["lineas"].get("vida", "No detectada")}
+- Línea de Cabeza: {resultados["lineas"].get("cabeza", "No detectada")}
+- Línea de Corazón: {resultados["lineas"].get("corazon", "No detectada")}
+- Línea de Destino: {resultados["lineas"].get("destino", "No detectada")}
+        """
+    
+    return resultados
+
+def componer_analisis_completo(interpretacion, ano_personal):
+    """Combina el análisis quirológico con el ciclo vital del año personal"""
+    ciclo_info = CICLOS_VITALES.get(ano_personal, {})
+    
+    return f"""
+{interpretacion}
+
+**Ciclo Vital Actual (Año {ano_personal}):**
+{ciclo_info.get('nombre', 'Información no disponible')}
+
+{ciclo_info.get('descripcion', '')}
+
+**Recomendaciones para este ciclo:**
+{ciclo_info.get('consejos', '')}
+
+---
+**IMPORTANTE:** Esta es una interpretación automática basada en análisis digital. 
+Para una lectura personalizada y profunda, un experto revisará tu consulta y 
+te enviará su interpretación personal.
+        """
@@ -0,0 +1,94 @@
+"""
+Mapa de Tu Destino - Contadores materializados del dashboard
+La tabla `metricas` se mantiene con triggers sobre consultas y pagos, así que
+leer un total cuesta lo mismo con mil filas que con millones. Este módulo
+los lee y comprueba que coinciden con un recuento desde cero.
+
+Uso como comando de verificación:
+    python metricas.py [--reparar]
+"""
+
+import argparse
+import sys
+
+from base_datos import conectar, crear_esquema, sql_recuento_metricas, transaccion
+
+# Diferencia tolerada en sumas de importes (REAL acumulado por los triggers)
+TOLERANCIA = 1e-6
+
+# ============================================================================
+# LECTURA
+# ============================================================================
+
+def leer_dimension(conn, dimension):
+    """{clave: valor} de una dimensión, sin los contadores que quedaron a cero"""
+    return dict(conn.execute("""SELECT clave, valor FROM metricas
+                                WHERE dimension = ? AND valor != 0
+                                ORDER BY clave""", (dimension,)).fetchall())
+
+def contadores_dashboard(conn):
+    """Totales de la cabecera del dashboard: lecturas por clave primaria"""
+    estados = leer_dimension(conn, "consultas_estado")
+    ingresos = leer_dimension(conn, "ingresos_estado")
+    return {
+        "consultas": int(sum(estados.values())),
+        "pendientes": int(estados.get("pendiente", 0)),
+        "analizando": int(estados.get("analizando", 0)),
+        "completadas": int(estados.get("completada", 0)),
+        "ingresos": ingresos.get("completado", 0.0),
+    }
+
+# ============================================================================
+# VERIFICACIÓN
+# ============================================================================
+
+def _contadores(filas):
+    """{(dimension, clave): valor} sin ceros (un contador a cero equivale a no tenerlo)"""
+    return {(dimension, clave): valor for dimension, clave, valor in filas if valor}
+
+def verificar_metricas(conn):
+    """
+    Recalcula los contadores desde cero y los compara con los mantenidos.
+    Devuelve [(dimension, clave, mantenido, recontado)] de los que difieren.
+    """
+    with transaccion(conn):
+        # Mismo instante para ambos lados: ningún escritor entra entre lecturas
+        mantenidos = _contadores(conn.execute(
+            "SELECT dimension, clave, valor FROM metricas").fetchall())
+        recontados = _contadores(conn.execute(sql_recuento_metricas()).fetchall())
+
+    diferencias = []
+    for dimension, clave in sorted(mantenidos.keys() | recontados.keys()):
+        mantenido = mantenidos.get((dimension, clave), 0)
+        recontado = recontados.get((dimension, clave), 0)
+        if abs(mantenido - recontado) > TOLERANCIA:
+            diferencias.append((dimension, clave, mantenido, recontado))
+    return diferencias
+
+def reconstruir_metricas(conn):
+    """Sustituye todos los contadores por un recuento desde cero"""
+    with transaccion(conn):
+        conn.execute("DELETE FROM metricas")
+        conn.execute(f"INSERT INTO metricas (dimension, clave, valor) {sql_recuento_metricas()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verifica los contadores del dashboard")
+    parser.add_argument("--reparar", action="store_true",
+                        help="Reconstruye la tabla si hay diferencias")
+    args = parser.parse_args()
+
+    conn = conectar()
+    crear_esquema(conn)
+    diferencias = verificar_metricas(conn)
+
+    for dimension, clave, mantenido, recontado in diferencias:
+        print(f"{dimension} [{clave or '(vacío)'}]: mantenido {mantenido:g}, "
+              f"recontado {recontado:g}")
+    if not diferencias:
+        print("Contadores consistentes")
+    elif args.reparar:
+        reconstruir_metricas(conn)
+        print(f"Reconstruidos ({len(diferencias)} diferencias corregidas)")
+
+    conn.close()
+    sys.exit(1 if diferencias and not args.reparar else 0)
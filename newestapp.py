@@ -1,7 +1,7 @@
 import streamlit as st
-import google.generativeai as genai
 import os
-import base64
+
+import reading_core
 
 API_KEY = os.getenv("API_KEY")
 
@@ -9,26 +9,10 @@ if not API_KEY:
     st.error("Falta configurar la variable de entorno API_KEY.")
     st.stop()
 
-client = genai.Client(api_key=API_KEY)
-
-def build_prompt(question, personal_year):
-    return f"""
-Eres una consultora esotérica experta llamada 'Elara, la Observadora de Estrellas'.
-Usa numerología y lectura de manos para ofrecer una guía sabia, empática y empoderadora.
-
-Pregunta del usuario: "{question}"
-Año personal: {personal_year}
-
-Analiza también las imágenes de las manos del usuario siguiendo estos principios:
-- Forma de la mano y dedos
-- Líneas principales (vida, cabeza, corazón, destino)
-- Líneas débiles, fuertes, rotas
-- Símbolos presentes
-- Montes de la palma
-
-Entrega la lectura en formato **Markdown** y usa tablas cuando hables de ciclos o periodos.
-No hagas predicciones absolutas, solo guía.
-"""
+@st.cache_resource
+def get_backend():
+    """Backend de Gemini compartido por todas las sesiones (cliente y caché del proceso)."""
+    return reading_core.SyncBackend()
 
 st.title("🔮 Domina Tu Destino — Lectura Épica con Gemini")
 st.write("Servicio de lectura de manos + numerología generado con Gemini en Streamlit.")
@@ -45,30 +29,18 @@ if generate_btn:
         st.stop()
 
     with st.spinner("Consultando a Elara, la Observadora de Estrellas..."):
-        prompt = build_prompt(question, personal_year)
+        prompt = reading_core.build_prompt(question, personal_year)
 
-        image_parts = []
-        for img in uploaded_images:
-            base64_data = base64.b64encode(img.read()).decode("utf-8")
-            mime_type = img.type
-            image_parts.append({
-                "inline_data": {
-                    "data": base64_data,
-                    "mime_type": mime_type
-                }
-            })
+        contents = reading_core.build_contents(
+            prompt, [(img.getvalue(), img.type) for img in uploaded_images]
+        )
 
         try:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[
-                    {"text": prompt},
-                    *image_parts
-                ]
-            )
+            # Un doble clic o un reintento con la misma pregunta y fotos no vuelve a llamar al modelo
+            reading = get_backend().generate(contents)
 
             st.success("Lectura generada con éxito ✨")
-            st.markdown(response.text)
+            st.markdown(reading)
 
         except Exception as e:
             st.error(f"Error al generar la lectura: {e}")
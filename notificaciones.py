@@ -0,0 +1,297 @@
+"""
+Mapa de Tu Destino - Bandeja de salida de correos
+La app solo inserta los avisos en `correos_salientes` (en la misma
+transacción que el cambio que los origina); este despachador los envía en
+segundo plano reutilizando una conexión SMTP autenticada por lote, con
+reintentos con espera exponencial y un tope de envíos por minuto.
+
+Uso como proceso independiente:
+    python notificaciones.py [--intervalo SEGUNDOS]
+
+Prueba local sin proveedor real:
+    python -m aiosmtpd -n -l localhost:8025
+    SMTP_HOST=localhost SMTP_PORT=8025 SMTP_STARTTLS=0 python notificaciones.py
+"""
+
+import argparse
+import logging
+import os
+import smtplib
+import threading
+from email.message import EmailMessage
+
+from base_datos import conectar, crear_esquema, transaccion
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+SMTP_HOST = os.getenv("SMTP_HOST", "")
+SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+SMTP_USUARIO = os.getenv("SMTP_USUARIO", "")
+SMTP_PASSWORD = os.getenv("SMTP_PASSWORD", "")
+SMTP_STARTTLS = os.getenv("SMTP_STARTTLS", "1") == "1"
+SMTP_REMITENTE = os.getenv("SMTP_REMITENTE", SMTP_USUARIO or "no-responder@localhost")
+SMTP_TIMEOUT = float(os.getenv("SMTP_TIMEOUT", "30"))
+
+# Cuota del proveedor; se cuenta sobre la tabla, así que vale para todos los despachadores
+SMTP_MAX_POR_MINUTO = int(os.getenv("SMTP_MAX_POR_MINUTO", "60"))
+
+# Correos enviados por la misma conexión en cada vuelta del despachador
+TAMANO_LOTE = int(os.getenv("CORREO_TAMANO_LOTE", "50"))
+
+# Reintentos: espera de ESPERA_BASE * 2^(intento - 1) segundos, hasta ESPERA_MAXIMA
+MAX_INTENTOS = 6
+ESPERA_BASE = 30
+ESPERA_MAXIMA = 3600
+
+# Segundos que un despachador retiene un correo; al vencer, otro puede tomarlo
+DURACION_LEASE = 300
+
+def smtp_configurado():
+    """Hay un servidor SMTP configurado al que enviar"""
+    return bool(SMTP_HOST)
+
+# ============================================================================
+# ENCOLADO (LADO WEB)
+# ============================================================================
+
+def encolar_correos(conn, correos):
+    """
+    Inserta [(destinatario, asunto, cuerpo)] en la bandeja de salida.
+    Dentro de una transacción abierta se suma a ella: el aviso se guarda con
+    el cambio que lo origina o no se guarda.
+    """
+    correos = list(correos)
+    if correos:
+        with transaccion(conn):
+            conn.executemany("""INSERT INTO correos_salientes (destinatario, asunto, cuerpo)
+                                VALUES (?, ?, ?)""", correos)
+    return len(correos)
+
+# ============================================================================
+# CICLO DE VIDA DE LOS CORREOS
+# ============================================================================
+
+def cupo_disponible(conn):
+    """
+    Envíos que aún caben en la ventana del último minuto. Los correos que otro
+    despachador tiene reclamados (lease vigente) cuentan ya contra la cuota.
+    """
+    ocupados = conn.execute("""SELECT COUNT(*) FROM correos_salientes
+                               WHERE enviado_at >= datetime('now', '-60 seconds')
+                                  OR (estado = 'enviando'
+                                      AND lease_hasta >= datetime('now'))""").fetchone()[0]
+    return max(0, SMTP_MAX_POR_MINUTO - ocupados)
+
+def reclamar_correos(conn, limite):
+    """Toma hasta `limite` correos listos (o con lease vencido) de forma atómica"""
+    with transaccion(conn):
+        # Lease vencido en el último intento: el despachador murió a mitad de envío
+        conn.execute("""UPDATE correos_salientes
+                        SET estado = 'error', error = 'lease vencido', lease_hasta = NULL
+                        WHERE estado = 'enviando' AND intentos >= ?
+                          AND lease_hasta < datetime('now')""", (MAX_INTENTOS,))
+        filas = conn.execute("""
+            UPDATE correos_salientes
+            SET estado = 'enviando', intentos = intentos + 1,
+                lease_hasta = datetime('now', ?)
+            WHERE id IN (SELECT id FROM correos_salientes
+                         WHERE (estado = 'pendiente' AND proximo_intento <= datetime('now'))
+                            OR (estado = 'enviando' AND lease_hasta < datetime('now'))
+                         ORDER BY id
+                         LIMIT ?)
+            RETURNING id, destinatario, asunto, cuerpo, intentos""",
+            (f"+{DURACION_LEASE} seconds", limite)).fetchall()
+
+    return [{"id": f[0], "destinatario": f[1], "asunto": f[2], "cuerpo": f[3], "intentos": f[4]}
+            for f in sorted(filas)]
+
+def marcar_enviados(conn, ids):
+    """Cierra los correos entregados al servidor SMTP"""
+    if not ids:
+        return
+    with transaccion(conn):
+        conn.executemany("""UPDATE correos_salientes
+                            SET estado = 'enviado', enviado_at = CURRENT_TIMESTAMP,
+                                lease_hasta = NULL, error = NULL
+                            WHERE id = ?""", [(i,) for i in ids])
+
+def devolver_correos(conn, ids):
+    """
+    Devuelve a la cola correos reclamados que no llegaron a intentarse (la
+    conexión cayó antes), sin gastar su intento y tras la espera base.
+    """
+    if not ids:
+        return
+    with transaccion(conn):
+        conn.executemany("""UPDATE correos_salientes
+                            SET estado = 'pendiente', intentos = intentos - 1, lease_hasta = NULL,
+                                proximo_intento = datetime('now', ?)
+                            WHERE id = ?""", [(f"+{ESPERA_BASE} seconds", i) for i in ids])
+
+def espera_reintento(intentos):
+    """Segundos hasta el siguiente intento tras `intentos` fallidos"""
+    return min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** (intentos - 1))
+
+def reprogramar_fallidos(conn, fallidos):
+    """
+    Devuelve a la cola [(correo, error)] con espera exponencial, o los marca
+    como fallidos si el error es permanente o agotaron sus intentos.
+    """
+    if not fallidos:
+        return
+    with transaccion(conn):
+        for correo, error in fallidos:
+            definitivo = _es_permanente(error) or correo["intentos"] >= MAX_INTENTOS
+            conn.execute("""UPDATE correos_salientes
+                            SET estado = ?, error = ?, lease_hasta = NULL,
+                                proximo_intento = datetime('now', ?)
+                            WHERE id = ?""",
+                         ("error" if definitivo else "pendiente", str(error) or type(error).__name__,
+                          f"+{espera_reintento(correo['intentos'])} seconds", correo["id"]))
+
+def _es_permanente(error):
+    """Rechazo 5xx del servidor: reintentar no cambiaría el resultado"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(500 <= codigo < 600 for codigo, _ in error.recipients.values())
+    codigo = getattr(error, "smtp_code", None)
+    return codigo is not None and 500 <= codigo < 600
+
+# ============================================================================
+# CONEXIÓN SMTP
+# ============================================================================
+
+class ConexionSMTP:
+    """Una conexión SMTP autenticada que se reutiliza entre lotes y se reabre si cae"""
+
+    def __init__(self, host=None, port=None, usuario=None, password=None, starttls=None):
+        self.host = host or SMTP_HOST
+        self.port = port or SMTP_PORT
+        self.usuario = usuario if usuario is not None else SMTP_USUARIO
+        self.password = password if password is not None else SMTP_PASSWORD
+        self.starttls = SMTP_STARTTLS if starttls is None else starttls
+        self._smtp = None
+
+    def _abrir(self):
+        """Conecta, negocia TLS y se autentica una sola vez por conexión"""
+        smtp = smtplib.SMTP(self.host, self.port, timeout=SMTP_TIMEOUT)
+        try:
+            if self.starttls:
+                smtp.starttls()
+            if self.usuario:
+                smtp.login(self.usuario, self.password)
+        except Exception:
+            smtp.close()
+            raise
+        self._smtp = smtp
+
+    def enviar(self, mensaje):
+        """Envía un mensaje; si el servidor cerró la conexión, reconecta una vez"""
+        if self._smtp is None:
+            self._abrir()
+        try:
+            self._smtp.send_message(mensaje)
+        except smtplib.SMTPServerDisconnected:
+            self._smtp = None
+            self._abrir()
+            self._smtp.send_message(mensaje)
+
+    def cerrar(self):
+        """Cierra la conexión (p. ej. cuando la cola se vacía)"""
+        if self._smtp is None:
+            return
+        try:
+            self._smtp.quit()
+        except (smtplib.SMTPException, OSError):
+            self._smtp.close()
+        finally:
+            self._smtp = None
+
+def construir_mensaje(correo):
+    """EmailMessage de texto plano a partir de una fila de la bandeja"""
+    mensaje = EmailMessage()
+    mensaje["From"] = SMTP_REMITENTE
+    mensaje["To"] = correo["destinatario"]
+    mensaje["Subject"] = correo["asunto"]
+    mensaje.set_content(correo["cuerpo"])
+    return mensaje
+
+# ============================================================================
+# BUCLE DEL DESPACHADOR
+# ============================================================================
+
+def procesar_salientes(conn, smtp, limite=None):
+    """Envía un lote por la conexión `smtp`; devuelve cuántos correos se reclamaron"""
+    cupo = cupo_disponible(conn)
+    if not cupo:
+        return 0
+    correos = reclamar_correos(conn, min(limite or TAMANO_LOTE, cupo))
+
+    enviados, fallidos, sin_intentar = [], [], []
+    for i, correo in enumerate(correos):
+        try:
+            smtp.enviar(construir_mensaje(correo))
+            enviados.append(correo["id"])
+        except (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException) as e:
+            # El servidor rechazó este mensaje; la sesión sigue sirviendo para el resto
+            fallidos.append((correo, e))
+        except (smtplib.SMTPException, OSError) as e:
+            # Fallo de red o de sesión: el resto del lote vuelve a la cola intacto
+            fallidos.append((correo, e))
+            sin_intentar = [c["id"] for c in correos[i + 1:]]
+            smtp.cerrar()
+            break
+
+    marcar_enviados(conn, enviados)
+    reprogramar_fallidos(conn, fallidos)
+    devolver_correos(conn, sin_intentar)
+    return len(correos)
+
+def ejecutar_despachador(ruta_db=None, intervalo=5.0, detener=None, smtp=None):
+    """Vacía la bandeja de salida hasta que se active `detener` (threading.Event)"""
+    detener = detener or threading.Event()
+    conn = conectar(ruta_db)
+    crear_esquema(conn)
+    smtp = smtp or ConexionSMTP()
+
+    while not detener.is_set():
+        try:
+            procesados = procesar_salientes(conn, smtp)
+        except Exception as e:
+            logger.exception("Error en el despachador de correos: %s", e)
+            procesados = 0
+
+        if not procesados:
+            # Sin trabajo no se retiene la sesión: el servidor la cortaría igualmente
+            smtp.cerrar()
+            detener.wait(intervalo)
+
+    smtp.cerrar()
+    conn.close()
+
+def iniciar_despachador_en_hilo(ruta_db=None, intervalo=5.0):
+    """Arranca el despachador en un hilo daemon dentro del proceso actual"""
+    hilo = threading.Thread(
+        target=ejecutar_despachador,
+        args=(ruta_db, intervalo),
+        name="despachador-correos",
+        daemon=True
+    )
+    hilo.start()
+    return hilo
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Despachador de la bandeja de correos")
+    parser.add_argument("--intervalo", type=float, default=5.0,
+                        help="Segundos de espera cuando la bandeja está vacía")
+    args = parser.parse_args()
+
+    if not smtp_configurado():
+        parser.error("Configura SMTP_HOST (y SMTP_PORT, SMTP_USUARIO, SMTP_PASSWORD)")
+    try:
+        ejecutar_despachador(intervalo=args.intervalo)
+    except KeyboardInterrupt:
+        pass
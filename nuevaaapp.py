@@ -1,30 +1,13 @@
 import streamlit as st
-import google.generativeai as genai
 
-# Configura la API key desde secrets
-genai.configure(api_key=st.secrets["GOOGLE_API_KEY"])
+import reading_core
 
-# -------------------------------------------------------------
-# PROMPT BASE (versión simplificada del servicio original)
-# -------------------------------------------------------------
-def build_prompt(question, personal_year):
-    return f"""
-Eres una consultora esotérica experta llamada 'Elara, la Observadora de Estrellas'.
-Usa numerología y lectura de manos para ofrecer una guía sabia, empática y empoderadora.
-
-Pregunta del usuario: "{question}"
-Año personal: {personal_year}
+# Configura la API key desde secrets (el cliente se crea una vez por proceso)
+@st.cache_resource
+def get_backend():
+    """Backend de Gemini compartido por todas las sesiones (cliente y caché del proceso)."""
+    return reading_core.SyncBackend(client=reading_core.get_client(st.secrets["GOOGLE_API_KEY"]))
 
-Analiza también las imágenes de las manos del usuario siguiendo estos principios:
-- Forma de la mano y dedos
-- Líneas principales (vida, cabeza, corazón, destino)
-- Líneas débiles, fuertes, rotas
-- Símbolos presentes
-- Montes de la palma
-
-Entrega la lectura en formato **Markdown** y usa tablas cuando hables de ciclos o periodos.
-No hagas predicciones absolutas, solo guía.
-"""
 
 # -------------------------------------------------------------
 # STREAMLIT UI
@@ -51,32 +34,19 @@ if generate_btn:
     with st.spinner("Consultando a Elara, la Observadora de Estrellas..."):
 
         # Construir prompt
-        prompt = build_prompt(question, personal_year)
-
-        # Construir partes de imagen
-        image_parts = []
-        for img in uploaded_images:
-            base64_data = base64.b64encode(img.read()).decode("utf-8")
-            mime_type = img.type
+        prompt = reading_core.build_prompt(question, personal_year)
 
-            image_parts.append({
-                "inline_data": {
-                    "data": base64_data,
-                    "mime_type": mime_type
-                }
-            })
+        # Construir partes de imagen (reducidas y sin metadatos, sin pasar por base64)
+        contents = reading_core.build_contents(
+            prompt, [(img.getvalue(), img.type) for img in uploaded_images]
+        )
 
         try:
-            response = client.models.generate_content(
-                model="gemini-2.5-flash",
-                contents=[
-                    {"text": prompt},
-                    *image_parts
-                ]
-            )
+            # Un doble clic o un reintento con la misma pregunta y fotos no vuelve a llamar al modelo
+            reading = get_backend().generate(contents)
 
             st.success("Lectura generada con éxito ✨")
-            st.markdown(response.text)
+            st.markdown(reading)
 
         except Exception as e:
-            st.error(f"Error al generar la lectura: {e}")
\ No newline at end of file
+            st.error(f"Error al generar la lectura: {e}")
@@ -0,0 +1,103 @@
+"""
+Mapa de Tu Destino - Numerología
+Año personal, año universal y mes personal a partir de tablas precalculadas,
+para una fecha suelta o para columnas enteras de fechas de nacimiento
+"""
+
+import datetime
+
+import numpy as np
+
+# ============================================================================
+# TABLAS PRECALCULADAS
+# ============================================================================
+
+# La reducción a un dígito (1-9) es la raíz digital: reducir(a + b) depende
+# solo de reducir(a) + reducir(b), así que basta con una tabla pequeña para
+# día + mes y otra para sumas de dos raíces.
+
+# REDUCCION[n] para n en 0..18: raíz digital de n (0 se queda en 0)
+REDUCCION = np.array([0] + [1 + (n - 1) % 9 for n in range(1, 19)], dtype=np.int8)
+
+# TABLA_DIA_MES[mes, dia]: raíz digital de dia + mes (fila y columna 0 sin uso)
+TABLA_DIA_MES = np.zeros((13, 32), dtype=np.int8)
+TABLA_DIA_MES[1:, 1:] = 1 + (np.arange(1, 13)[:, None] + np.arange(1, 32)[None, :] - 1) % 9
+
+# ============================================================================
+# API DE UNA FECHA
+# ============================================================================
+
+def reducir(numero):
+    """Reduce un entero positivo a un dígito (1-9) sumando sus cifras"""
+    return 1 + (numero - 1) % 9 if numero > 0 else 0
+
+def calcular_ano_universal(ano=None):
+    """Año universal: las cifras del año reducidas a un dígito"""
+    return reducir(ano if ano is not None else datetime.date.today().year)
+
+def calcular_ano_personal(fecha_nacimiento, ano=None):
+    """Año personal de `ano` (por defecto, el actual): día + mes de nacimiento + año"""
+    if ano is None:
+        ano = datetime.date.today().year
+    return int(REDUCCION[TABLA_DIA_MES[fecha_nacimiento.month, fecha_nacimiento.day]
+                         + reducir(ano)])
+
+def calcular_mes_personal(fecha_nacimiento, ano=None, mes=None):
+    """Mes personal: año personal + mes del calendario (por defecto, el actual)"""
+    hoy = datetime.date.today()
+    ano_personal = calcular_ano_personal(fecha_nacimiento, ano if ano is not None else hoy.year)
+    return int(REDUCCION[ano_personal + reducir(mes if mes is not None else hoy.month)])
+
+# ============================================================================
+# API VECTORIZADA (COLUMNAS DE FECHAS)
+# ============================================================================
+
+def _dia_mes(fechas):
+    """Arrays (dia, mes, validas) de una secuencia de fechas; NaT/None no son válidas"""
+    dias = np.asarray(fechas, dtype="datetime64[D]")
+    validas = ~np.isnat(dias)
+    meses = dias.astype("datetime64[M]")
+    mes = (meses - dias.astype("datetime64[Y]").astype("datetime64[M]")).astype(np.int64) + 1
+    dia = (dias - meses.astype("datetime64[D]")).astype(np.int64) + 1
+    # Las posiciones sin fecha apuntan a la fila 0 de la tabla, que vale 0
+    return np.where(validas, dia, 0), np.where(validas, mes, 0), validas
+
+def _raices(anos):
+    """Raíz digital de un año o de un array de años"""
+    anos = np.asarray(anos, dtype=np.int64)
+    return np.where(anos > 0, 1 + (anos - 1) % 9, 0)
+
+def _como_entrada(fechas, valores):
+    """Devuelve una Series con el mismo índice si la entrada era una Series de pandas"""
+    if type(fechas).__module__.startswith("pandas"):
+        import pandas as pd
+        return pd.Series(valores, index=fechas.index, name=getattr(fechas, "name", None))
+    return valores
+
+def anos_universales(anos):
+    """Año universal de cada año de un array"""
+    return _raices(anos).astype(np.int8)
+
+def anos_personales(fechas, ano=None):
+    """
+    Año personal de cada fecha de nacimiento de una columna.
+
+    `fechas` puede ser una lista de date/datetime, un array datetime64 o una
+    Series de pandas (se devuelve una Series con el mismo índice). `ano` es
+    un año o un array de años del mismo largo (por defecto, el actual). Las
+    fechas vacías (None/NaT) dan 0.
+    """
+    dia, mes, validas = _dia_mes(fechas)
+    if ano is None:
+        ano = datetime.date.today().year
+    valores = np.where(validas, REDUCCION[TABLA_DIA_MES[mes, dia] + _raices(ano)], 0)
+    return _como_entrada(fechas, valores.astype(np.int8))
+
+def meses_personales(fechas, ano=None, mes=None):
+    """Mes personal de cada fecha de nacimiento (año personal + mes del calendario)"""
+    hoy = datetime.date.today()
+    _, _, validas = _dia_mes(fechas)
+    anos = np.asarray(anos_personales(fechas, ano if ano is not None else hoy.year))
+    mes = mes if mes is not None else hoy.month
+    valores = np.where(validas, REDUCCION[anos + _raices(mes)], 0)
+    return _como_entrada(fechas, valores.astype(np.int8))
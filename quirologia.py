@@ -0,0 +1,546 @@
+"""
+Mapa de Tu Destino - Motor de análisis quirológico
+Procesamiento de imágenes de manos por lotes, independiente de Streamlit
+"""
+
+import io
+import mmap
+import os
+from collections import Counter
+
+import cv2
+import numpy as np
+from PIL import Image, ImageOps
+
+# ============================================================================
+# CONFIGURACIÓN DEL MOTOR
+# ============================================================================
+
+# Orden de las fotos del formulario; define la prioridad al desempatar
+ROLES_FOTOS = ("palma_derecha", "palma_izquierda", "dorso", "adicional")
+
+# Fotos en las que se buscan líneas (el dorso no muestra las líneas de la palma)
+ROLES_SIN_LINEAS = ("dorso",)
+
+LINEAS_PRINCIPALES = ("vida", "cabeza", "corazon", "destino")
+
+RESULTADOS_INVALIDOS = ("indeterminada", "error")
+
+# Cambiar al modificar cualquier etapa del análisis: invalida la caché de resultados
+VERSION_ANALISIS = 3
+
+# Lado mayor (px) al que se reduce la región de la mano antes de OpenCV.
+# 0 desactiva la normalización y analiza a resolución completa.
+RESOLUCION_TRABAJO = int(os.getenv("QUIROLOGIA_RESOLUCION_TRABAJO", "1024"))
+
+# Lado mayor de la miniatura sobre la que se segmenta y localiza la mano
+RESOLUCION_RECORTE = 256
+
+# Modelo de color de piel: rango en YCrCb (Y, Cr, Cb) y tono/saturación en HSV
+PIEL_YCRCB_MIN = (0, 133, 77)
+PIEL_YCRCB_MAX = (255, 173, 127)
+PIEL_TONO_MAX = 25
+PIEL_SATURACION_MIN = 25
+
+# Fracción de la miniatura con color de piel para fiarse del modelo de color
+FRACCION_PIEL_MIN = 0.03
+FRACCION_PIEL_MAX = 0.9
+
+# Margen alrededor de la mano al recortar (fracción del tamaño del recuadro)
+MARGEN_RECORTE = 0.05
+
+# Parámetros de Hough expresados a resolución original; se escalan con la imagen
+HOUGH_UMBRAL = 100
+HOUGH_LONGITUD_MINIMA = 50
+HOUGH_SEPARACION_MAXIMA = 10
+
+# Clasificación de segmentos por orientación (grados respecto a la horizontal)
+# y por posición dentro de la palma (0 = borde superior, 1 = muñeca)
+ANGULO_HORIZONTAL = 25
+ANGULO_VERTICAL = 70
+LIMITE_CORAZON_CABEZA = 0.4
+ANCHO_BANDA_DESTINO = 0.2
+
+# Fracción de filas/columnas ocupadas por la mano para considerarlas palma
+OCUPACION_PALMA = 0.6
+
+# Erosión de la máscara (fracción del lado mayor) para descartar el contorno
+EROSION_CONTORNO = 0.02
+
+# Puntos muestreados por segmento para medir la intensidad del borde
+MUESTRAS_SEGMENTO = 9
+
+# Umbrales de las medidas, relativos a la palma
+LONGITUD_LARGA = 0.55
+LONGITUD_CORTA = 0.35
+HUECO_MINIMO = 0.05
+PROFUNDIDAD_MARCADA = 1.25
+CURVATURA_MINIMA = 10.0
+
+def etiqueta_version(resolucion=None):
+    """Identifica la versión del análisis y la resolución con la que se calcula"""
+    if resolucion is None:
+        resolucion = RESOLUCION_TRABAJO
+    return f"v{VERSION_ANALISIS}-r{resolucion}"
+
+# ============================================================================
+# ETAPA COMÚN - DECODIFICACIÓN Y ARRAYS INTERMEDIOS
+# ============================================================================
+
+def _a_array(imagen):
+    """Convierte una imagen PIL a array RGB o de grises (los arrays pasan tal cual)"""
+    if isinstance(imagen, np.ndarray):
+        return imagen
+    if imagen.mode not in ("RGB", "L"):
+        imagen = imagen.convert("RGB")
+    return np.asarray(imagen)
+
+def _a_escala_grises(img_array):
+    """Convierte un array RGB(A) a escala de grises una sola vez"""
+    if img_array.ndim == 2:
+        return img_array
+    if img_array.shape[2] == 4:
+        return cv2.cvtColor(img_array, cv2.COLOR_RGBA2GRAY)
+    return cv2.cvtColor(img_array, cv2.COLOR_RGB2GRAY)
+
+def abrir_imagen(imagen):
+    """Abre bytes crudos o un mmap de una foto como imagen PIL (sin decodificar aún)"""
+    if isinstance(imagen, (bytes, bytearray, memoryview)):
+        return Image.open(io.BytesIO(imagen))
+    if isinstance(imagen, mmap.mmap):
+        return Image.open(imagen)
+    return imagen
+
+def _reducir(gray, lado_maximo):
+    """Reduce un array para que su lado mayor no supere lado_maximo"""
+    alto, ancho = gray.shape[:2]
+    factor = lado_maximo / max(alto, ancho)
+    if factor >= 1:
+        return gray, 1.0
+
+    tamano = (max(1, round(ancho * factor)), max(1, round(alto * factor)))
+    return cv2.resize(gray, tamano, interpolation=cv2.INTER_AREA), factor
+
+# ============================================================================
+# SEGMENTACIÓN DE LA MANO
+# ============================================================================
+
+def _mascara_piel(miniatura):
+    """Píxeles con color de piel en YCrCb y HSV a la vez"""
+    if miniatura.shape[2] == 4:
+        miniatura = cv2.cvtColor(miniatura, cv2.COLOR_RGBA2RGB)
+    ycrcb = cv2.inRange(cv2.cvtColor(miniatura, cv2.COLOR_RGB2YCrCb),
+                        PIEL_YCRCB_MIN, PIEL_YCRCB_MAX)
+    hsv = cv2.cvtColor(miniatura, cv2.COLOR_RGB2HSV)
+    # El tono de la piel rodea el rojo: 0-25 y 165-180 en la escala de OpenCV
+    tono = cv2.inRange(hsv, (0, PIEL_SATURACION_MIN, 0), (PIEL_TONO_MAX, 255, 255)) | \
+           cv2.inRange(hsv, (180 - PIEL_TONO_MAX, PIEL_SATURACION_MIN, 0), (180, 255, 255))
+    return ycrcb & tono
+
+def segmentar_mano(img_array):
+    """
+    Segmenta la mano sobre una miniatura del array (RGB o grises).
+
+    Combina un modelo de color de piel (YCrCb + HSV) con un umbral de Otsu
+    sobre los grises: la clase de Otsu que más piel contiene completa las
+    zonas de piel en sombra o quemadas por la luz. Sin color, o si la piel
+    ocupa una fracción inverosímil de la foto, se usa solo Otsu con la mano
+    como clase oscura. Tras limpiar la máscara con apertura y cierre se queda
+    con la componente mayor, rellena.
+
+    Devuelve (mascara, factor): máscara uint8 (0/255) de la miniatura y la
+    relación entre sus píxeles y los del array.
+    """
+    miniatura, factor = _reducir(img_array, RESOLUCION_RECORTE)
+    gray = cv2.GaussianBlur(_a_escala_grises(miniatura), (5, 5), 0)
+    _, oscura = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    mascara = oscura
+    elipse = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (5, 5))
+
+    if miniatura.ndim == 3:
+        piel = _mascara_piel(miniatura)
+        if FRACCION_PIEL_MIN <= np.count_nonzero(piel) / piel.size <= FRACCION_PIEL_MAX:
+            clara = cv2.bitwise_not(oscura)
+            otsu = oscura if np.count_nonzero(oscura & piel) >= np.count_nonzero(clara & piel) \
+                else clara
+            # Solo el borde de la clase de Otsu pegado a la piel detectada
+            mascara = piel | (otsu & cv2.dilate(piel, elipse))
+
+    mascara = cv2.morphologyEx(mascara, cv2.MORPH_OPEN, elipse)
+    mascara = cv2.morphologyEx(mascara, cv2.MORPH_CLOSE, elipse)
+
+    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    limpia = np.zeros_like(mascara)
+    if contornos:
+        # Rellena la mano entera: las líneas oscuras de la palma no son piel
+        cv2.drawContours(limpia, [max(contornos, key=cv2.contourArea)], -1, 255, cv2.FILLED)
+    return limpia, factor
+
+def _region_mano(mascara, factor, forma):
+    """Recuadro de la mano en el array original a partir de la máscara; None si está vacía"""
+    puntos = cv2.findNonZero(mascara)
+    if puntos is None:
+        return None
+
+    x, y, w, h = cv2.boundingRect(puntos)
+    margen_x, margen_y = w * MARGEN_RECORTE, h * MARGEN_RECORTE
+    alto, ancho = forma[:2]
+
+    x0 = max(0, int((x - margen_x) / factor))
+    y0 = max(0, int((y - margen_y) / factor))
+    x1 = min(ancho, int(np.ceil((x + w + margen_x) / factor)))
+    y1 = min(alto, int(np.ceil((y + h + margen_y) / factor)))
+    return x0, y0, x1, y1
+
+def _ampliar_mascara(mascara, factor, region, forma):
+    """Lleva la máscara de la miniatura al recorte `region` reducido a `forma`"""
+    x0, y0, x1, y1 = region
+    recorte = mascara[int(y0 * factor):int(np.ceil(y1 * factor)),
+                      int(x0 * factor):int(np.ceil(x1 * factor))]
+    if not recorte.size:
+        return np.zeros(forma[:2], dtype=np.uint8)
+    return cv2.resize(recorte, (forma[1], forma[0]), interpolation=cv2.INTER_NEAREST)
+
+def normalizar_imagen(imagen, resolucion=None):
+    """
+    Corrige la orientación EXIF, segmenta la mano, recorta a su región y reduce
+    a la resolución de trabajo. Devuelve (gray, mascara, escala): la máscara de
+    la mano tiene el tamaño de gray y escala es la relación entre los píxeles
+    de trabajo y los de la foto original.
+    """
+    if resolucion is None:
+        resolucion = RESOLUCION_TRABAJO
+    escala = 1.0
+    imagen = abrir_imagen(imagen)
+
+    if not isinstance(imagen, np.ndarray):
+        lado_original = max(imagen.size)
+        if resolucion:
+            # En JPEG decodifica directamente a una escala reducida (DCT)
+            imagen.draft("RGB", (resolucion, resolucion))
+        imagen = ImageOps.exif_transpose(imagen)
+        escala = max(imagen.size) / lado_original
+
+    img_array = _a_array(imagen)
+    mascara, factor_mascara = segmentar_mano(img_array)
+    gray = _a_escala_grises(img_array)
+    region = (0, 0, gray.shape[1], gray.shape[0])
+
+    if resolucion:
+        region = _region_mano(mascara, factor_mascara, gray.shape) or region
+        x0, y0, x1, y1 = region
+        gray, factor = _reducir(gray[y0:y1, x0:x1], resolucion)
+        gray = np.ascontiguousarray(gray)
+        escala *= factor
+
+    return gray, _ampliar_mascara(mascara, factor_mascara, region, gray.shape), escala
+
+def preparar_imagen(imagen, resolucion=None):
+    """Calcula los arrays compartidos por las etapas de forma y líneas"""
+    gray, mascara, escala = normalizar_imagen(imagen, resolucion)
+    contornos, _ = cv2.findContours(mascara, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    edges = cv2.Canny(gray, 50, 150)
+
+    return {
+        "gray": gray,
+        "mascara": mascara,
+        "contorno": max(contornos, key=cv2.contourArea) if contornos else None,
+        "edges": edges,
+        "escala": escala,
+    }
+
+# ============================================================================
+# ETAPAS DE ANÁLISIS SOBRE ARRAYS PREPARADOS
+# ============================================================================
+
+def clasificar_forma(preparada):
+    """Clasifica la forma de la mano a partir de su contorno segmentado"""
+    try:
+        contorno_mano = preparada["contorno"]
+
+        if contorno_mano is not None:
+            # Calcular proporciones
+            x, y, w, h = cv2.boundingRect(contorno_mano)
+            ratio = h / w if w > 0 else 1
+
+            # Clasificar según ratio
+            if 0.9 <= ratio <= 1.1:
+                return "cuadrada"
+            elif ratio > 1.3:
+                return "filosofica"
+            elif ratio < 0.9:
+                return "espatulada"
+            else:
+                return "conica"
+
+        return "indeterminada"
+    except Exception:
+        return "error"
+
+def _region_palma(mascara):
+    """Recuadro de la palma: filas y columnas mayoritariamente ocupadas por la mano"""
+    filas = mascara.mean(axis=1)
+    filas_palma = np.flatnonzero(filas >= OCUPACION_PALMA * filas.max())
+    if filas.max() == 0 or len(filas_palma) < 2:
+        return None
+
+    y0, y1 = filas_palma[0], filas_palma[-1]
+    columnas = mascara[y0:y1 + 1].mean(axis=0)
+    columnas_palma = np.flatnonzero(columnas >= OCUPACION_PALMA * columnas.max())
+    if len(columnas_palma) < 2:
+        return None
+    return columnas_palma[0], y0, columnas_palma[-1], y1
+
+def _segmentos_interiores(preparada):
+    """Segmentos de Hough (N, 4) con extremos y punto medio dentro de la mano"""
+    escala = preparada.get("escala", 1.0)
+    lines = cv2.HoughLinesP(preparada["edges"], 1, np.pi/180,
+                            max(1, round(HOUGH_UMBRAL * escala)),
+                            minLineLength=max(1, round(HOUGH_LONGITUD_MINIMA * escala)),
+                            maxLineGap=max(1, round(HOUGH_SEPARACION_MAXIMA * escala)))
+    if lines is None:
+        return np.empty((0, 4), dtype=np.float32)
+
+    # Sin el contorno de la mano, que Canny detecta como borde más fuerte
+    lado = max(1, round(EROSION_CONTORNO * max(preparada["mascara"].shape)))
+    interior = cv2.erode(preparada["mascara"], np.ones((2 * lado + 1,) * 2, np.uint8))
+
+    segmentos = lines.reshape(-1, 4)
+    x0, y0, x1, y1 = segmentos.T
+    dentro = (interior[y0, x0] > 0) & (interior[y1, x1] > 0) & \
+             (interior[(y0 + y1) // 2, (x0 + x1) // 2] > 0)
+    return segmentos[dentro].astype(np.float32)
+
+def _intensidad_bordes(gray, segmentos):
+    """Magnitud media del gradiente muestreada a lo largo de cada segmento"""
+    gx = cv2.Sobel(gray, cv2.CV_32F, 1, 0, ksize=3)
+    gy = cv2.Sobel(gray, cv2.CV_32F, 0, 1, ksize=3)
+    magnitud = cv2.magnitude(gx, gy)
+
+    t = np.linspace(0, 1, MUESTRAS_SEGMENTO, dtype=np.float32)[None, :]
+    xs = segmentos[:, 0:1] + t * (segmentos[:, 2:3] - segmentos[:, 0:1])
+    ys = segmentos[:, 1:2] + t * (segmentos[:, 3:4] - segmentos[:, 1:2])
+    alto, ancho = magnitud.shape
+    xs = np.clip(np.rint(xs).astype(np.intp), 0, ancho - 1)
+    ys = np.clip(np.rint(ys).astype(np.intp), 0, alto - 1)
+    return magnitud[ys, xs].mean(axis=1)
+
+def _asignar_lineas(u, v, angulo):
+    """Índice en LINEAS_PRINCIPALES de cada segmento (-1 si no encaja en ninguna)"""
+    en_palma = (u >= 0) & (u <= 1) & (v >= 0) & (v <= 1)
+    horizontal = angulo < ANGULO_HORIZONTAL
+    condiciones = [
+        ~en_palma,
+        (angulo >= ANGULO_VERTICAL) & (np.abs(u - 0.5) <= ANCHO_BANDA_DESTINO),
+        horizontal & (v < LIMITE_CORAZON_CABEZA),
+        horizontal,
+        np.ones_like(en_palma),
+    ]
+    indices = [-1] + [LINEAS_PRINCIPALES.index(linea)
+                      for linea in ("destino", "corazon", "cabeza", "vida")]
+    return np.select(condiciones, indices)
+
+def _medir_grupo(inicio, fin, longitud, intensidad, orientacion):
+    """Longitud cubierta, cortes, intensidad y curvatura de los segmentos de una línea"""
+    bajo, alto = np.minimum(inicio, fin), np.maximum(inicio, fin)
+    orden = np.argsort(bajo)
+    bajo, alto = bajo[orden], alto[orden]
+    # Un corte es un hueco entre un segmento y todo lo cubierto antes que él
+    cubierto = np.maximum.accumulate(alto)
+    cortes = int(np.count_nonzero(bajo[1:] - cubierto[:-1] > HUECO_MINIMO))
+
+    # Dispersión axial (ángulo doble): 89° y -89° son casi la misma dirección
+    doble = np.radians(2 * orientacion)
+    resultante = np.hypot(np.average(np.cos(doble), weights=longitud),
+                          np.average(np.sin(doble), weights=longitud))
+    dispersion = np.degrees(np.sqrt(-2 * np.log(np.clip(resultante, 1e-6, 1.0)))) / 2
+    return {
+        "segmentos": int(len(longitud)),
+        "longitud": round(float(cubierto[-1] - bajo[0]), 3),
+        "cortes": cortes,
+        "profundidad": round(float(np.average(intensidad, weights=longitud)), 3),
+        "curvatura": round(float(dispersion), 2),
+    }
+
+def medir_lineas(preparada):
+    """
+    Mide las líneas principales a partir de los segmentos de Hough.
+
+    Cada segmento se asigna a una línea según su orientación y su posición en
+    la palma. Por línea devuelve la longitud cubierta (fracción de la palma en
+    su eje), los cortes, la profundidad (intensidad del borde relativa a la
+    media de los segmentos de la palma) y la curvatura (dispersión de la
+    orientación en grados); None si no hay segmentos.
+    """
+    medidas = dict.fromkeys(LINEAS_PRINCIPALES)
+    region = _region_palma(preparada["mascara"] > 0)
+    segmentos = _segmentos_interiores(preparada)
+    if region is None or not len(segmentos):
+        return medidas
+
+    px0, py0, px1, py1 = region
+    ancho, alto = max(1, px1 - px0), max(1, py1 - py0)
+    # Coordenadas relativas a la palma: columnas (x0, x1) y filas (y0, y1)
+    xs = (segmentos[:, 0::2] - px0) / ancho
+    ys = (segmentos[:, 1::2] - py0) / alto
+    dx = segmentos[:, 2] - segmentos[:, 0]
+    dy = segmentos[:, 3] - segmentos[:, 1]
+    longitud = np.hypot(dx, dy)
+    # Orientación con signo en (-90, 90]; el ángulo sin signo decide la línea
+    orientacion = np.degrees(np.arctan2(dy, dx))
+    orientacion = np.where(orientacion > 90, orientacion - 180,
+                           np.where(orientacion <= -90, orientacion + 180, orientacion))
+    grupos = _asignar_lineas(xs.mean(axis=1), ys.mean(axis=1), np.abs(orientacion))
+
+    en_palma = grupos >= 0
+    if not en_palma.any():
+        return medidas
+    intensidad = _intensidad_bordes(preparada["gray"], segmentos)
+    intensidad = intensidad / max(float(intensidad[en_palma].mean()), 1e-6)
+
+    for indice, linea in enumerate(LINEAS_PRINCIPALES):
+        sel = grupos == indice
+        if not sel.any():
+            continue
+        # Corazón y cabeza se miden a lo ancho; vida y destino a lo alto
+        eje = xs if linea in ("cabeza", "corazon") else ys
+        medidas[linea] = _medir_grupo(eje[sel, 0], eje[sel, 1], longitud[sel],
+                                      intensidad[sel], orientacion[sel])
+    return medidas
+
+def etiquetar_lineas(medidas):
+    """Traduce las medidas al vocabulario de CONOCIMIENTOS_QUIROLOGIA["lineas"]"""
+    etiquetas = {}
+    for linea in LINEAS_PRINCIPALES:
+        m = medidas.get(linea)
+        if linea == "destino":
+            if m is None:
+                etiquetas[linea] = "ausente"
+            elif m["profundidad"] >= PROFUNDIDAD_MARCADA:
+                etiquetas[linea] = "fuerte"
+            elif m["cortes"] or m["longitud"] < LONGITUD_CORTA:
+                etiquetas[linea] = "debil"
+            else:
+                etiquetas[linea] = "presente"
+        elif m is None:
+            etiquetas[linea] = "indeterminada"
+        elif linea == "cabeza":
+            if m["longitud"] < LONGITUD_CORTA:
+                etiquetas[linea] = "corta"
+            elif m["curvatura"] >= CURVATURA_MINIMA:
+                etiquetas[linea] = "curva"
+            elif m["longitud"] >= LONGITUD_LARGA:
+                etiquetas[linea] = "larga"
+            else:
+                etiquetas[linea] = "recta"
+        elif m["cortes"] >= 2:
+            etiquetas[linea] = "fragmentada"
+        elif m["profundidad"] >= PROFUNDIDAD_MARCADA:
+            etiquetas[linea] = "profunda"
+        elif m["longitud"] >= LONGITUD_LARGA:
+            etiquetas[linea] = "larga"
+        else:
+            etiquetas[linea] = "corta"
+    return etiquetas
+
+def clasificar_lineas(preparada):
+    """Clasifica las líneas principales a partir de sus medidas"""
+    try:
+        return etiquetar_lineas(medir_lineas(preparada))
+    except Exception:
+        return {linea: "indeterminada" for linea in LINEAS_PRINCIPALES}
+
+# ============================================================================
+# API DE UNA SOLA IMAGEN
+# ============================================================================
+
+def analizar_forma_mano(imagen):
+    """Analiza la forma de la mano usando procesamiento de imágenes"""
+    try:
+        return clasificar_forma(preparar_imagen(imagen))
+    except Exception:
+        return "error"
+
+def detectar_lineas(imagen):
+    """Detecta líneas principales en la palma"""
+    try:
+        return clasificar_lineas(preparar_imagen(imagen))
+    except Exception:
+        return {linea: "indeterminada" for linea in LINEAS_PRINCIPALES}
+
+# ============================================================================
+# ANÁLISIS POR LOTES
+# ============================================================================
+
+def _normalizar_lote(imagenes):
+    """Devuelve pares (rol, imagen) a partir de un dict o una lista"""
+    if isinstance(imagenes, dict):
+        return [(rol, img) for rol, img in imagenes.items() if img is not None]
+    return [(ROLES_FOTOS[i] if i < len(ROLES_FOTOS) else f"foto_{i + 1}", img)
+            for i, img in enumerate(imagenes) if img is not None]
+
+def _votar(valores):
+    """Valor más frecuente entre los válidos; desempata por orden de llegada"""
+    validos = [v for v in valores if v not in RESULTADOS_INVALIDOS]
+    if not validos:
+        return valores[0] if valores else "indeterminada"
+
+    conteo = Counter(validos)
+    maximo = max(conteo.values())
+    return next(v for v in validos if conteo[v] == maximo)
+
+def analizar_imagen(imagen, con_lineas=True, resolucion=None):
+    """Analiza una imagen decodificando y convirtiendo a grises una sola vez"""
+    try:
+        preparada = preparar_imagen(imagen, resolucion)
+    except Exception:
+        return {
+            "forma": "error",
+            "lineas": {linea: "indeterminada" for linea in LINEAS_PRINCIPALES} if con_lineas else {}
+        }
+
+    resultado = {"forma": clasificar_forma(preparada), "lineas": {}}
+    if con_lineas:
+        try:
+            medidas = medir_lineas(preparada)
+            resultado["lineas"] = etiquetar_lineas(medidas)
+            resultado["medidas"] = medidas
+        except Exception:
+            resultado["lineas"] = {linea: "indeterminada" for linea in LINEAS_PRINCIPALES}
+    return resultado
+
+def agregar_resultados(por_imagen):
+    """Combina los resultados por imagen en un único resultado por votación"""
+    resultados = list(por_imagen.values())
+    con_lineas = [r for r in resultados if r["lineas"]]
+
+    return {
+        "forma": _votar([r["forma"] for r in resultados]),
+        "lineas": {
+            linea: _votar([r["lineas"].get(linea, "indeterminada") for r in con_lineas])
+            for linea in LINEAS_PRINCIPALES
+        } if con_lineas else {}
+    }
+
+def analizar_lote(imagenes, resolucion=None):
+    """
+    Analiza todas las fotos de una consulta en una sola pasada.
+
+    `imagenes` puede ser un dict {rol: imagen} o una lista en el orden del
+    formulario (palma derecha, palma izquierda, dorso, adicional). Cada
+    imagen puede ser una imagen PIL, un array, los bytes crudos del archivo
+    o un mmap del archivo.
+    Devuelve los resultados por imagen y el agregado. `resolucion` sustituye
+    a RESOLUCION_TRABAJO (0 analiza a resolución completa).
+    """
+    por_imagen = {}
+    for rol, imagen in _normalizar_lote(imagenes):
+        por_imagen[rol] = analizar_imagen(imagen, con_lineas=rol not in ROLES_SIN_LINEAS,
+                                          resolucion=resolucion)
+
+    return {
+        "por_imagen": por_imagen,
+        "agregado": agregar_resultados(por_imagen) if por_imagen else {
+            "forma": "indeterminada", "lineas": {}
+        }
+    }
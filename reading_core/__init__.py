@@ -0,0 +1,14 @@
+"""
+Motor de lecturas con Gemini compartido por app.py, app_async.py y las
+variantes de Streamlit: cliente del proceso, prompts, partes de imagen,
+caché de respuestas, backends síncrono y asíncrono (ambos con streaming) y
+el contrato HTTP de /generate-reading.
+"""
+
+from .api import RequestError, UploadError, build_reading_contents, format_event
+from .backends import AsyncBackend, SyncBackend, default_cache
+from .cache import ResponseCache, cache_key
+from .client import MODEL, MissingApiKey, get_client
+from .contents import build_contents, image_part, images_bytes
+from .images import log_request, prepare_image
+from .prompts import build_prompt, build_prompt_es, personal_year_meanings
@@ -0,0 +1,115 @@
+"""
+Contrato HTTP de /generate-reading compartido por app.py (Flask) y
+app_async.py (ASGI): límites de subida, validación de imágenes, contenidos
+de la petición y formato de los eventos de streaming. Sin dependencias del
+framework web.
+"""
+
+import base64
+import binascii
+import json
+import os
+
+from .contents import build_contents
+from .errors import RequestError, UploadError
+from .prompts import build_prompt_es
+
+# Límite de tamaño: cuerpo completo y cada imagen por separado (bytes). El
+# límite del cuerpo también aplica al JSON con imágenes en base64 (que ocupa
+# ~4/3 de los bytes de las imágenes): por encima se responde 413.
+MAX_UPLOAD_BYTES = int(os.getenv("MAX_UPLOAD_BYTES", str(25 * 1024 * 1024)))
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+ALLOWED_IMAGE_TYPES = {"image/jpeg", "image/png", "image/webp", "image/heic"}
+
+IMAGE_TOO_LARGE = f"Cada imagen debe pesar como máximo {MAX_IMAGE_BYTES / (1024 * 1024):g} MB"
+
+# Formatos de streaming: ?stream=sse|ndjson o la cabecera Accept equivalente
+STREAM_MIMETYPES = {
+    "sse": "text/event-stream",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def parse_personal_year(value):
+    """personalYear como entero 1-9; RequestError si falta o no es válido."""
+    if value is None or value == "":
+        raise RequestError("Falta el campo personalYear")
+    try:
+        personal_year = int(value)
+    except (TypeError, ValueError):
+        raise RequestError("personalYear debe ser un número entero") from None
+    if not 1 <= personal_year <= 9:
+        raise RequestError("personalYear debe estar entre 1 y 9")
+    return personal_year
+
+
+def form_data(form):
+    """Campos de un formulario multipart (cualquier objeto con .get) como el JSON original."""
+    return {
+        "question": form.get("question", ""),
+        "personalYear": parse_personal_year(form.get("personalYear")),
+        "language": form.get("language", "es"),
+    }
+
+
+def json_data(data):
+    """Cuerpo JSON original; RequestError si no es un objeto."""
+    if not isinstance(data, dict):
+        raise RequestError("Se esperaba un objeto JSON")
+    return data
+
+
+def decode_json_image(img):
+    """(bytes, mime_type) de una imagen base64 del JSON, con las mismas comprobaciones que multipart."""
+    try:
+        # Se toleran saltos de línea (base64 MIME), pero no otros caracteres
+        raw = base64.b64decode("".join(img["base64"].split()), validate=True)
+        mime_type = img["mimeType"]
+    except (KeyError, TypeError, AttributeError):
+        raise UploadError("Cada imagen necesita los campos base64 y mimeType") from None
+    except (binascii.Error, ValueError):
+        raise UploadError("Imagen con base64 no válido") from None
+    check_upload(raw, mime_type)
+    return raw, mime_type
+
+
+def check_upload(data, mime_type):
+    if mime_type not in ALLOWED_IMAGE_TYPES:
+        raise UploadError(f"Tipo de imagen no admitido: {mime_type}")
+    if len(data) > MAX_IMAGE_BYTES:
+        raise UploadError(IMAGE_TOO_LARGE)
+
+
+def build_reading_contents(data, uploads=()):
+    """Prompt + imágenes; `uploads` son pares (bytes, mime_type) de multipart."""
+    personal_year = parse_personal_year(data.get("personalYear"))
+    if not isinstance(data.get("question", ""), str):
+        raise RequestError("question debe ser texto")
+    data.setdefault("question", "")
+
+    # Clientes antiguos: imágenes en base64 dentro del JSON
+    images = [decode_json_image(img) for img in data.get("handImages") or []]
+
+    for raw, mime_type in uploads:
+        check_upload(raw, mime_type)
+        images.append((raw, mime_type))
+
+    prompt_text = build_prompt_es(data, personal_year)
+    return build_contents(prompt_text, images)
+
+
+def stream_mode(param, accept):
+    """Formato pedido con ?stream= o la cabecera Accept, o None para la respuesta clásica."""
+    if param in STREAM_MIMETYPES:
+        return param
+
+    for mode, mimetype in STREAM_MIMETYPES.items():
+        if mimetype in (accept or ""):
+            return mode
+    return None
+
+
+def format_event(mode, event, payload):
+    if mode == "sse":
+        return f"event: {event}\ndata: {json.dumps(payload, ensure_ascii=False)}\n\n"
+    return json.dumps({"type": event, **payload}, ensure_ascii=False) + "\n"
@@ -0,0 +1,123 @@
+"""
+Backends de llamada al modelo.
+
+SyncBackend sirve a Flask y Streamlit; AsyncBackend a la app ASGI, con un
+limitador de concurrencia opcional. Los dos ofrecen generate() (texto
+completo, con caché y single-flight) y stream() (fragmentos a medida que
+llegan; se responde de caché si la lectura ya está y se guarda al terminar).
+"""
+
+import functools
+from contextlib import nullcontext
+
+from .cache import CACHE_ENABLED, ResponseCache, cache_key
+from .client import MODEL, get_client
+from .contents import images_bytes
+from .images import log_request
+
+
+@functools.lru_cache(maxsize=None)
+def default_cache():
+    """Caché de respuestas del proceso, o None si GEMINI_CACHE=0."""
+    return ResponseCache() if CACHE_ENABLED else None
+
+
+class _Backend:
+    def __init__(self, model=None, client=None, cache=None, use_cache=True):
+        self.model = model or MODEL
+        self._client = client
+        self.cache = (cache or default_cache()) if use_cache else None
+
+    @property
+    def client(self):
+        # El cliente no se crea hasta la primera llamada
+        return self._client or get_client()
+
+    def _cache_key(self, contents):
+        return cache_key(self.model, contents) if self.cache is not None else None
+
+    def _cached(self, key):
+        return self.cache.get(key) if key else None
+
+
+class SyncBackend(_Backend):
+    """Llamadas bloqueantes a generate_content / generate_content_stream."""
+
+    def generate(self, contents):
+        def call():
+            with log_request(self.model, images_bytes(contents)):
+                return self.client.models.generate_content(
+                    model=self.model, contents=contents
+                ).text
+
+        key = self._cache_key(contents)
+        if key is None:
+            return call()
+        return self.cache.get_or_call(key, call)
+
+    def stream(self, contents):
+        key = self._cache_key(contents)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+
+        texts = []
+        with log_request(self.model, images_bytes(contents)):
+            for chunk in self.client.models.generate_content_stream(
+                model=self.model, contents=contents
+            ):
+                if chunk.text:
+                    texts.append(chunk.text)
+                    yield chunk.text
+        if key:
+            self.cache.put(key, "".join(texts))
+
+
+class AsyncBackend(_Backend):
+    """
+    Llamadas con client.aio. `limiter`, si se da, es un objeto con un
+    context manager asíncrono slot() que acota las llamadas en curso.
+    """
+
+    def __init__(self, model=None, client=None, cache=None, use_cache=True, limiter=None):
+        super().__init__(model, client, cache, use_cache)
+        self.limiter = limiter
+
+    def _slot(self):
+        return self.limiter.slot() if self.limiter is not None else nullcontext()
+
+    async def generate(self, contents):
+        async def call():
+            async with self._slot():
+                with log_request(self.model, images_bytes(contents)):
+                    response = await self.client.aio.models.generate_content(
+                        model=self.model, contents=contents
+                    )
+            return response.text
+
+        key = self._cache_key(contents)
+        if key is None:
+            return await call()
+        return await self.cache.get_or_call_async(key, call)
+
+    async def stream(self, contents):
+        key = self._cache_key(contents)
+        cached = self._cached(key)
+        if cached is not None:
+            yield cached
+            return
+
+        texts = []
+        async with self._slot():
+            with log_request(self.model, images_bytes(contents)):
+                stream = await self.client.aio.models.generate_content_stream(
+                    model=self.model, contents=contents
+                )
+                async for chunk in stream:
+                    if chunk.text:
+                        texts.append(chunk.text)
+                        yield chunk.text
+        if key:
+            self.cache.put(key, "".join(texts))
+
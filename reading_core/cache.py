@@ -0,0 +1,176 @@
+"""
+Caché de respuestas de Gemini.
+
+El prompt es una función determinista de la pregunta y el año personal, así
+que un reintento o un doble clic en "✨ Generar lectura" produce exactamente
+la misma petición. La clave es un SHA-256 del modelo, el texto del prompt y
+los bytes de cada imagen; las entradas caducan a los GEMINI_CACHE_TTL
+segundos y, por encima de GEMINI_CACHE_MAX_ENTRIES, se expulsan las menos
+usadas.
+
+Peticiones idénticas simultáneas comparten una sola llamada al modelo
+(single-flight): la primera la hace y las demás esperan su resultado.
+
+    GEMINI_CACHE=0                desactiva la caché
+    GEMINI_CACHE_TTL=3600
+    GEMINI_CACHE_MAX_ENTRIES=1024
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+CACHE_ENABLED = os.getenv("GEMINI_CACHE", "1") == "1"
+CACHE_TTL = float(os.getenv("GEMINI_CACHE_TTL", "3600"))
+CACHE_MAX_ENTRIES = int(os.getenv("GEMINI_CACHE_MAX_ENTRIES", "1024"))
+
+
+def _part_bytes(part):
+    """Texto o bytes de imagen de una parte de `contents`, en cualquiera de sus formas."""
+    if isinstance(part, str):
+        return b"text", part.encode("utf-8")
+    if isinstance(part, dict):
+        if "text" in part:
+            return b"text", part["text"].encode("utf-8")
+        data = part["inline_data"]["data"]
+        return b"image", data.encode("ascii") if isinstance(data, str) else bytes(data)
+    if part.text is not None:
+        return b"text", part.text.encode("utf-8")
+    return b"image", part.inline_data.data
+
+
+def cache_key(model, contents):
+    """SHA-256 del modelo, el texto del prompt y el digest de cada imagen."""
+    key = hashlib.sha256(model.encode("utf-8"))
+    for part in contents:
+        kind, data = _part_bytes(part)
+        key.update(b"\0" + kind + b"\0")
+        # Las imágenes entran por su propio digest: la clave no depende de su tamaño
+        key.update(hashlib.sha256(data).digest() if kind == b"image" else data)
+    return key.hexdigest()
+
+
+class ResponseCache:
+    """LRU con TTL de textos de respuesta, con single-flight para hilos y asyncio."""
+
+    def __init__(self, max_entries=None, ttl=None):
+        self.max_entries = max_entries or CACHE_MAX_ENTRIES
+        self.ttl = ttl or CACHE_TTL
+        self._entries = OrderedDict()
+        self._in_flight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        # Peticiones que esperaron la llamada en curso de otra idéntica
+        self.shared = 0
+
+    def get(self, key):
+        """Texto guardado para la clave, o None si no está o caducó."""
+        with self._lock:
+            return self._get(key)
+
+    def put(self, key, text):
+        with self._lock:
+            self._put(key, text)
+
+    def get_or_call(self, key, call):
+        """
+        Devuelve el texto de la caché o el de call(). Si otro hilo ya está
+        llamando al modelo con la misma clave, espera a ese resultado.
+        """
+        with self._lock:
+            text = self._get(key)
+            if text is not None:
+                return text
+            waiting = self._in_flight.get(key)
+            if waiting is not None:
+                self.shared += 1
+            else:
+                future = self._in_flight[key] = Future()
+
+        if waiting is not None:
+            return waiting.result()
+
+        try:
+            text = call()
+        except BaseException as e:
+            with self._lock:
+                del self._in_flight[key]
+            # Los errores no se guardan: los que esperaban lo reciben y el siguiente reintenta
+            future.set_exception(e)
+            raise
+
+        with self._lock:
+            self._put(key, text)
+            del self._in_flight[key]
+        future.set_result(text)
+        return text
+
+    async def get_or_call_async(self, key, call):
+        """
+        Igual que get_or_call para una corrutina call() en el bucle de eventos.
+        La llamada compartida corre en su propia tarea: si el cliente que la
+        inició se desconecta, los que esperan siguen recibiendo el resultado.
+        """
+        with self._lock:
+            text = self._get(key)
+            if text is not None:
+                return text
+            task = self._in_flight.get(key)
+            if task is not None:
+                self.shared += 1
+            else:
+                task = self._in_flight[key] = asyncio.create_task(self._call_shared(key, call))
+                # Recupera la excepción por si todos los que esperaban se fueron
+                task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+        # shield: cancelar a este cliente no cancela la tarea compartida
+        return await asyncio.shield(task)
+
+    async def _call_shared(self, key, call):
+        try:
+            text = await call()
+        except BaseException:
+            # Los errores no se guardan: los que esperaban lo reciben y el siguiente reintenta
+            with self._lock:
+                del self._in_flight[key]
+            raise
+
+        with self._lock:
+            self._put(key, text)
+            del self._in_flight[key]
+        return text
+
+    def stats(self):
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "shared": self.shared,
+                "entries": len(self._entries),
+                "in_flight": len(self._in_flight),
+            }
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+
+    def _put(self, key, text):
+        # Una respuesta vacía (p. ej. bloqueada o cortada) no se guarda: el siguiente reintenta
+        if not text:
+            return
+        self._entries[key] = (time.monotonic() + self.ttl, text)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
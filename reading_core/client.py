@@ -0,0 +1,36 @@
+"""
+Cliente de Gemini del proceso.
+
+Se crea la primera vez que se pide y se reutiliza: Streamlit reejecuta el
+script en cada interacción, pero los módulos importados (y este cliente, con
+su pool de conexiones HTTP) sobreviven entre ejecuciones.
+"""
+
+import os
+import threading
+
+from google import genai
+
+MODEL = os.getenv("GEMINI_MODEL", "gemini-2.5-flash")
+
+_clients = {}
+_lock = threading.Lock()
+
+
+class MissingApiKey(RuntimeError):
+    pass
+
+
+def get_client(api_key=None):
+    """genai.Client para la clave dada (o API_KEY / GOOGLE_API_KEY), uno por proceso."""
+    api_key = api_key or os.getenv("API_KEY") or os.getenv("GOOGLE_API_KEY")
+    if not api_key:
+        raise MissingApiKey("Falta configurar la variable de entorno API_KEY")
+
+    client = _clients.get(api_key)
+    if client is None:
+        with _lock:
+            client = _clients.get(api_key)
+            if client is None:
+                client = _clients[api_key] = genai.Client(api_key=api_key)
+    return client
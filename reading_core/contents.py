@@ -0,0 +1,30 @@
+"""Construcción de `contents` para generate_content: prompt + imágenes comprimidas."""
+
+from google.genai import types
+
+from .images import prepare_image
+
+
+def image_part(data, mime_type):
+    """Parte de imagen con los bytes ya comprimidos; sin base64 en la app."""
+    data, mime_type = prepare_image(data, mime_type)
+    return types.Part.from_bytes(data=data, mime_type=mime_type)
+
+
+def build_contents(prompt, images=()):
+    """`images` son pares (bytes, mime_type)."""
+    return [
+        {"text": prompt},
+        *(image_part(data, mime_type) for data, mime_type in images)
+    ]
+
+
+def images_bytes(contents):
+    """Bytes de imagen que viajan en una petición al modelo."""
+    total = 0
+    for part in contents:
+        if isinstance(part, types.Part) and part.inline_data:
+            total += len(part.inline_data.data)
+        elif isinstance(part, dict) and "inline_data" in part:
+            total += len(part["inline_data"]["data"])
+    return total
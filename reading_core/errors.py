@@ -0,0 +1,12 @@
+"""
+Errores de petición compartidos por el contrato HTTP (api.py) y la
+preparación de imágenes (images.py), que no pueden importarse entre sí.
+"""
+
+
+class RequestError(ValueError):
+    """Petición mal formada: se responde 400 con el mensaje."""
+
+
+class UploadError(RequestError):
+    pass
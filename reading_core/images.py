@@ -0,0 +1,90 @@
+"""
+Compresión de las fotos antes de enviarlas a Gemini.
+
+El modelo trocea cada imagen en teselas de 768 px, así que enviar la foto a
+resolución de cámara solo añade bytes de subida y tokens de entrada. Cada foto
+se reduce a IMAGE_MAX_SIDE, se recodifica a WebP/JPEG con IMAGE_QUALITY y se
+guarda sin EXIF ni ningún otro metadato.
+
+    GEMINI_IMAGE_PREP=0          desactiva la etapa (se envía el original)
+    GEMINI_IMAGE_MAX_SIDE=1536   lado mayor en píxeles
+    GEMINI_IMAGE_FORMAT=webp     webp | jpeg
+    GEMINI_IMAGE_QUALITY=80
+"""
+
+import io
+import logging
+import os
+import time
+from contextlib import contextmanager
+
+from PIL import Image, ImageOps
+
+from .errors import UploadError
+
+logger = logging.getLogger(__name__)
+
+IMAGE_PREP_ENABLED = os.getenv("GEMINI_IMAGE_PREP", "1") == "1"
+IMAGE_MAX_SIDE = int(os.getenv("GEMINI_IMAGE_MAX_SIDE", "1536"))
+IMAGE_FORMAT = os.getenv("GEMINI_IMAGE_FORMAT", "webp").lower()
+IMAGE_QUALITY = int(os.getenv("GEMINI_IMAGE_QUALITY", "80"))
+
+FORMAT_MIMETYPES = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+}
+
+
+def prepare_image(data, mime_type, max_side=None, fmt=None, quality=None):
+    """
+    Devuelve (bytes, mime_type) listos para enviar. Si la etapa está
+    desactivada o PIL no sabe abrir el formato (p. ej. HEIC sin plugin), se
+    devuelve el original sin tocar. Una imagen con más píxeles de los que PIL
+    admite (bomba de descompresión) se rechaza con UploadError.
+    """
+    if not IMAGE_PREP_ENABLED:
+        return data, mime_type
+
+    max_side = max_side or IMAGE_MAX_SIDE
+    fmt = fmt or IMAGE_FORMAT
+    quality = quality or IMAGE_QUALITY
+
+    start = time.perf_counter()
+    try:
+        with Image.open(io.BytesIO(data)) as img:
+            # JPEG: el decodificador ya reduce por 2/4/8 sin leer la foto completa
+            img.draft("RGB", (max_side, max_side))
+            img = ImageOps.exif_transpose(img)
+            img = img.convert("RGB")
+            img.thumbnail((max_side, max_side), Image.LANCZOS)
+
+            out = io.BytesIO()
+            # Sin exif=/icc_profile=: la foto sale sin metadatos
+            img.save(out, format=fmt.upper(), quality=quality)
+            width, height = img.size
+    except Image.DecompressionBombError:
+        raise UploadError("La imagen tiene demasiados píxeles") from None
+    except (OSError, ValueError) as e:
+        logger.warning("No se pudo comprimir una imagen %s (%s); se envía el original", mime_type, e)
+        return data, mime_type
+
+    compressed = out.getvalue()
+    logger.info(
+        "Imagen %s %d B -> %s %dx%d %d B (%.1f%%) en %.1f ms",
+        mime_type, len(data), fmt, width, height, len(compressed),
+        100 * len(compressed) / len(data), (time.perf_counter() - start) * 1000
+    )
+    return compressed, FORMAT_MIMETYPES[fmt]
+
+
+@contextmanager
+def log_request(model, images_bytes):
+    """Registra la latencia de una llamada al modelo y los bytes de imagen enviados."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        logger.info(
+            "%s: %d B de imágenes enviados, respuesta en %.0f ms",
+            model, images_bytes, (time.perf_counter() - start) * 1000
+        )
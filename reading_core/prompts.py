@@ -0,0 +1,48 @@
+"""Prompts de Elara: el del servicio HTTP (app.py) y el de las variantes de Streamlit."""
+
+personal_year_meanings = {
+    "es": {
+        1: "Nuevos comienzos, independencia y siembra de semillas para el futuro.",
+        2: "Paciencia, cooperación, relaciones y diplomacia.",
+        3: "Creatividad, autoexpresión, comunicación y actividades sociales.",
+        4: "Trabajo duro, disciplina, construcción de cimientos y organización.",
+        5: "Cambio, libertad, aventura y oportunidades inesperadas.",
+        6: "Responsabilidad, hogar, familia y asuntos del corazón.",
+        7: "Introspección, crecimiento espiritual, análisis y búsqueda de conocimiento.",
+        8: "Abundancia, poder, carrera y asuntos financieros.",
+        9: "Finalización, finales, dejar ir y humanitarismo.",
+    }
+}
+
+
+def build_prompt_es(data, personal_year):
+    meanings = personal_year_meanings["es"][personal_year]
+    question = data["question"]
+
+    return f"""
+Eres una consultora esotérica experta llamada 'Elara, la Observadora de Estrellas'...
+
+Pregunta del usuario: "{question}"
+Año personal: {personal_year} ({meanings})
+"""
+
+
+def build_prompt(question, personal_year):
+    """Prompt de las variantes de Streamlit (incluye la guía de lectura de manos)."""
+    return f"""
+Eres una consultora esotérica experta llamada 'Elara, la Observadora de Estrellas'.
+Usa numerología y lectura de manos para ofrecer una guía sabia, empática y empoderadora.
+
+Pregunta del usuario: "{question}"
+Año personal: {personal_year}
+
+Analiza también las imágenes de las manos del usuario siguiendo estos principios:
+- Forma de la mano y dedos
+- Líneas principales (vida, cabeza, corazón, destino)
+- Líneas débiles, fuertes, rotas
+- Símbolos presentes
+- Montes de la palma
+
+Entrega la lectura en formato **Markdown** y usa tablas cuando hables de ciclos o periodos.
+No hagas predicciones absolutas, solo guía.
+"""
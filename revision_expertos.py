@@ -0,0 +1,109 @@
+"""
+Mapa de Tu Destino - Revisión por lotes de los expertos
+Un experto reclama N consultas pendientes con un lease atómico (dos expertos
+nunca reciben la misma), redacta sin tocar la base de datos y envía todas
+las interpretaciones en una sola transacción.
+"""
+
+import json
+import os
+
+from base_datos import transaccion
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Minutos que un experto retiene un lote; al vencer, otro puede reclamarlo
+DURACION_REVISION = int(os.getenv("REVISION_LEASE_MINUTOS", "60"))
+
+# Columnas de una consulta reclamada, en el orden de _a_dict
+_COLUMNAS = """id, consulta_text, fecha_nacimiento, ano_personal, created_at,
+               (SELECT email FROM users WHERE users.id = consultas.user_id), anonimo"""
+
+def _a_dict(fila):
+    """Fila de _COLUMNAS como dict, con el email oculto si la consulta es anónima"""
+    return {
+        "id": fila[0],
+        "consulta": fila[1],
+        "fecha_nac": fila[2],
+        "ano_personal": fila[3],
+        "fecha_creacion": fila[4],
+        "email": "Anónimo" if fila[6] or not fila[5] else fila[5],
+    }
+
+# ============================================================================
+# LEASES
+# ============================================================================
+
+def reclamar_consultas(conn, revisor, limite):
+    """
+    Reclama hasta `limite` consultas pendientes sin lease vigente, las más
+    antiguas primero, con un solo UPDATE ... RETURNING. Devuelve las
+    consultas reclamadas en esta llamada.
+    """
+    with transaccion(conn):
+        filas = conn.execute(f"""
+            UPDATE consultas
+            SET revisor = ?, revision_hasta = datetime('now', ?)
+            WHERE id IN (SELECT id FROM consultas
+                         WHERE status = 'pendiente'
+                           AND (revision_hasta IS NULL OR revision_hasta < datetime('now'))
+                         ORDER BY created_at, id
+                         LIMIT ?)
+            RETURNING {_COLUMNAS}""",
+            (revisor, f"+{DURACION_REVISION} minutes", limite)).fetchall()
+
+    return sorted((_a_dict(f) for f in filas), key=lambda c: (c["fecha_creacion"], c["id"]))
+
+def consultas_reclamadas(conn, revisor):
+    """Lote vigente del experto (solo lectura: no abre transacción de escritura)"""
+    filas = conn.execute(f"""
+        SELECT {_COLUMNAS}
+        FROM consultas
+        WHERE revisor = ? AND status = 'pendiente' AND revision_hasta >= datetime('now')
+        ORDER BY created_at, id""", (revisor,)).fetchall()
+    return [_a_dict(f) for f in filas]
+
+def liberar_consultas(conn, revisor, ids=None):
+    """Devuelve a la cola las consultas del experto (todas o solo `ids`)"""
+    filtro_ids = ""
+    parametros = [revisor]
+    if ids is not None:
+        filtro_ids = "AND id IN (SELECT value FROM json_each(?))"
+        parametros.append(json.dumps(list(ids)))
+
+    with transaccion(conn):
+        conn.execute(f"""UPDATE consultas SET revisor = NULL, revision_hasta = NULL
+                         WHERE revisor = ? AND status = 'pendiente' {filtro_ids}""",
+                     parametros)
+
+# ============================================================================
+# ENVÍO DEL LOTE
+# ============================================================================
+
+def enviar_lote(conn, revisor, interpretaciones):
+    """
+    Guarda {consulta_id: interpretación} en una sola transacción.
+
+    Solo se aceptan consultas que siguen pendientes y reclamadas por este
+    experto (aunque el lease haya vencido, si nadie más las tomó). Devuelve
+    [(consulta_id, email o None)] de las guardadas, para notificarlas.
+    """
+    interpretaciones = {int(i): texto for i, texto in interpretaciones.items() if texto}
+    if not interpretaciones:
+        return []
+
+    with transaccion(conn):
+        filas = conn.execute("""
+            UPDATE consultas
+            SET interpretacion_personal = borrador.value, status = 'completada',
+                revisor = NULL, revision_hasta = NULL
+            FROM json_each(?) AS borrador
+            WHERE consultas.id = CAST(borrador.key AS INTEGER)
+              AND consultas.revisor = ? AND consultas.status = 'pendiente'
+            RETURNING consultas.id,
+                      (SELECT email FROM users WHERE users.id = consultas.user_id)""",
+            (json.dumps(interpretaciones), revisor)).fetchall()
+
+    return sorted(filas)
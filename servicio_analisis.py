@@ -0,0 +1,158 @@
+"""
+Mapa de Tu Destino - Servicio de análisis en procesos
+Ejecuta el motor quirológico en un ProcessPoolExecutor fuera del hilo de Streamlit
+"""
+
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import ExitStack
+
+import almacen_fotos
+import quirologia
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURACIÓN DEL SERVICIO
+# ============================================================================
+
+# Procesos de análisis (por defecto, uno por núcleo)
+ANALISIS_WORKERS = int(os.getenv("ANALISIS_WORKERS", "0")) or os.cpu_count() or 1
+
+# Trabajos admitidos a la vez (en ejecución + en cola) antes de rechazar
+ANALISIS_MAX_PENDIENTES = int(os.getenv("ANALISIS_MAX_PENDIENTES", "0")) or ANALISIS_WORKERS * 4
+
+# Segundos que se espera el resultado de un trabajo
+ANALISIS_TIMEOUT = float(os.getenv("ANALISIS_TIMEOUT", "30"))
+
+class ColaAnalisisLlena(Exception):
+    """La cola de análisis alcanzó ANALISIS_MAX_PENDIENTES"""
+
+class AnalisisExcedioTiempo(Exception):
+    """Un trabajo de análisis no terminó dentro de su timeout"""
+
+# ============================================================================
+# TAREAS (se ejecutan dentro de los procesos del pool)
+# ============================================================================
+
+def analizar_fotos_almacenadas(fotos, resolucion=None):
+    """Analiza {rol: sha256} leyendo cada foto del almacén vía mmap"""
+    with ExitStack() as pila:
+        mapas = {rol: pila.enter_context(almacen_fotos.abrir_foto(sha256))
+                 for rol, sha256 in fotos.items()}
+        return quirologia.analizar_lote(mapas, resolucion)
+
+# ============================================================================
+# SERVICIO
+# ============================================================================
+
+class ServicioAnalisis:
+    """
+    Pool de procesos para analizar las fotos de una consulta.
+
+    Las fotos viajan como bytes crudos ({rol: bytes}), que se serializan sin
+    coste frente a objetos PIL, o como hashes del almacén de fotos, y cada
+    proceso las decodifica por su cuenta.
+    La cola está acotada: si hay ANALISIS_MAX_PENDIENTES trabajos sin terminar
+    se rechaza el nuevo en lugar de acumular memoria.
+    """
+
+    def __init__(self, workers=None, max_pendientes=None, timeout=None):
+        self.workers = workers or ANALISIS_WORKERS
+        self.max_pendientes = max_pendientes or ANALISIS_MAX_PENDIENTES
+        self.timeout = timeout or ANALISIS_TIMEOUT
+        self._lock = threading.Lock()
+        self._crear_pool()
+
+    def _crear_pool(self):
+        """Pool nuevo con su propio semáforo de cupos (llamar con el lock tomado o en __init__)"""
+        self._cupos = threading.BoundedSemaphore(self.max_pendientes)
+        # spawn: no se hereda el estado de hilos del servidor de Streamlit
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn")
+        )
+        self._roto = False
+
+    def _pool_vigente(self):
+        """(executor, cupos) en uso; si el pool se rompió, lo sustituye antes"""
+        with self._lock:
+            if self._roto:
+                self._reemplazar_pool()
+            return self._executor, self._cupos
+
+    def _reemplazar_pool(self):
+        """
+        Sustituye un pool roto (un proceso murió, p. ej. por OOM) por uno nuevo.
+        Sus trabajos ya fallaron con BrokenProcessPool; el semáforo se rehace
+        para que los cupos del pool viejo no cuenten contra el nuevo.
+        """
+        logger.warning("El pool de análisis se rompió; se crea uno nuevo")
+        self._executor.shutdown(wait=False, cancel_futures=True)
+        self._crear_pool()
+
+    def _marcar_roto(self, executor):
+        """Anota que `executor` se rompió, si sigue siendo el vigente"""
+        with self._lock:
+            if self._executor is executor:
+                self._roto = True
+
+    def _enviar(self, tarea, *args):
+        """Encola una tarea respetando el límite de trabajos pendientes"""
+        for intento in range(2):
+            executor, cupos = self._pool_vigente()
+            if not cupos.acquire(blocking=False):
+                raise ColaAnalisisLlena(
+                    "El servicio de análisis está saturado, inténtalo en unos minutos"
+                )
+
+            try:
+                futuro = executor.submit(tarea, *args)
+                break
+            except BrokenProcessPool:
+                # Se rompió antes de que lo notara un trabajo: se rehace y se reintenta una vez
+                cupos.release()
+                self._marcar_roto(executor)
+                if intento:
+                    raise
+            except Exception:
+                cupos.release()
+                raise
+
+        def terminado(futuro):
+            # El cupo se libera cuando el proceso termina, no cuando vence el timeout
+            cupos.release()
+            if not futuro.cancelled() and isinstance(futuro.exception(), BrokenProcessPool):
+                self._marcar_roto(executor)
+
+        futuro.add_done_callback(terminado)
+        return futuro
+
+    def enviar(self, fotos, resolucion=None):
+        """Encola el análisis de {rol: bytes} y devuelve un Future"""
+        return self._enviar(quirologia.analizar_lote, fotos, resolucion)
+
+    def enviar_almacenadas(self, fotos, resolucion=None):
+        """Encola el análisis de {rol: sha256}; solo los hashes cruzan al proceso"""
+        return self._enviar(analizar_fotos_almacenadas, fotos, resolucion)
+
+    def analizar(self, fotos, resolucion=None, timeout=None):
+        """Encola el análisis y espera el resultado hasta el timeout del trabajo"""
+        futuro = self.enviar(fotos, resolucion)
+        try:
+            return futuro.result(timeout=timeout or self.timeout)
+        except TimeoutError:
+            futuro.cancel()
+            raise AnalisisExcedioTiempo(
+                "El análisis de las fotos tardó demasiado, inténtalo de nuevo"
+            )
+
+    def cerrar(self):
+        """Detiene el pool: cancela lo encolado y espera a lo que está en ejecución"""
+        with self._lock:
+            executor = self._executor
+        executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,387 @@
+"""
+Mapa de Tu Destino - Cola durable de análisis
+Las consultas se guardan al instante con status 'analizando' y un trabajo en
+SQLite; este trabajador rellena analisis_auto en segundo plano.
+
+Uso como proceso independiente (escala aparte de las sesiones web):
+    python trabajador_analisis.py [--intervalo SEGUNDOS]
+"""
+
+import argparse
+import json
+import logging
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import almacen_fotos
+from base_datos import conectar, crear_esquema, transaccion
+from cache_analisis import CacheAnalisis, clave_cache
+from conocimientos import interpretar_analisis, componer_analisis_completo
+from quirologia import agregar_resultados
+from servicio_analisis import ServicioAnalisis, ColaAnalisisLlena
+
+logger = logging.getLogger(__name__)
+
+# ============================================================================
+# CONFIGURACIÓN
+# ============================================================================
+
+# Intentos antes de dar un trabajo por fallido
+MAX_INTENTOS = 3
+
+# Segundos que un trabajador retiene un trabajo; al vencer, otro puede tomarlo.
+# Se renueva mientras el análisis sigue en ejecución.
+DURACION_LEASE = 120
+
+# Reintentos: espera de ESPERA_BASE * 2^(intento - 1) segundos, hasta ESPERA_MAXIMA.
+# Los fallos de infraestructura (pool roto o saturado) esperan ESPERA_BASE sin gastar intento.
+ESPERA_BASE = 10
+ESPERA_MAXIMA = 300
+
+MENSAJE_ERROR_ANALISIS = """
+No pudimos analizar automáticamente tus fotos. Un experto revisará tu
+consulta igualmente; si lo prefieres, puedes enviar fotos nuevas con mejor
+iluminación y fondo claro.
+"""
+
+# ============================================================================
+# ENCOLADO (LADO WEB)
+# ============================================================================
+
+def guardar_fotos(fotos):
+    """Guarda {rol: bytes} en el almacén y devuelve el fotos_data de la consulta"""
+    # Se validan todas antes de escribir ninguna: un archivo que no es imagen
+    # falla en describir_foto sin dejar huérfanos en el almacén
+    descripciones = {rol: almacen_fotos.describir_foto(datos) for rol, datos in fotos.items()}
+    for datos in fotos.values():
+        almacen_fotos.guardar_foto(datos)
+
+    return {"cantidad": len(fotos), "fotos": descripciones}
+
+def encolar_consulta(conn, user_id, consulta_text, fecha_nacimiento, ano_personal,
+                     fotos, anonimo=False):
+    """Guarda la consulta en estado 'analizando' y su trabajo en una sola transacción"""
+    # Las fotos van al almacén en disco; en SQLite solo quedan hashes y dimensiones
+    fotos_json = json.dumps(guardar_fotos(fotos))
+
+    with transaccion(conn):
+        c = conn.cursor()
+        c.execute("""INSERT INTO consultas
+                     (user_id, consulta_text, fecha_nacimiento, ano_personal,
+                      fotos_data, status, anonimo)
+                     VALUES (?, ?, ?, ?, ?, 'analizando', ?)""",
+                  (user_id, consulta_text, fecha_nacimiento, ano_personal,
+                   fotos_json, 1 if anonimo else 0))
+        consulta_id = c.lastrowid
+
+        c.execute("INSERT INTO trabajos_analisis (consulta_id) VALUES (?)", (consulta_id,))
+
+    return consulta_id
+
+# ============================================================================
+# CICLO DE VIDA DE LOS TRABAJOS
+# ============================================================================
+
+def reclamar_trabajos(conn, limite):
+    """Toma hasta `limite` trabajos pendientes (o con lease vencido) de forma atómica"""
+    with transaccion(conn):
+        c = conn.cursor()
+        c.execute("""UPDATE trabajos_analisis
+                     SET estado = 'procesando', intentos = intentos + 1,
+                         lease_hasta = datetime('now', ?),
+                         updated_at = CURRENT_TIMESTAMP
+                     WHERE id IN (SELECT id FROM trabajos_analisis
+                                  WHERE intentos < ?
+                                    AND ((estado = 'pendiente'
+                                          AND (proximo_intento IS NULL
+                                               OR proximo_intento <= datetime('now')))
+                                         OR (estado = 'procesando'
+                                             AND lease_hasta < datetime('now')))
+                                  ORDER BY id
+                                  LIMIT ?)
+                     RETURNING id, consulta_id, intentos""",
+                  (f"+{DURACION_LEASE} seconds", MAX_INTENTOS, limite))
+        trabajos = c.fetchall()
+
+    return [{"id": t[0], "consulta_id": t[1], "intentos": t[2]}
+            for t in sorted(trabajos)]
+
+def cargar_fotos(conn, trabajo):
+    """Devuelve las fotos de un trabajo como {rol: sha256} del almacén"""
+    c = conn.cursor()
+    c.execute("SELECT fotos_data FROM consultas WHERE id = ?", (trabajo["consulta_id"],))
+    fila = c.fetchone()
+    fotos_data = json.loads(fila[0]) if fila and fila[0] else {}
+    return {rol: foto["sha256"] for rol, foto in fotos_data.get("fotos", {}).items()}
+
+def completar_trabajo(conn, trabajo, lote):
+    """Guarda el análisis en la consulta y cierra el trabajo"""
+    c = conn.cursor()
+    c.execute("SELECT ano_personal FROM consultas WHERE id = ?", (trabajo["consulta_id"],))
+    fila = c.fetchone()
+    ano_personal = fila[0] if fila else None
+
+    analisis = interpretar_analisis(lote)
+    analisis_completo = componer_analisis_completo(analisis["interpretacion"], ano_personal)
+
+    with transaccion(conn):
+        c.execute("""UPDATE consultas SET analisis_auto = ?, status = 'pendiente'
+                     WHERE id = ? AND status = 'analizando'""",
+                  (analisis_completo, trabajo["consulta_id"]))
+        c.execute("""UPDATE trabajos_analisis
+                     SET estado = 'completado', error = NULL, lease_hasta = NULL,
+                         updated_at = CURRENT_TIMESTAMP
+                     WHERE id = ?""", (trabajo["id"],))
+
+def espera_reintento(intentos):
+    """Segundos hasta el siguiente intento tras `intentos` fallidos"""
+    return min(ESPERA_MAXIMA, ESPERA_BASE * 2 ** (intentos - 1))
+
+def fallar_trabajo(conn, trabajo, error):
+    """Devuelve el trabajo a la cola tras una espera o lo marca como fallido si agotó sus intentos"""
+    with transaccion(conn):
+        c = conn.cursor()
+        if trabajo["intentos"] < MAX_INTENTOS:
+            c.execute("""UPDATE trabajos_analisis
+                         SET estado = 'pendiente', error = ?, lease_hasta = NULL,
+                             proximo_intento = datetime('now', ?),
+                             updated_at = CURRENT_TIMESTAMP
+                         WHERE id = ?""",
+                      (str(error), f"+{espera_reintento(trabajo['intentos'])} seconds",
+                       trabajo["id"]))
+            return
+
+        c.execute("""UPDATE trabajos_analisis
+                     SET estado = 'error', error = ?, lease_hasta = NULL,
+                         updated_at = CURRENT_TIMESTAMP
+                     WHERE id = ?""", (str(error), trabajo["id"]))
+        c.execute("""UPDATE consultas SET analisis_auto = ?, status = 'error_analisis'
+                     WHERE id = ? AND status = 'analizando'""",
+                  (MENSAJE_ERROR_ANALISIS, trabajo["consulta_id"]))
+
+def cerrar_abandonados(conn):
+    """Marca como fallidos los trabajos cuyo último intento venció sin terminar"""
+    with transaccion(conn):
+        c = conn.cursor()
+        c.execute("""UPDATE trabajos_analisis
+                     SET estado = 'error', error = 'lease vencido', lease_hasta = NULL,
+                         updated_at = CURRENT_TIMESTAMP
+                     WHERE estado = 'procesando' AND intentos >= ?
+                       AND lease_hasta < datetime('now')
+                     RETURNING consulta_id""", (MAX_INTENTOS,))
+        consultas = [(MENSAJE_ERROR_ANALISIS, fila[0]) for fila in c.fetchall()]
+        c.executemany("""UPDATE consultas SET analisis_auto = ?, status = 'error_analisis'
+                         WHERE id = ? AND status = 'analizando'""", consultas)
+
+def liberar_trabajo(conn, trabajo, error=None):
+    """
+    Devuelve a la cola, sin gastar su intento, un trabajo que no llegó a
+    ejecutarse o que falló por el pool (roto o saturado), tras ESPERA_BASE
+    """
+    with transaccion(conn):
+        conn.execute("""UPDATE trabajos_analisis
+                        SET estado = 'pendiente', intentos = intentos - 1,
+                            lease_hasta = NULL, error = COALESCE(?, error),
+                            proximo_intento = datetime('now', ?),
+                            updated_at = CURRENT_TIMESTAMP
+                        WHERE id = ?""",
+                     (error, f"+{ESPERA_BASE} seconds", trabajo["id"]))
+
+def renovar_leases(conn, ids):
+    """Prolonga el lease de los trabajos cuyo análisis sigue en ejecución"""
+    if not ids:
+        return
+    with transaccion(conn):
+        conn.executemany("""UPDATE trabajos_analisis
+                            SET lease_hasta = datetime('now', ?), updated_at = CURRENT_TIMESTAMP
+                            WHERE id = ? AND estado = 'procesando'""",
+                         [(f"+{DURACION_LEASE} seconds", i) for i in ids])
+
+# ============================================================================
+# BUCLE DEL TRABAJADOR
+# ============================================================================
+
+def _analizar_con_cache(fotos, servicio, cache):
+    """
+    Consulta la caché por cada foto y encola solo las que faltan.
+    Devuelve (resultados_en_cache, claves, futuro o None).
+    """
+    claves = {rol: clave_cache(sha256, rol) for rol, sha256 in fotos.items()}
+    en_cache = cache.obtener(claves.values()) if cache else {}
+    faltan = {rol: sha256 for rol, sha256 in fotos.items() if claves[rol] not in en_cache}
+
+    futuro = servicio.enviar_almacenadas(faltan) if faltan else None
+    return en_cache, claves, futuro
+
+def _combinar_lote(fotos, claves, en_cache, nuevos):
+    """Une resultados de caché y nuevos en el orden original y recalcula el agregado"""
+    por_imagen = {rol: en_cache.get(claves[rol]) or nuevos[rol] for rol in fotos}
+    return {"por_imagen": por_imagen, "agregado": agregar_resultados(por_imagen)}
+
+def _terminar(conn, trabajo, fotos, claves, en_cache, nuevos, cache):
+    """Guarda en caché los resultados nuevos y completa el trabajo"""
+    if cache:
+        # Un "error" puede ser transitorio (p. ej. foto ilegible); no se guarda
+        cache.guardar({claves[rol]: resultado for rol, resultado in nuevos.items()
+                       if resultado["forma"] != "error"})
+    completar_trabajo(conn, trabajo, _combinar_lote(fotos, claves, en_cache, nuevos))
+
+def _recoger(conn, servicio, en_vuelo, cache, espera):
+    """
+    Espera hasta `espera` segundos a que termine algún trabajo de `en_vuelo`
+    ({trabajo_id: dict}) y cierra los terminados; devuelve cuántos cerró.
+    Un trabajo que no empezó a ejecutarse dentro de servicio.timeout se
+    cancela y vuelve a la cola sin gastar intento (pool saturado). Uno que ya
+    se ejecuta no se puede cancelar: sigue en `en_vuelo`, con su lease
+    renovado, y no se reenvía mientras su proceso trabaja.
+    """
+    por_futuro = {vuelo["futuro"]: trabajo_id for trabajo_id, vuelo in en_vuelo.items()}
+    hechos, _ = wait(por_futuro, timeout=espera, return_when=FIRST_COMPLETED)
+
+    cerrados = 0
+    for futuro, trabajo_id in por_futuro.items():
+        vuelo = en_vuelo[trabajo_id]
+        trabajo = vuelo["trabajo"]
+
+        if futuro not in hechos:
+            vencido = time.monotonic() - vuelo["enviado"] > servicio.timeout
+            if vencido and futuro.cancel():
+                del en_vuelo[trabajo_id]
+                liberar_trabajo(conn, trabajo, "el pool de análisis no lo atendió a tiempo")
+                cerrados += 1
+            continue
+
+        del en_vuelo[trabajo_id]
+        cerrados += 1
+        try:
+            nuevos = futuro.result()["por_imagen"]
+            _terminar(conn, trabajo, vuelo["fotos"], vuelo["claves"], vuelo["en_cache"],
+                      nuevos, cache)
+        except BrokenProcessPool as e:
+            logger.warning("Trabajo %s: el pool de análisis se rompió", trabajo["id"])
+            liberar_trabajo(conn, trabajo, str(e) or type(e).__name__)
+        except Exception as e:
+            logger.exception("Trabajo %s: falló el análisis", trabajo["id"])
+            fallar_trabajo(conn, trabajo, str(e) or type(e).__name__)
+
+    renovar_leases(conn, list(en_vuelo))
+    return cerrados
+
+def procesar_pendientes(conn, servicio, limite=None, cache=None, en_vuelo=None, espera=None):
+    """
+    Reclama trabajos, los envía al pool y cierra los que terminen.
+
+    `en_vuelo` conserva entre llamadas los trabajos cuyo análisis sigue en
+    ejecución (ejecutar_trabajador lo mantiene); solo se reclaman tantos
+    trabajos como huecos queden. Sin él, espera a que terminen todos los
+    reclamados. Devuelve cuántos trabajos se reclamaron o cerraron.
+    """
+    propio = en_vuelo is None
+    en_vuelo = {} if propio else en_vuelo
+
+    cerrar_abandonados(conn)
+    huecos = max(0, (limite or servicio.workers) - len(en_vuelo))
+    trabajos = reclamar_trabajos(conn, huecos) if huecos else []
+
+    # Un trabajo que falla (fotos_data corrupto, foto ausente del almacén...)
+    # se devuelve a la cola sin afectar al resto del lote
+    cerrados = 0
+    for trabajo in trabajos:
+        try:
+            fotos = cargar_fotos(conn, trabajo)
+            en_cache, claves, futuro = _analizar_con_cache(fotos, servicio, cache)
+            if futuro is None:
+                # Todas las fotos estaban en caché
+                _terminar(conn, trabajo, fotos, claves, en_cache, {}, cache)
+                cerrados += 1
+                continue
+        except (ColaAnalisisLlena, BrokenProcessPool) as e:
+            liberar_trabajo(conn, trabajo, str(e) or type(e).__name__)
+            continue
+        except Exception as e:
+            logger.exception("Trabajo %s: no se pudo enviar al análisis", trabajo["id"])
+            fallar_trabajo(conn, trabajo, str(e) or type(e).__name__)
+            continue
+        en_vuelo[trabajo["id"]] = {"trabajo": trabajo, "fotos": fotos, "claves": claves,
+                                   "en_cache": en_cache, "futuro": futuro,
+                                   "enviado": time.monotonic()}
+
+    # Todo el lote se espera a la vez: la espera total es un timeout, no uno por trabajo
+    espera = servicio.timeout if espera is None else espera
+    while en_vuelo:
+        cerrados += _recoger(conn, servicio, en_vuelo, cache, espera)
+        if not propio:
+            break
+
+    return len(trabajos) + cerrados
+
+def _preparar_trabajador(ruta_db, intervalo, detener):
+    """
+    Abre la base de datos y la caché; si fallan (disco lleno, base bloqueada
+    por una migración...), lo registra y reintenta con espera creciente en
+    lugar de dejar morir el hilo. Devuelve (conn, cache) o None si se detuvo.
+    """
+    espera = intervalo
+    while not detener.is_set():
+        conn = None
+        try:
+            conn = conectar(ruta_db)
+            crear_esquema(conn)
+            return conn, CacheAnalisis()
+        except Exception as e:
+            logger.exception("No se pudo arrancar el trabajador de análisis: %s", e)
+            if conn is not None:
+                conn.close()
+        detener.wait(espera)
+        espera = min(ESPERA_MAXIMA, espera * 2)
+    return None
+
+def ejecutar_trabajador(servicio, ruta_db=None, intervalo=1.0, detener=None):
+    """Consume la cola hasta que se active `detener` (threading.Event)"""
+    detener = detener or threading.Event()
+    preparado = _preparar_trabajador(ruta_db, intervalo, detener)
+    if preparado is None:
+        return
+    conn, cache = preparado
+    en_vuelo = {}
+
+    while not detener.is_set():
+        try:
+            procesados = procesar_pendientes(conn, servicio, cache=cache, en_vuelo=en_vuelo,
+                                             espera=intervalo)
+        except Exception as e:
+            logger.exception("Error en el trabajador de análisis: %s", e)
+            procesados = 0
+
+        if not procesados and not en_vuelo:
+            detener.wait(intervalo)
+
+    cache.cerrar()
+    conn.close()
+
+def iniciar_trabajador_en_hilo(servicio, ruta_db=None, intervalo=1.0):
+    """Arranca el trabajador en un hilo daemon dentro del proceso actual"""
+    hilo = threading.Thread(
+        target=ejecutar_trabajador,
+        args=(servicio, ruta_db, intervalo),
+        name="trabajador-analisis",
+        daemon=True
+    )
+    hilo.start()
+    return hilo
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Trabajador de la cola de análisis")
+    parser.add_argument("--intervalo", type=float, default=1.0,
+                        help="Segundos de espera cuando la cola está vacía")
+    args = parser.parse_args()
+
+    servicio = ServicioAnalisis()
+    try:
+        ejecutar_trabajador(servicio, intervalo=args.intervalo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        servicio.cerrar()